@@ -1,37 +1,150 @@
 """The main driver and entrypoint for the Wayfare API."""
 import argparse
+import importlib.util
+import time
 
-from wayfare import app
-from wayfare import api
-from wayfare.routes import users
-from wayfare.routes import rides
+from wayfare import create_app
+from wayfare import db
+from wayfare import init_db
+from wayfare.models import Ride
+from wayfare.seed import seed_database
 
 
 def _parse_args() -> argparse.Namespace:
     """... Parse arguments."""
     parser = argparse.ArgumentParser(description="")
+    parser.add_argument('command',
+                        help="'serve' to run the app, 'init-db' to create the database tables, "
+                             "'seed' to create them and load synthetic data, 'check-seats' to verify the "
+                             "seats available in each ride against its passengers.",
+                        nargs='?',
+                        choices=('serve', 'init-db', 'seed', 'check-seats'),
+                        default='serve')
     parser.add_argument('--debug',
                         help="Start the app in debug mode.",
                         action='store_true',
                         default=False)
+    parser.add_argument('--host',
+                        help="The address to listen on.",
+                        default='127.0.0.1')
     parser.add_argument('--port',
                         help="The port to listen on.",
                         type=int,
                         default=5000)
+    parser.add_argument('--workers',
+                        help="Serve with this many worker processes (requires gunicorn). "
+                             "0 to use the single-process development server.",
+                        type=int,
+                        default=0)
+    parser.add_argument('--threads',
+                        help="With --workers, the number of request threads per worker.",
+                        type=int,
+                        default=1)
+    parser.add_argument('--preload',
+                        help="With --workers, create the app once and fork the workers from it.",
+                        action='store_true',
+                        default=False)
+    parser.add_argument('--max-requests',
+                        help="With --workers, gracefully replace a worker after this many requests. "
+                             "0 to never replace workers.",
+                        type=int,
+                        default=0)
+    parser.add_argument('--drop',
+                        help="With init-db or seed, drop every table first. This deletes all data.",
+                        action='store_true',
+                        default=False)
+    parser.add_argument('--repair',
+                        help="With check-seats, recount the seats of the rides that do not match.",
+                        action='store_true',
+                        default=False)
+    parser.add_argument('--users',
+                        help="With seed, the number of users to generate.",
+                        type=int,
+                        default=10000)
+    parser.add_argument('--rides',
+                        help="With seed, the number of rides to generate.",
+                        type=int,
+                        default=100000)
+    parser.add_argument('--locations',
+                        help="With seed, the number of locations to generate.",
+                        type=int,
+                        default=200)
+    parser.add_argument('--days',
+                        help="With seed, the number of days rides depart over.",
+                        type=int,
+                        default=365)
+    parser.add_argument('--seed',
+                        help="With seed, the random seed. The same seed generates the same data.",
+                        type=int,
+                        default=0)
     return parser.parse_args()
 
 
+def _seed(args: argparse.Namespace):
+    """Create the database tables and load them with synthetic data."""
+    app = create_app()
+    init_db(app, drop=args.drop)
+    started = time.perf_counter()
+
+    def progress(table: str, count: int):
+        print(f'\r{time.perf_counter() - started:6.1f} s  {table}: {count} rows', end='', flush=True)
+
+    with app.app_context():
+        try:
+            counts = seed_database(db.engine, users=args.users, rides=args.rides, locations=args.locations,
+                                   days=args.days, seed=args.seed, progress=progress)
+        except ValueError as error:
+            raise SystemExit(f'\n{error}. Run seed with --drop to replace the existing data.')
+    print(f'\rSeeded in {time.perf_counter() - started:.1f} s:' + ' ' * 20)
+    for table, count in counts.items():
+        print(f'    {table}: {count} rows')
+
+
+def _check_seats(args: argparse.Namespace):
+    """Report, and optionally repair, rides whose seats available disagree with their passengers."""
+    app = create_app()
+    with app.app_context():
+        mismatches = Ride.find_seat_mismatches()
+        for ride_id, seats_available, expected in mismatches:
+            print(f'Ride {ride_id}: {seats_available} seats available, expected {expected}')
+        if mismatches and args.repair:
+            Ride.recount_seats(ride_id for ride_id, _, _ in mismatches)
+            print(f'Repaired {len(mismatches)} rides.')
+        elif mismatches:
+            raise SystemExit(f'{len(mismatches)} rides do not match. Run check-seats with --repair to fix '
+                             'them.')
+        else:
+            print('The seats available in every ride match its passengers.')
+
+
 def main():
     """Set up and run the Flask app."""
     args = _parse_args()
 
-    api.add_resource(users.Users, users.BASE_URL)
-    api.add_resource(users.UserById, f'{users.BASE_URL}/<int:user_id>')
-    api.add_resource(rides.Rides, rides.BASE_URL)
-    api.add_resource(rides.RidesById, f'{rides.BASE_URL}/<int:ride_id>')
+    if args.command == 'init-db':
+        init_db(create_app(), drop=args.drop)
+        return
+
+    if args.command == 'seed':
+        _seed(args)
+        return
+
+    if args.command == 'check-seats':
+        _check_seats(args)
+        return
+
+    if args.workers > 0:
+        if importlib.util.find_spec('gunicorn') is None:
+            raise SystemExit("--workers requires gunicorn: pipenv install gunicorn")
+        # Imported here so the other commands do not need gunicorn.
+        from wayfare import server  # pylint: disable=C0415
+        server.serve(create_app, f'{args.host}:{args.port}', args.workers,
+                     threads=args.threads, preload=args.preload, max_requests=args.max_requests)
+        return
 
+    app = create_app()
     app.debug = args.debug
-    app.run(port=args.port)
+    app.run(host=args.host, port=args.port)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,136 @@
+"""Benchmark for `Ride.search` against a large ride table.
+
+Loads a throwaway SQLite database with synthetic rides, prints the `EXPLAIN QUERY PLAN` of the search
+query and times a batch of random searches, first with the `ix_ride_search` index and then again after
+dropping it, so the cost of an index seek can be compared with a table scan.
+
+Usage:
+    $ python -m benchmarks.ride_search --rides 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from wayfare import create_app
+from wayfare import db
+from wayfare.models import Location
+from wayfare.models import Ride
+from wayfare.models import TimeRange
+from wayfare.models import User
+
+_FIRST_DAY = date(2019, 1, 1)
+_DAYS = 365
+_INSERT_CHUNK_SIZE = 50000
+
+
+def _parse_args() -> argparse.Namespace:
+    """Parse arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark indexed ride search.")
+    parser.add_argument('--rides', help="Number of rides to generate.", type=int, default=1000000)
+    parser.add_argument('--locations', help="Number of locations to generate.", type=int, default=200)
+    parser.add_argument('--queries', help="Number of searches to time.", type=int, default=500)
+    parser.add_argument('--seed', help="Random seed.", type=int, default=0)
+    return parser.parse_args()
+
+
+def _load(engine, rng: random.Random, ride_count: int, location_count: int):
+    """Create the schema and insert synthetic reference data and rides."""
+    db.Model.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(Location.__table__.insert(),
+                           [{'name': f'Location {index}'} for index in range(location_count)])
+        connection.execute(TimeRange.__table__.insert(),
+                           [{'description': 'Any time', 'start_time': 0, 'end_time': 24}])
+        connection.execute(User.__table__.insert(),
+                           [{'first_name': 'Driver', 'last_name': str(index), 'email': f'{index}@example.com'}
+                            for index in range(1000)])
+    for chunk_start in range(0, ride_count, _INSERT_CHUNK_SIZE):
+        rides = []
+        for _ in range(min(_INSERT_CHUNK_SIZE, ride_count - chunk_start)):
+            start_location_id, destination_id = rng.sample(range(1, location_count + 1), 2)
+            departure_date = datetime.combine(_FIRST_DAY, datetime.min.time()) + timedelta(
+                days=rng.randrange(_DAYS), hours=rng.randrange(24))
+            rides.append({
+                'departure_date': departure_date,
+                'capacity': rng.randint(1, 8),
+                'time_range_id': 1,
+                'driver_id': rng.randint(1, 1000),
+                'start_location_id': start_location_id,
+                'destination_id': destination_id
+            })
+        with engine.begin() as connection:
+            connection.execute(Ride.__table__.insert(), rides)
+    with engine.connect() as connection:
+        connection.execute('ANALYZE')
+
+
+def _explain(connection, statement) -> list:
+    """Return the `EXPLAIN QUERY PLAN` details SQLite produces for a statement."""
+    def prefix(conn, cursor, sql, parameters, context, executemany):  # pylint: disable=W0613
+        return f'EXPLAIN QUERY PLAN {sql}', parameters
+    event.listen(connection, 'before_cursor_execute', prefix, retval=True)
+    try:
+        return [row[-1] for row in connection.execute(statement)]
+    finally:
+        event.remove(connection, 'before_cursor_execute', prefix)
+
+
+def _time_searches(session: Session, searches: list) -> list:
+    """Run each search and return the latencies in milliseconds."""
+    latencies = []
+    for start_location_id, destination_id, departure_date in searches:
+        started = time.perf_counter()
+        Ride.search(start_location_id, destination_id, departure_date).with_session(session).all()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def _report(label: str, plan: list, latencies: list):
+    """Print a query plan and latency summary."""
+    latencies = sorted(latencies)
+    print(f'{label}:')
+    for line in plan:
+        print(f'    plan: {line}')
+    print(f'    mean {statistics.mean(latencies):.3f} ms, '
+          f'p50 {latencies[len(latencies) // 2]:.3f} ms, '
+          f'p99 {latencies[int(len(latencies) * 0.99)]:.3f} ms')
+
+
+def main():
+    """Load the benchmark database and time searches with and without the search index."""
+    args = _parse_args()
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory, create_app().app_context():
+        engine = create_engine(f'sqlite:///{os.path.join(directory, "ride_search.db")}')
+        started = time.perf_counter()
+        _load(engine, rng, args.rides, args.locations)
+        print(f'Loaded {args.rides} rides in {time.perf_counter() - started:.1f} s')
+
+        searches = [(*rng.sample(range(1, args.locations + 1), 2),
+                     _FIRST_DAY + timedelta(days=rng.randrange(_DAYS)))
+                    for _ in range(args.queries)]
+        session = Session(bind=engine)
+        statement = Ride.search(*searches[0]).with_session(session).statement
+        for label in ('With ix_ride_search', 'Without ix_ride_search'):
+            with engine.connect() as connection:
+                plan = _explain(connection, statement)
+            _report(label, plan, _time_searches(session, searches))
+            session.close()
+            with engine.connect() as connection:
+                connection.execute('DROP INDEX IF EXISTS ix_ride_search')
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""Benchmark suite for the API's resources, driven in-process through the Flask test client.
+
+Seeds a throwaway database with `wayfare.seed`, then sends each benchmarked request repeatedly through
+`app.test_client()` and reports the p50 and p99 latency, the throughput and the number of SQL statements
+per request. The results can be written as JSON to compare runs across commits.
+
+The collection `DELETE` methods, which wipe whole tables, are not benchmarked.
+
+Usage:
+    $ python -m benchmarks.routes --requests 500 --output bench.json
+    $ python -m benchmarks.routes --only 'GET /rides'
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+
+from datetime import timedelta
+from typing import Callable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+
+from flask import Flask
+from sqlalchemy import event
+
+from wayfare import create_app
+from wayfare import db
+from wayfare import init_db
+from wayfare.seed import FIRST_DAY
+from wayfare.seed import seed_database
+
+_DAYS = 90
+
+
+class _Request(NamedTuple):
+    """A request to send through the test client."""
+    method: str
+    url: str
+    json: Optional[object] = None
+    data: Optional[dict] = None
+    headers: Optional[dict] = None
+
+
+class _Case(NamedTuple):
+    """A benchmarked endpoint.
+
+    `make_request` is called before every iteration, outside of the timed section, and may write to the
+    database to prepare the request (for example creating the user a `DELETE` removes).
+    """
+    name: str
+    make_request: Callable[[], _Request]
+    expected_status: int = 200
+
+
+def _parse_args() -> argparse.Namespace:
+    """Parse arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark every resource through the Flask test client.")
+    parser.add_argument('--requests', help="Number of timed requests per endpoint.", type=int, default=300)
+    parser.add_argument('--warmup', help="Number of untimed requests per endpoint.", type=int, default=20)
+    parser.add_argument('--users', help="Number of users to seed.", type=int, default=2000)
+    parser.add_argument('--rides', help="Number of rides to seed.", type=int, default=20000)
+    parser.add_argument('--locations', help="Number of locations to seed.", type=int, default=50)
+    parser.add_argument('--memory', help="Use an in-memory database instead of a temporary file.",
+                        action='store_true', default=False)
+    parser.add_argument('--only', help="Only run endpoints whose name starts with this prefix.", default='')
+    parser.add_argument('--output', help="Path to write the results to as JSON.")
+    parser.add_argument('--seed', help="Random seed.", type=int, default=0)
+    return parser.parse_args()
+
+
+def _make_cases(app: Flask, rng: random.Random, args: argparse.Namespace) -> List[_Case]:
+    """Build the benchmarked requests."""
+    counter = itertools.count()
+    client = app.test_client()
+
+    def new_user() -> dict:
+        index = next(counter)
+        return {'first_name': 'New', 'last_name': f'User {index}', 'email': f'new{index}@example.com',
+                'password': 'password'}
+
+    def random_user_id() -> int:
+        return rng.randint(1, args.users)
+
+    def random_ride_id() -> int:
+        return rng.randint(1, args.rides)
+
+    ride_ids_to_delete = itertools.count(args.rides, -1)
+
+    def created_user_url() -> str:
+        response = client.post('/users', data=new_user())
+        return response.headers['location']
+
+    def search_url() -> str:
+        start_location, destination = rng.sample(range(1, args.locations + 1), 2)
+        departure_date = FIRST_DAY + timedelta(days=rng.randrange(_DAYS))
+        return (f'/rides?startLocation=Location%20{start_location}&destination=Location%20{destination}'
+                f'&date={departure_date.isoformat()}')
+
+    def reservation_request() -> _Request:
+        # A new ride each time, so the reservation always finds a free seat.
+        ride_url = client.post('/rides', data={
+            'departure_date': '2019-02-01T08:00:00',
+            'capacity': 4,
+            'time_range_id': 1,
+            'driver_id': 1,
+            'start_location_id': 1,
+            'destination_id': 2
+        }).headers['location']
+        return _Request('POST', f'{ride_url}/passengers', json={'user_id': rng.randint(2, args.users)})
+
+    etags = {}
+
+    def conditional_user_request() -> _Request:
+        user_id = random_user_id()
+        if user_id not in etags:
+            etags[user_id] = client.get(f'/users/{user_id}').headers['ETag']
+        return _Request('GET', f'/users/{user_id}', headers={'If-None-Match': etags[user_id]})
+
+    expand = 'driver,start_location,destination,time_range,passengers'
+    return [
+        _Case('GET /users', lambda: _Request('GET', '/users')),
+        _Case('GET /users?limit=1000', lambda: _Request('GET', '/users?limit=1000')),
+        _Case('GET /users?fields=id,email', lambda: _Request('GET', '/users?fields=id,email&limit=1000')),
+        _Case('GET /users (ndjson)',
+              lambda: _Request('GET', '/users', headers={'Accept': 'application/x-ndjson'})),
+        _Case('POST /users', lambda: _Request('POST', '/users', data=new_user()), 201),
+        _Case('POST /users:batch', lambda: _Request('POST', '/users:batch',
+                                                    json=[new_user() for _ in range(100)])),
+        _Case('GET /users/<id>', lambda: _Request('GET', f'/users/{random_user_id()}')),
+        _Case('GET /users/<id> (If-None-Match)', conditional_user_request, 304),
+        _Case('PUT /users/<id>', lambda: _Request('PUT', f'/users/{random_user_id()}', data=new_user())),
+        _Case('DELETE /users/<id>', lambda: _Request('DELETE', created_user_url())),
+        _Case('GET /users/<id>/rides', lambda: _Request('GET', f'/users/{random_user_id()}/rides')),
+        _Case('GET /rides', lambda: _Request('GET', '/rides')),
+        _Case('GET /rides (search)', lambda: _Request('GET', search_url())),
+        _Case('GET /rides?fields=id,departure_date',
+              lambda: _Request('GET', '/rides?fields=id,departure_date&limit=1000')),
+        _Case('GET /rides?expand=...', lambda: _Request('GET', f'/rides?expand={expand}')),
+        _Case('POST /rides', lambda: _Request('POST', '/rides', data={
+            'departure_date': '2019-02-01T08:00:00',
+            'capacity': 4,
+            'time_range_id': 1,
+            'driver_id': random_user_id(),
+            'start_location_id': 1,
+            'destination_id': 2
+        }), 201),
+        _Case('GET /rides/<id>', lambda: _Request('GET', f'/rides/{random_ride_id()}')),
+        _Case('PUT /rides/<id>', lambda: _Request('PUT', f'/rides/{random_ride_id()}', data={
+            'departure_date': '2019-02-01T08:00:00',
+            'capacity': 8,
+            'time_range_id': 1,
+            'driver_id': random_user_id(),
+            'start_location_id': 1,
+            'destination_id': 2
+        })),
+        _Case('GET /rides/<id>?expand=...',
+              lambda: _Request('GET', f'/rides/{random_ride_id()}?expand={expand}')),
+        _Case('DELETE /rides/<id>', lambda: _Request('DELETE', f'/rides/{next(ride_ids_to_delete)}')),
+        _Case('POST /rides/<id>/passengers', reservation_request, 201)
+    ]
+
+
+def _run_case(app: Flask, case: _Case, requests: int, warmup: int) -> dict:
+    """Send a case's requests and summarize their latencies and statement counts."""
+    client = app.test_client()
+    statements = [0]
+
+    def count(*args):  # pylint: disable=W0613
+        statements[0] += 1
+
+    latencies = []
+    statement_counts = []
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        for iteration in range(warmup + requests):
+            request = case.make_request()
+            statements[0] = 0
+            started = time.perf_counter()
+            response = client.open(request.url, method=request.method, json=request.json, data=request.data,
+                                   headers=request.headers)
+            response.get_data()  # Drain streamed responses.
+            elapsed = time.perf_counter() - started
+            if response.status_code != case.expected_status:
+                raise AssertionError(f'{case.name}: expected {case.expected_status}, got '
+                                     f'{response.status_code}: {response.get_data(as_text=True)[:200]}')
+            if iteration >= warmup:
+                latencies.append(elapsed * 1000)
+                statement_counts.append(statements[0])
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    latencies.sort()
+    return {
+        'requests': requests,
+        'p50_ms': round(latencies[len(latencies) // 2], 3),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3),
+        'mean_ms': round(statistics.mean(latencies), 3),
+        'requests_per_second': round(requests / (sum(latencies) / 1000), 1),
+        'queries_per_request': round(statistics.mean(statement_counts), 2)
+    }
+
+
+def _git_commit() -> Optional[str]:
+    """Return the current git commit, if the benchmark runs inside a git checkout."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], check=True, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    """Seed a database, benchmark every endpoint and print or write the results."""
+    args = _parse_args()
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        uri = 'sqlite://' if args.memory else f'sqlite:///{os.path.join(directory, "routes.db")}'
+        # Metrics on, as in a production deployment that is scraped by Prometheus.
+        app = create_app({'SQLALCHEMY_DATABASE_URI': uri, 'WAYFARE_METRICS': True})
+        init_db(app)
+        with app.app_context():
+            seed_database(db.engine, users=args.users, rides=args.rides, locations=args.locations, days=_DAYS,
+                          seed=args.seed)
+            results = {}
+            for case in _make_cases(app, rng, args):
+                if not case.name.startswith(args.only):
+                    continue
+                results[case.name] = _run_case(app, case, args.requests, args.warmup)
+                result = results[case.name]
+                print(f'{case.name:<40} p50 {result["p50_ms"]:8.3f} ms  p99 {result["p99_ms"]:8.3f} ms  '
+                      f'{result["requests_per_second"]:8.1f} req/s  '
+                      f'{result["queries_per_request"]:5.2f} queries/req')
+            db.session.remove()
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({
+                'commit': _git_commit(),
+                'python': platform.python_version(),
+                'database': 'memory' if args.memory else 'file',
+                'settings': {'requests': args.requests, 'warmup': args.warmup, 'users': args.users,
+                             'rides': args.rides, 'locations': args.locations, 'seed': args.seed},
+                'results': results
+            }, output, indent=2, sort_keys=True)
+            output.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Contention benchmark for `POST /rides/<id>/passengers`.
+
+Creates a throwaway database with one user per thread, then, for each of `--rounds` rides, releases every
+thread at once to reserve a seat in the same ride through the Flask test client. Each ride has fewer seats
+than there are threads, so the threads race for the last seats: exactly `--capacity` reservations must
+succeed and the others get a 409.
+
+Prints the reservation latency, the throughput of each round and, as a check, the number of overbooked
+rides (with more holding passengers than seats, or a negative `seats_available`), rounds that did not
+fill up and server errors such as "database is locked". All three must be 0.
+
+Usage:
+    $ python -m benchmarks.seat_contention --threads 32 --rounds 50
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from collections import Counter
+from datetime import datetime
+
+from wayfare import create_app
+from wayfare import db
+from wayfare import init_db
+from wayfare.models import Ride
+from wayfare.models.ride import _MAX_CAPACITY
+from wayfare.seed import seed_database
+
+
+def _parse_args() -> argparse.Namespace:
+    """Parse arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark concurrent seat reservations in the same ride.")
+    parser.add_argument('--threads', help="Number of threads reserving a seat in each ride.", type=int,
+                        default=16)
+    parser.add_argument('--rounds', help="Number of rides to fill.", type=int, default=30)
+    parser.add_argument('--capacity', help=f"Seats in each ride, at most {_MAX_CAPACITY}.", type=int,
+                        default=4)
+    return parser.parse_args()
+
+
+def _create_rides(count: int, capacity: int, driver_id: int) -> list:
+    """Create the rides to fill and return their ids."""
+    ride_ids = []
+    for _ in range(count):
+        ride = Ride(departure_date=datetime(2019, 1, 2, 8), capacity=capacity, time_range_id=1,
+                    driver_id=driver_id, start_location_id=1, destination_id=2)
+        ride.create()
+        ride_ids.append(ride.id)
+    return ride_ids
+
+
+def main():
+    """Fill every ride from many threads at once and print the latencies, throughput and checks."""
+    args = _parse_args()
+    if not 0 < args.capacity < args.threads:
+        raise SystemExit('--capacity must be positive and less than --threads.')
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(directory, "seats.db")}',
+                          'WAYFARE_METRICS': False})
+        init_db(app)
+        with app.app_context():
+            # The last user drives every ride, the others reserve seats.
+            seed_database(db.engine, users=args.threads + 1, rides=0, locations=2, days=1)
+            ride_ids = _create_rides(args.rounds, args.capacity, args.threads + 1)
+            db.session.remove()
+
+        barrier = threading.Barrier(args.threads + 1)
+        lock = threading.Lock()
+        statuses = {ride_id: Counter() for ride_id in ride_ids}
+        latencies = []
+
+        def reserve(user_id: int):
+            client = app.test_client()
+            for ride_id in ride_ids:
+                barrier.wait()
+                started = time.perf_counter()
+                status = client.post(f'/rides/{ride_id}/passengers', json={'user_id': user_id}).status_code
+                elapsed = time.perf_counter() - started
+                with lock:
+                    statuses[ride_id][status] += 1
+                    latencies.append(elapsed * 1000)
+                barrier.wait()
+
+        threads = [threading.Thread(target=reserve, args=(user_id,))
+                   for user_id in range(1, args.threads + 1)]
+        for thread in threads:
+            thread.start()
+        round_throughputs = []
+        for _ in ride_ids:
+            barrier.wait()
+            started = time.perf_counter()
+            barrier.wait()
+            round_throughputs.append(args.threads / (time.perf_counter() - started))
+        for thread in threads:
+            thread.join()
+
+        with app.app_context():
+            rides = {ride.id: ride for ride in Ride.select().filter(Ride.id.in_(ride_ids))}
+            mismatches = Ride.find_seat_mismatches()
+            db.session.remove()
+
+    overbooked = sum(1 for ride_id in ride_ids
+                     if statuses[ride_id][201] > args.capacity or rides[ride_id].seats_available < 0)
+    not_filled = sum(1 for ride_id in ride_ids
+                     if statuses[ride_id][201] < args.capacity or rides[ride_id].seats_available != 0)
+    errors = sum(count for counter in statuses.values() for status, count in counter.items()
+                 if status not in (201, 409))
+    latencies.sort()
+    print(f'{args.rounds} rides with {args.capacity} seats, {args.threads} threads reserving at once')
+    print(f'Reservations: {sum(counter[201] for counter in statuses.values())} created, '
+          f'{sum(counter[409] for counter in statuses.values())} conflicts')
+    print(f'Latency: p50 {latencies[len(latencies) // 2]:.2f} ms, '
+          f'p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:.2f} ms')
+    print(f'Throughput per round: median {statistics.median(round_throughputs):.0f} req/s, '
+          f'min {min(round_throughputs):.0f}, max {max(round_throughputs):.0f}')
+    print(f'Overbooked rides: {overbooked}, rides not filled: {not_filled}, server errors: {errors}, '
+          f'seat count mismatches: {len(mismatches)}')
+    if overbooked or not_filled or errors or mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
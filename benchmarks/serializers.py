@@ -0,0 +1,95 @@
+"""Benchmark for precompiled response serializers against `flask_restful.marshal_with`.
+
+Serializes a list of in-memory rides and users the way a list endpoint does, once through
+`marshal_with` and Flask-RESTful's `output_json` and once through the compiled `Serializer`, checks
+that both produce the same body and prints the time each takes.
+
+Usage:
+    $ python -m benchmarks.serializers --rows 10000
+"""
+import argparse
+import statistics
+import time
+
+from datetime import datetime
+from datetime import timedelta
+
+from flask_restful import marshal_with
+from flask_restful.representations.json import output_json
+
+from wayfare import create_app
+from wayfare.models import Ride
+from wayfare.models import User
+from wayfare.routes import rides
+from wayfare.routes import users
+
+
+def _parse_args() -> argparse.Namespace:
+    """Parse arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark compiled serializers against marshal_with.")
+    parser.add_argument('--rows', help="Number of objects in the list.", type=int, default=10000)
+    parser.add_argument('--repeat', help="Number of timed runs.", type=int, default=20)
+    return parser.parse_args()
+
+
+def _make_rides(count: int) -> list:
+    """Build transient rides."""
+    models = []
+    for index in range(count):
+        ride = Ride(departure_date=datetime(2019, 1, 1) + timedelta(minutes=index), capacity=4,
+                    time_range_id=1, driver_id=index % 100 + 1, start_location_id=1, destination_id=2)
+        ride.id = index + 1
+        models.append(ride)
+    return models
+
+
+def _make_users(count: int) -> list:
+    """Build transient users."""
+    models = []
+    for index in range(count):
+        user = User(first_name='First', last_name=f'Last {index}', email=f'user{index}@example.com')
+        user.id = index + 1
+        models.append(user)
+    return models
+
+
+def _time(function, repeat: int) -> list:
+    """Call a function repeatedly and return the latencies in milliseconds."""
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def _compare(label: str, module, models: list, repeat: int):
+    """Time both serialization paths for one resource module and print the results."""
+    @marshal_with(module._response_schema)  # pylint: disable=W0212
+    def marshalled():
+        return models
+
+    def with_marshal_with():
+        return output_json(marshalled(), 200).get_data()
+
+    def with_serializer():
+        return module._serializer.make_response(models).get_data()  # pylint: disable=W0212
+
+    if with_marshal_with() != with_serializer():
+        raise AssertionError(f'{label}: serializer output differs from marshal_with')
+    print(f'{label} ({len(models)} rows):')
+    for name, function in (('marshal_with', with_marshal_with), ('Serializer', with_serializer)):
+        latencies = _time(function, repeat)
+        print(f'    {name:<12} mean {statistics.mean(latencies):8.2f} ms, min {min(latencies):8.2f} ms')
+
+
+def main():
+    """Serialize rides and users with both serializers."""
+    args = _parse_args()
+    with create_app().test_request_context():
+        _compare('Rides', rides, _make_rides(args.rows), args.repeat)
+        _compare('Users', users, _make_users(args.rows), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark for the SQLite pragmas applied by `wayfare.database.configure_engine`.
+
+Runs the same workload against a throwaway database twice, once with SQLite's defaults (rollback journal,
+`synchronous=FULL`) and once with the app's default pragmas: several writer threads commit one-row
+transactions while reader threads query the table, and the commit throughput, read throughput and
+"database is locked" errors are printed for each.
+
+Usage:
+    $ python -m benchmarks.sqlite_commits --writers 4 --readers 4 --seconds 5
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from wayfare import config
+from wayfare.database import configure_engine
+
+_SQLITE_DEFAULTS = {
+    'WAYFARE_SQLITE_JOURNAL_MODE': 'DELETE',
+    'WAYFARE_SQLITE_SYNCHRONOUS': 'FULL',
+    'WAYFARE_SQLITE_MMAP_SIZE': 0,
+    'WAYFARE_SQLITE_BUSY_TIMEOUT': None
+}
+
+
+def _parse_args() -> argparse.Namespace:
+    """Parse arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark SQLite commit throughput and concurrency.")
+    parser.add_argument('--writers', help="Number of writer threads.", type=int, default=4)
+    parser.add_argument('--readers', help="Number of reader threads.", type=int, default=4)
+    parser.add_argument('--seconds', help="Duration of each run.", type=float, default=5.0)
+    return parser.parse_args()
+
+
+def _run(settings: dict, args: argparse.Namespace) -> dict:
+    """Run the workload against a fresh database configured with the given settings."""
+    counts = {'commits': 0, 'reads': 0, 'locked': 0}
+    lock = threading.Lock()
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f'sqlite:///{os.path.join(directory, "commits.db")}')
+        configure_engine(engine, settings)
+        with engine.connect() as connection:
+            connection.execute('CREATE TABLE item (id INTEGER PRIMARY KEY, value TEXT)')
+        deadline = time.monotonic() + args.seconds
+
+        def work(statement: str, counter: str):
+            done = locked = 0
+            while time.monotonic() < deadline:
+                try:
+                    with engine.begin() as connection:
+                        connection.execute(statement)
+                    done += 1
+                except OperationalError:
+                    locked += 1
+            with lock:
+                counts[counter] += done
+                counts['locked'] += locked
+
+        threads = ([threading.Thread(target=work, args=("INSERT INTO item (value) VALUES ('x')", 'commits'))
+                    for _ in range(args.writers)] +
+                   [threading.Thread(target=work, args=('SELECT count(*) FROM item', 'reads'))
+                    for _ in range(args.readers)])
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+    return counts
+
+
+def main():
+    """Run the workload with SQLite's defaults and with the app's pragmas."""
+    args = _parse_args()
+    for label, settings in (('SQLite defaults', _SQLITE_DEFAULTS), ('App pragmas', config.load())):
+        counts = _run(settings, args)
+        print(f'{label}: {counts["commits"] / args.seconds:.0f} commits/s, '
+              f'{counts["reads"] / args.seconds:.0f} reads/s, {counts["locked"]} "database is locked" errors')
+
+
+if __name__ == '__main__':
+    main()
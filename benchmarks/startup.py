@@ -0,0 +1,75 @@
+"""Benchmark for worker startup time.
+
+Starts a fresh interpreter repeatedly, as each spawned worker would, and times importing the third-party
+dependencies, importing `wayfare`, building the app with `create_app` and serving a first request against
+an already initialized database. Workers forked from a preloaded app only pay for the last two steps. The
+one-off `init_db` step is timed separately, since workers no longer run it.
+
+Usage:
+    $ python -m benchmarks.startup --runs 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Run in a fresh interpreter so nothing is already imported.
+_WORKER = '''
+import json, sys, time
+started = time.perf_counter()
+import dateutil.parser, flask, flask_restful, flask_sqlalchemy, sqlalchemy.orm, webargs.flaskparser
+dependencies = time.perf_counter()
+import wayfare
+imported = time.perf_counter()
+app = wayfare.create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1]})
+created = time.perf_counter()
+response = app.test_client().get('/users?limit=1')
+assert response.status_code == 200, response.status_code
+served = time.perf_counter()
+print(json.dumps({'import dependencies': dependencies - started, 'import wayfare': imported - dependencies,
+                  'create_app': created - imported, 'first_request': served - created}))
+'''
+
+_INIT_DB = '''
+import json, sys, time
+import wayfare
+app = wayfare.create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1]})
+started = time.perf_counter()
+wayfare.init_db(app)
+print(json.dumps({'init_db': time.perf_counter() - started}))
+'''
+
+
+def _parse_args() -> argparse.Namespace:
+    """Parse arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark worker startup time.")
+    parser.add_argument('--runs', help="Number of worker startups to time.", type=int, default=20)
+    return parser.parse_args()
+
+
+def _run(script: str, uri: str) -> dict:
+    """Run a timing script in a fresh interpreter and return the timings it prints."""
+    output = subprocess.run([sys.executable, '-c', script, uri], check=True, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, cwd=os.getcwd()).stdout
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    """Initialize a database once, then time repeated worker startups against it."""
+    args = _parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        uri = f'sqlite:///{os.path.join(directory, "startup.db")}'
+        print(f'init_db (once): {_run(_INIT_DB, uri)["init_db"] * 1000:.1f} ms')
+        runs = [_run(_WORKER, uri) for _ in range(args.runs)]
+    for step in runs[0]:
+        timings = sorted(run[step] * 1000 for run in runs)
+        print(f'{step:<18} median {statistics.median(timings):7.1f} ms, max {timings[-1]:7.1f} ms')
+    totals = [sum(run.values()) * 1000 for run in runs]
+    print(f'{"total":<18} median {statistics.median(totals):7.1f} ms, max {max(totals):7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
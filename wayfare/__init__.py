@@ -1,28 +1,71 @@
 """The main driver and entrypoint for the Wayfare API."""
 
-import argparse
 import flask_restful
-import flask_sqlalchemy
 
 from flask import Flask
 
+from wayfare import config
+from wayfare.database import SQLAlchemy
+from wayfare.database import configure_engine
+from wayfare.instrumentation import configure_sql_instrumentation
+from wayfare.profiling import configure_profiling
+from wayfare.slow_queries import configure_slow_query_log
 
-DB_URI = 'sqlite:///./main.db'
 
+db = SQLAlchemy()  # pylint: disable=C0103
+# These imports are here to prevent errors from missing circular imports
+from wayfare import models  # pylint: disable=C0413,W0611
+from wayfare.metrics import configure_metrics  # pylint: disable=C0413
+from wayfare.models.cache import configure_entity_caches  # pylint: disable=C0413
+from wayfare.models.cache import configure_reference_caches  # pylint: disable=C0413
+from wayfare.routes import rides  # pylint: disable=C0413
+from wayfare.routes import users  # pylint: disable=C0413
 
-app = Flask(__name__)  # pylint: disable=C0103
-app.config['SQLALCHEMY_DATABASE_URI'] = DB_URI
 
-db = flask_sqlalchemy.SQLAlchemy(app)  # pylint: disable=C0103
-# These imports are here to prevent errors from missing circular imports
-from wayfare.models import Location  # pylint: disable=C0413
-from wayfare.models import Status  # pylint: disable=C0413
-from wayfare.models import TimeRange  # pylint: disable=C0413
-from wayfare.models import User  # pylint: disable=C0413
-from wayfare.models import Ride  # pylint: disable=C0413
-from wayfare.models import Passenger  # pylint: disable=C0413
-# Necessary for sqlite
-db.drop_all()
-db.create_all()
-
-api = flask_restful.Api(app, catch_all_404s=True)  # pylint: disable=C0103
+def create_app(settings: dict = None) -> Flask:
+    """Create and configure the Flask app.
+
+    Creating an app does not touch the database schema; create the tables once with `init_db`, for
+    example by running `python app.py init-db`.
+
+    Args:
+        settings (dict): Settings overriding the defaults and environment variables from `wayfare.config`.
+
+    Returns:
+        Flask: App with every resource registered.
+    """
+    app = Flask(__name__)
+    app.config.update(config.load())
+    app.config.update(settings or {})
+    db.init_app(app)
+    with app.app_context():
+        configure_engine(db.engine, app.config)
+        configure_sql_instrumentation(app, db.engine)
+        configure_slow_query_log(app, db.engine)
+    configure_metrics(app)
+    configure_entity_caches(app.config['WAYFARE_ENTITY_CACHE_SIZE'], app.config['WAYFARE_ENTITY_CACHE_TTL'])
+    configure_reference_caches(app.config['WAYFARE_REFERENCE_CACHE_TTL'])
+
+    api = flask_restful.Api(app, catch_all_404s=True)
+    api.add_resource(users.Users, users.BASE_URL)
+    api.add_resource(users.UsersBatch, users.BATCH_URL)
+    api.add_resource(users.UserById, f'{users.BASE_URL}/<int:user_id>')
+    api.add_resource(rides.Rides, rides.BASE_URL)
+    api.add_resource(rides.RidesById, f'{rides.BASE_URL}/<int:ride_id>')
+    api.add_resource(rides.UserRides, rides.USER_RIDES_URL)
+    api.add_resource(rides.RidePassengers, rides.PASSENGERS_URL)
+    configure_profiling(app)
+    return app
+
+
+def init_db(app: Flask, drop: bool = False):
+    """Create any missing tables and indexes in an app's database.
+
+    Args:
+        app (Flask): App whose database to initialize.
+        drop (bool): True to drop every table first, deleting all data.
+    """
+    with app.app_context():
+        if drop:
+            db.drop_all()
+        db.create_all()
@@ -0,0 +1,80 @@
+"""Default settings for the Flask app.
+
+Every setting can be overridden by an environment variable of the same name, for example:
+
+    $ SQLALCHEMY_DATABASE_URI=sqlite:////var/lib/wayfare/main.db SQLALCHEMY_POOL_SIZE=5 python app.py
+"""
+import os
+
+from typing import Any
+from typing import Dict
+from typing import Mapping
+
+
+def _parse_bool(value: str) -> bool:
+    """Parse a boolean environment variable."""
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# Setting name -> (parser for environment variable values, default value).
+_SETTINGS = {
+    'SQLALCHEMY_DATABASE_URI': (str, 'sqlite:///./main.db'),
+    # Connection pool. Left unset, Flask-SQLAlchemy opens a new connection per checkout for SQLite files
+    # and uses a pool of 10 for MySQL. Setting the size, overflow or timeout pools SQLite file connections
+    # too, see `wayfare.database.SQLAlchemy`.
+    'SQLALCHEMY_POOL_SIZE': (int, None),
+    'SQLALCHEMY_MAX_OVERFLOW': (int, None),
+    'SQLALCHEMY_POOL_RECYCLE': (int, None),
+    'SQLALCHEMY_POOL_TIMEOUT': (int, None),
+    # Session change tracking feeds Flask-SQLAlchemy's model signals, which nothing here listens to.
+    'SQLALCHEMY_TRACK_MODIFICATIONS': (_parse_bool, False),
+    # Pragmas applied to every new SQLite connection, see `wayfare.database`. Empty to keep SQLite's default.
+    'WAYFARE_SQLITE_JOURNAL_MODE': (str, 'WAL'),
+    'WAYFARE_SQLITE_SYNCHRONOUS': (str, 'NORMAL'),
+    'WAYFARE_SQLITE_MMAP_SIZE': (int, 256 * 1024 * 1024),
+    'WAYFARE_SQLITE_BUSY_TIMEOUT': (int, 5000),  # Milliseconds.
+    # Bounds of the `User` and `Ride` lookup caches. A size of 0 disables them.
+    'WAYFARE_ENTITY_CACHE_SIZE': (int, 10000),
+    'WAYFARE_ENTITY_CACHE_TTL': (float, 30.0),
+    # Seconds the `Location`, `Status` and `TimeRange` tables are cached before they are reloaded.
+    'WAYFARE_REFERENCE_CACHE_TTL': (float, 60.0),
+    # Per-request statement counts and timings in `Server-Timing` headers, see `wayfare.instrumentation`.
+    'WAYFARE_SQL_INSTRUMENTATION': (_parse_bool, False),
+    'WAYFARE_SQL_SLOWEST': (int, 3),  # Number of slowest statements to log per request.
+    # Request metrics served at `/metrics`, see `wayfare.metrics`. Off by default: recording them adds hooks
+    # and statement listeners to every request, and `/metrics` is not authenticated.
+    'WAYFARE_METRICS': (_parse_bool, False),
+    # Log of statements slower than `WAYFARE_SLOW_QUERY_MS` milliseconds, see `wayfare.slow_queries`. Unset
+    # to disable it.
+    'WAYFARE_SLOW_QUERY_MS': (float, None),
+    'WAYFARE_SLOW_QUERY_EXPLAIN': (_parse_bool, True),
+    # Log the values of slow statements' parameters, which include passwords, rather than only their types.
+    'WAYFARE_SLOW_QUERY_PARAMETERS': (_parse_bool, False),
+    'WAYFARE_SLOW_QUERY_LOG': (str, 'slow_queries.log'),
+    'WAYFARE_SLOW_QUERY_LOG_BYTES': (int, 10 * 1024 * 1024),
+    'WAYFARE_SLOW_QUERY_LOG_BACKUPS': (int, 5),
+    # Profiles of requests sent with an `X-Wayfare-Profile` header, see `wayfare.profiling`.
+    'WAYFARE_PROFILING': (_parse_bool, False),
+    'WAYFARE_PROFILE_DIR': (str, 'profiles'),
+    'WAYFARE_PROFILE_KEEP': (int, 20),
+    'WAYFARE_PROFILE_INTERVAL_MS': (float, 1.0)
+}
+
+
+def load(environ: Mapping[str, str] = os.environ) -> Dict[str, Any]:
+    """Build the app settings from the defaults and environment variable overrides.
+
+    Args:
+        environ (Mapping[str, str]): Environment variables to read overrides from.
+
+    Returns:
+        dict: Settings to add to `app.config`.
+
+    Raises:
+        ValueError: If an environment variable cannot be parsed.
+    """
+    settings = {}
+    for name, (parse, default) in _SETTINGS.items():
+        value = environ.get(name)
+        settings[name] = parse(value) if value not in (None, '') else default
+    return settings
@@ -0,0 +1,81 @@
+"""Tuning for the database engine behind `wayfare.db`."""
+from typing import List
+from typing import Mapping
+from typing import Tuple
+
+import flask_sqlalchemy
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import URL
+from sqlalchemy.pool import QueuePool
+
+# `create_engine` options set from the `SQLALCHEMY_POOL_*` settings, see `SQLAlchemy.apply_pool_defaults`.
+_QUEUE_POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+
+def _sqlite_pragmas(config: Mapping) -> List[Tuple[str, str]]:
+    """Collect the SQLite pragmas to apply from the app settings.
+
+    Raises:
+        ValueError: If a pragma value is not a plain word or number.
+    """
+    pragmas = []
+    for name, key in (('journal_mode', 'WAYFARE_SQLITE_JOURNAL_MODE'),
+                      ('synchronous', 'WAYFARE_SQLITE_SYNCHRONOUS'),
+                      ('mmap_size', 'WAYFARE_SQLITE_MMAP_SIZE'),
+                      ('busy_timeout', 'WAYFARE_SQLITE_BUSY_TIMEOUT')):
+        value = config.get(key)
+        if value is None or value == '':
+            continue
+        if not str(value).isalnum():
+            raise ValueError(f'Invalid value for {key}: {value!r}')
+        pragmas.append((name, str(value)))
+    return pragmas
+
+
+class SQLAlchemy(flask_sqlalchemy.SQLAlchemy):
+    """`flask_sqlalchemy.SQLAlchemy` that can pool connections to SQLite database files."""
+    def apply_driver_hacks(self, app: Flask, info: URL, options: dict):
+        """Pool SQLite file connections in a `QueuePool` when any pool bound is set.
+
+        Flask-SQLAlchemy opens a new connection per checkout for SQLite files, and that `NullPool` rejects
+        the pool size, overflow and timeout options. With any of them set, connections are kept in a
+        `QueuePool` instead, unless the pool size is 0. Pooled connections move between threads, so the
+        same-thread check of the `sqlite3` module is turned off.
+        """
+        in_memory = info.database in (None, '', ':memory:')
+        super().apply_driver_hacks(app, info, options)
+        if info.drivername != 'sqlite' or in_memory:
+            return
+        if options.get('pool_size') == 0:
+            for name in _QUEUE_POOL_OPTIONS:
+                options.pop(name, None)
+        elif any(options.get(name) is not None for name in _QUEUE_POOL_OPTIONS):
+            options['poolclass'] = QueuePool
+            options.setdefault('connect_args', {})['check_same_thread'] = False
+
+
+def configure_engine(engine: Engine, config: Mapping):
+    """Apply the app's SQLite pragmas to every new connection of an engine.
+
+    With the defaults, connections use write-ahead logging so readers do not block the writer and the
+    writer does not block readers, only sync the log at checkpoints rather than on every commit, memory-map
+    the database file, and wait for a lock rather than failing with "database is locked" immediately.
+    Engines for other databases are left untouched.
+
+    Args:
+        engine (Engine): Engine to configure.
+        config (Mapping): App settings holding the `WAYFARE_SQLITE_*` pragmas.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = _sqlite_pragmas(config)
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):  # pylint: disable=W0612,W0613
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
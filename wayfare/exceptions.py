@@ -52,3 +52,30 @@ class InvalidCapacityError(WayfareError):
         self.capacity = capacity
         self.message = "Invalid capacity: '{}'".format(capacity)
         super().__init__(self.message)
+
+class CapacityBelowHeldSeatsError(WayfareError):
+    """Exception raised when a ride's capacity is lowered below the seats its passengers hold."""
+
+    def __init__(self, ride_id: int, capacity: int):
+        self.ride_id = ride_id
+        self.capacity = capacity
+        self.message = "Ride {} has more passengers than {} seats".format(ride_id, capacity)
+        super().__init__(self.message)
+
+# for passenger.py
+class RideFullError(WayfareError):
+    """Exception raised when a seat is reserved in a ride with no seats available."""
+
+    def __init__(self, ride_id: int):
+        self.ride_id = ride_id
+        self.message = "Ride {} has no seats available".format(ride_id)
+        super().__init__(self.message)
+
+class AlreadyPassengerError(WayfareError):
+    """Exception raised when a user reserves a seat in a ride they already hold a seat in."""
+
+    def __init__(self, user_id: int, ride_id: int):
+        self.user_id = user_id
+        self.ride_id = ride_id
+        self.message = "User {} already holds a seat in ride {}".format(user_id, ride_id)
+        super().__init__(self.message)
@@ -0,0 +1,182 @@
+"""Per-request SQL instrumentation.
+
+When `WAYFARE_SQL_INSTRUMENTATION` is set, every statement the engine executes while handling a request is
+counted and timed. Each response then carries `Server-Timing` headers with the number of statements, the
+time spent in the database and the total time spent handling the request:
+
+    Server-Timing: db;desc="3 queries";dur=1.8
+    Server-Timing: total;dur=4.2
+
+and a summary with the slowest statements is logged at DEBUG level by the `wayfare.instrumentation` logger.
+When the setting is off, no event listener is installed and requests pay nothing, unless `WAYFARE_METRICS`
+is set: the statements are then still recorded for `wayfare.metrics`, without headers or logs.
+
+Statements run while a streamed response body is sent, after the headers, are not included.
+"""
+import heapq
+import logging
+import time
+
+from typing import Any
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from flask import Flask
+from flask import Response
+from flask import g
+from flask import has_request_context
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+from sqlalchemy.engine import Engine
+
+
+_logger = logging.getLogger(__name__)  # pylint: disable=C0103
+# Key in `flask.g` holding the current request's `QueryStats`.
+_STATS = 'wayfare_query_stats'
+# Prefix of the keys in `Connection.info` holding the start times of the statements being executed.
+_STARTED = 'wayfare_query_started'
+
+StatementCallback = Callable[[Connection, str, Any, bool, float], None]
+
+
+class QueryStats:
+    """Statements executed while handling one request.
+
+    Attributes:
+        count (int): Number of statements executed.
+        duration (float): Total time spent executing them, in seconds.
+        started (float): `time.perf_counter()` value when the request started.
+    """
+    __slots__ = ('count', 'duration', 'started', '_slowest', '_keep')
+
+    def __init__(self, keep: int = 3):
+        """Init a `QueryStats`.
+
+        Args:
+            keep (int): Number of slowest statements to remember.
+        """
+        self.count = 0
+        self.duration = 0.0
+        self.started = time.perf_counter()
+        # Min-heap of (duration, order, statement), holding the `keep` slowest statements.
+        self._slowest = []
+        self._keep = keep
+
+    def record(self, statement: str, duration: float):
+        """Record an executed statement.
+
+        Args:
+            statement (str): SQL of the statement.
+            duration (float): Time the statement took, in seconds.
+        """
+        self.count += 1
+        self.duration += duration
+        if self._keep <= 0:
+            return
+        item = (duration, self.count, statement)
+        if len(self._slowest) < self._keep:
+            heapq.heappush(self._slowest, item)
+        else:
+            heapq.heappushpop(self._slowest, item)
+
+    def slowest(self) -> List[Tuple[float, str]]:
+        """Return the slowest statements recorded, slowest first.
+
+        Returns:
+            List[Tuple[float, str]]: Duration in seconds and SQL of each statement.
+        """
+        return [(duration, statement) for duration, _, statement in sorted(self._slowest, reverse=True)]
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """Return the statistics of the request being handled.
+
+    Returns:
+        Optional[QueryStats]: Statistics of the current request, or None outside of a request or when
+            instrumentation is disabled.
+    """
+    if not has_request_context():
+        return None
+    return g.get(_STATS)
+
+
+def time_statements(engine: Engine, callback: StatementCallback):
+    """Call a function with the duration of every statement an engine executes successfully.
+
+    Args:
+        engine (Engine): Engine whose statements to time.
+        callback (StatementCallback): Function called on the thread that ran the statement, right after it,
+            with the connection, the SQL, its parameters, whether it was an `executemany` and its duration in
+            seconds.
+    """
+    # Each callback times statements separately, keeping its own start times in the connection.
+    key = f'{_STARTED}_{id(callback)}'
+
+    # pylint: disable=W0612,W0613
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(key, []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _end_statement(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info[key].pop()
+        callback(conn, statement, parameters, executemany, duration)
+
+    @event.listens_for(engine, 'handle_error')
+    def _fail_statement(exception_context):
+        connection = exception_context.connection
+        started = connection.info.get(key) if connection is not None else None
+        if started:
+            started.pop()
+
+
+def _format_server_timing(stats: QueryStats, total: float) -> List[str]:
+    """Build the `Server-Timing` header values for a request."""
+    return [f'db;desc="{stats.count} queries";dur={stats.duration * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}']
+
+
+def configure_sql_instrumentation(app: Flask, engine: Engine):
+    """Record the statements each request executes, if the app's `WAYFARE_SQL_INSTRUMENTATION` or
+    `WAYFARE_METRICS` is set.
+
+    Args:
+        app (Flask): App whose requests to instrument.
+        engine (Engine): Engine executing the app's statements.
+    """
+    report = app.config['WAYFARE_SQL_INSTRUMENTATION']
+    if not report and not app.config['WAYFARE_METRICS']:
+        return
+    keep = app.config['WAYFARE_SQL_SLOWEST']
+
+    def _record(conn, statement, parameters, executemany, duration):  # pylint: disable=W0613
+        stats = current_query_stats()
+        if stats is not None:
+            stats.record(statement, duration)
+    time_statements(engine, _record)
+
+    # pylint: disable=W0612
+    @app.before_request
+    def _start_request():
+        setattr(g, _STATS, QueryStats(keep))
+
+    if not report:
+        return
+
+    @app.after_request
+    def _end_request(response: Response) -> Response:
+        stats = current_query_stats()
+        if stats is None:
+            return response
+        total = time.perf_counter() - stats.started
+        for value in _format_server_timing(stats, total):
+            response.headers.add('Server-Timing', value)
+        if _logger.isEnabledFor(logging.DEBUG):
+            _logger.debug('%s %s: %d queries in %.1f ms of %.1f ms%s', request.method,
+                          request.full_path.rstrip('?'), stats.count, stats.duration * 1000, total * 1000,
+                          ''.join(f'\n    {duration * 1000:.1f} ms: {statement}'
+                                  for duration, statement in stats.slowest()))
+        return response
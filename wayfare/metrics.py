@@ -0,0 +1,268 @@
+"""Request metrics, exposed in the Prometheus text format at `/metrics`.
+
+When `WAYFARE_METRICS` is set, every request records its latency, request and response sizes and time
+spent in the database per resource and method, and `/metrics` reports them along with the requests in
+flight and the counters of the model caches.
+
+Recording takes no lock: each thread records into its own shard of counters, and a scrape adds the shards
+together. Shards of threads that have exited are folded into a single one, so short-lived request
+threads do not pile up. A scrape may see a request that is half recorded, such as a histogram whose
+count is ahead of its sum, which Prometheus tolerates.
+
+Each process has its own metrics: behind a prefork server, a scrape reports the worker that answered it.
+"""
+import bisect
+import threading
+import time
+
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from flask import Flask
+from flask import Response
+from flask import g
+from flask import request
+
+from wayfare.instrumentation import current_query_stats
+from wayfare.models import cache
+
+METRICS_URL = '/metrics'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+# Metric name -> (type, help).
+_METRICS = {
+    'wayfare_http_requests_total': ('counter', 'Requests handled, by resource, method and status code.'),
+    'wayfare_http_requests_in_flight': ('gauge', 'Requests being handled.'),
+    'wayfare_http_request_duration_seconds': ('histogram', 'Time spent handling requests.'),
+    'wayfare_http_request_size_bytes': ('histogram', 'Size of request bodies.'),
+    'wayfare_http_response_size_bytes': ('histogram', 'Size of response bodies, except streamed ones.'),
+    'wayfare_db_duration_seconds': ('histogram', 'Time each request spent executing SQL statements.'),
+    'wayfare_db_statements_total': ('counter', 'SQL statements executed while handling requests.'),
+    'wayfare_cache_hits_total': ('counter', 'Model cache lookups answered from the cache.'),
+    'wayfare_cache_misses_total': ('counter', 'Model cache lookups that queried the database.'),
+    'wayfare_cache_hit_ratio': ('gauge', 'Fraction of model cache lookups answered from the cache.'),
+    'wayfare_cache_size': ('gauge', 'Rows held by a model cache.')
+}
+# Key in `flask.g` holding the `time.perf_counter()` value when the request started.
+_STARTED = 'wayfare_metrics_started'
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class _Shard:
+    """Metric values recorded by one thread.
+
+    Attributes:
+        thread (threading.Thread): Thread recording into the shard, None for the shard of exited threads.
+        values (Dict[Tuple[str, Labels], float]): Counter and gauge values by name and labels.
+        histograms (Dict[Tuple[str, Labels], list]): Observation count per bucket, then the count above
+            every bucket and the sum of the observations, by name and labels.
+    """
+    __slots__ = ('thread', 'values', 'histograms')
+
+    def __init__(self, thread: threading.Thread = None):
+        self.thread = thread
+        self.values = {}
+        self.histograms = {}
+
+    def merge(self, other: '_Shard'):
+        """Add another shard's values to this one."""
+        for key, value in list(other.values.items()):
+            self.values[key] = self.values.get(key, 0) + value
+        for key, counts in list(other.histograms.items()):
+            merged = self.histograms.get(key)
+            if merged is None:
+                self.histograms[key] = list(counts)
+            else:
+                for index, count in enumerate(counts):
+                    merged[index] += count
+
+
+class Registry:
+    """Counters, gauges and histograms recorded without locks, one shard per thread."""
+    def __init__(self):
+        """Init an empty `Registry`."""
+        self._local = threading.local()
+        self._lock = threading.Lock()  # Only taken to add a shard and to scrape.
+        self._shards = []
+        self._exited = _Shard()
+        self._buckets = {}  # Histogram name -> bucket upper bounds.
+
+    def inc(self, name: str, labels: Labels = (), amount: float = 1):
+        """Add to a counter or gauge.
+
+        Args:
+            name (str): Metric name.
+            labels (Labels): Label names and values.
+            amount (float): Amount to add, negative to decrease a gauge.
+        """
+        values = self._shard().values
+        key = (name, labels)
+        values[key] = values.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, labels: Labels = (),
+                buckets: Sequence[float] = LATENCY_BUCKETS):
+        """Record an observation in a histogram.
+
+        Args:
+            name (str): Metric name.
+            value (float): Observed value.
+            labels (Labels): Label names and values.
+            buckets (Sequence[float]): Sorted bucket upper bounds. Every observation of a histogram must use
+                the same buckets.
+        """
+        histograms = self._shard().histograms
+        key = (name, labels)
+        counts = histograms.get(key)
+        if counts is None:
+            self._buckets.setdefault(name, tuple(buckets))
+            counts = histograms[key] = [0] * (len(buckets) + 2)
+        counts[bisect.bisect_left(buckets, value)] += 1
+        counts[-1] += value
+
+    def collect(self) -> _Shard:
+        """Return the sum of every shard."""
+        total = _Shard()
+        with self._lock:
+            self._fold_exited()
+            shards = list(self._shards)
+            total.merge(self._exited)
+        for shard in shards:
+            total.merge(shard)
+        return total
+
+    def buckets(self, name: str) -> Tuple[float, ...]:
+        """Return the bucket upper bounds of a histogram."""
+        return self._buckets[name]
+
+    def _shard(self) -> _Shard:
+        """Return the current thread's shard, creating it on first use."""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._fold_exited()
+                self._shards.append(shard)
+        return shard
+
+    def _fold_exited(self):
+        """Fold the shards of exited threads, which nothing writes to anymore, into one. Needs `_lock`."""
+        alive = []
+        for shard in self._shards:
+            if shard.thread.is_alive():
+                alive.append(shard)
+            else:
+                self._exited.merge(shard)
+        self._shards = alive
+
+
+def _format_labels(labels: Labels) -> str:
+    """Format labels as `{name="value",...}`."""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_number(value: float) -> str:
+    """Format a sample value or bucket bound."""
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _exposition(registry: Registry) -> Iterator[str]:
+    """Generate the lines of the Prometheus text format for a registry and the model caches."""
+    total = registry.collect()
+    for cache_name, counters in cache.stats().items():
+        labels = (('cache', cache_name),)
+        total.values[('wayfare_cache_hits_total', labels)] = counters['hits']
+        total.values[('wayfare_cache_misses_total', labels)] = counters['misses']
+        total.values[('wayfare_cache_hit_ratio', labels)] = counters['hit_ratio']
+        total.values[('wayfare_cache_size', labels)] = counters['size']
+    samples = {}  # Metric name -> lines.
+    for (name, labels), value in sorted(total.values.items()):
+        samples.setdefault(name, []).append(f'{name}{_format_labels(labels)} {_format_number(value)}')
+    for (name, labels), counts in sorted(total.histograms.items()):
+        lines = samples.setdefault(name, [])
+        cumulative = 0
+        for bound, count in zip(registry.buckets(name) + ('+Inf',), counts):
+            cumulative += count
+            bucket_labels = labels + (('le', bound if bound == '+Inf' else _format_number(bound)),)
+            lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {_format_number(counts[-1])}')
+        lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+    for name, (metric_type, help_text) in _METRICS.items():
+        if name in samples:
+            yield f'# HELP {name} {help_text}'
+            yield f'# TYPE {name} {metric_type}'
+            yield from samples[name]
+
+
+def render(registry: Registry) -> str:
+    """Render a registry's metrics and the model cache counters in the Prometheus text format.
+
+    Args:
+        registry (Registry): Registry to render.
+
+    Returns:
+        str: Metrics, one sample per line.
+    """
+    return ''.join(f'{line}\n' for line in _exposition(registry))
+
+
+def configure_metrics(app: Flask) -> Optional[Registry]:
+    """Record request metrics and serve them at `METRICS_URL`, if the app's `WAYFARE_METRICS` is set.
+
+    Args:
+        app (Flask): App whose requests to measure.
+
+    Returns:
+        Optional[Registry]: Registry the app records into, None if metrics are disabled.
+    """
+    if not app.config['WAYFARE_METRICS']:
+        return None
+    registry = Registry()
+    app.extensions['wayfare_metrics'] = registry
+
+    @app.before_request
+    def _start_request():  # pylint: disable=W0612
+        setattr(g, _STARTED, time.perf_counter())
+        registry.inc('wayfare_http_requests_in_flight')
+
+    @app.after_request
+    def _end_request(response: Response) -> Response:  # pylint: disable=W0612
+        started = g.get(_STARTED)
+        if started is None:
+            return response
+        labels = (('resource', request.endpoint or 'none'), ('method', request.method))
+        registry.observe('wayfare_http_request_duration_seconds', time.perf_counter() - started, labels)
+        registry.inc('wayfare_http_requests_total', labels + (('status', str(response.status_code)),))
+        registry.observe('wayfare_http_request_size_bytes', request.content_length or 0, labels, SIZE_BUCKETS)
+        size = response.content_length
+        if size is not None:
+            registry.observe('wayfare_http_response_size_bytes', size, labels, SIZE_BUCKETS)
+        stats = current_query_stats()
+        if stats is not None:
+            registry.observe('wayfare_db_duration_seconds', stats.duration, labels)
+            registry.inc('wayfare_db_statements_total', labels, stats.count)
+        return response
+
+    @app.teardown_request
+    def _finish_request(exception):  # pylint: disable=W0612,W0613
+        if g.pop(_STARTED, None) is not None:
+            registry.inc('wayfare_http_requests_in_flight', amount=-1)
+
+    @app.route(METRICS_URL)
+    def _metrics():  # pylint: disable=W0612
+        return Response(render(registry), content_type=CONTENT_TYPE)
+
+    return registry
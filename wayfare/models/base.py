@@ -1,12 +1,25 @@
 # pylint: disable=E1101
 """Base model providing data access methods."""
+import contextlib
+
+from datetime import datetime
+from typing import Iterable
+from typing import Iterator
 from typing import List
+from typing import Optional
+from typing import Tuple
 from typing import TypeVar
 
+from sqlalchemy.orm import Query
+from sqlalchemy.orm import Session
+
 from wayfare import db
+from wayfare.models.cache import TRANSACTION_DEPTH as _TRANSACTION_DEPTH
+from wayfare.models.cache import invalidate_later
 
 
 T = TypeVar('T', bound='AbstractModelBase')
+_DEFAULT_BATCH_SIZE = 1000
 
 
 class AbstractModelBase(db.Model):
@@ -21,18 +34,81 @@ class AbstractModelBase(db.Model):
     """
     __abstract__ = True
 
+    # Cache answering this model's lookups, if any. Writes made through the methods below invalidate it.
+    _cache = None
+
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    date_created = db.Column(db.DateTime, default=db.func.current_timestamp())
-    date_modified = db.Column(
-        db.DateTime,
-        default=db.func.current_timestamp(),
-        onupdate=db.func.current_timestamp()
-    )
+    # UTC timestamps set in Python rather than with CURRENT_TIMESTAMP, which SQLite only resolves to the
+    # second. `date_modified` versions each row, so two updates in the same second must differ.
+    date_created = db.Column(db.DateTime, default=datetime.utcnow)
+    date_modified = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def transaction() -> Iterator[Session]:
+        """Group model changes into a single atomic commit.
+
+        Inside the block, `create`, `update_instance`, `delete_instance` and `delete_all` flush their changes
+        instead of committing them. Everything is committed together when the block exits, or rolled back if
+        it raises. Nested blocks join the outermost one. A write that fails inside the block (such as a
+        duplicate email) raises without rolling anything back, so the outermost block rolls back the whole
+        transaction once the error propagates out of it. Do not catch such an error inside the block to carry
+        on: the writes made before it are still pending, and a failed flush makes the block's commit fail.
+
+        Example:
+            with AbstractModelBase.transaction():
+                ride.create()
+                passenger.create()
+
+        Yields:
+            The database session.
+        """
+        depth = db.session.info.get(_TRANSACTION_DEPTH, 0)
+        db.session.info[_TRANSACTION_DEPTH] = depth + 1
+        try:
+            yield db.session
+            if not depth:
+                db.session.commit()
+        except BaseException:
+            if not depth:
+                db.session.rollback()
+            raise
+        finally:
+            db.session.info[_TRANSACTION_DEPTH] = depth
+
+    @staticmethod
+    def commit():
+        """Commit the current session, or only flush it inside a `transaction` block."""
+        if db.session.info.get(_TRANSACTION_DEPTH):
+            db.session.flush()
+        else:
+            db.session.commit()
+
+    @staticmethod
+    def rollback():
+        """Roll back the current session after a failed write, unless inside a `transaction` block.
+
+        Inside a block, rolling back here would discard the block's earlier writes while it carries on, so the
+        rollback is left to the outermost block.
+        """
+        if not db.session.info.get(_TRANSACTION_DEPTH):
+            db.session.rollback()
+
+    @classmethod
+    def invalidate_cache(cls, model_id: int = None):
+        """Invalidate this model's cache, if it has one, now and when the current transaction ends.
+
+        Args:
+            model_id (int): id of the changed instance, None if unknown or if many changed.
+        """
+        if cls._cache is not None:
+            invalidate_later(db.session, cls._cache, model_id)
 
     def create(self):
         """Add this model instance to the database."""
         db.session.add(self)
-        db.session.commit()
+        self.invalidate_cache(self.id)
+        self.commit()
 
     def update_instance(self, new_fields: dict):
         """Update this model instance in the database.
@@ -41,25 +117,133 @@ class AbstractModelBase(db.Model):
             new_fields (dict): Dict containing new values for this `User`.
         """
         db.session.query(self.__class__).filter_by(id=self.id).update(new_fields)
-        db.session.commit()
+        self.invalidate_cache(self.id)
+        self.commit()
 
     def delete_instance(self):
         """Delete this model instance from the database."""
         db.session.query(self.__class__).filter_by(id=self.id).delete()
-        db.session.commit()
+        self.invalidate_cache(self.id)
+        self.commit()
+
+    @classmethod
+    def find_date_modified(cls, model_id: int) -> Optional[datetime]:
+        """Look up when a model instance was last modified without loading the rest of its row.
+
+        Args:
+            model_id (int): id to match.
+
+        Returns:
+            datetime: `date_modified` of the instance with the given id if found, None if not found.
+        """
+        if cls._cache is not None:
+            values = cls._cache.peek(model_id)
+            if values is not None:
+                return values['date_modified']
+        row = db.session.query(cls.date_modified).filter(cls.id == model_id).first()
+        return row.date_modified if row else None
 
     @classmethod
-    def get_all(cls) -> List[T]:
+    def get_all(cls, batch_size: int = _DEFAULT_BATCH_SIZE, columns: Iterable[str] = None) -> Iterator[T]:
         """Iterate through all model instances in the database.
 
-        NOTE: This method can be very memory-intensive and should not be used in production.
+        Rows are fetched from the database `batch_size` at a time, so memory use stays flat no matter how
+        large the table is as long as the caller does not hold on to the instances.
+
+        Args:
+            batch_size (int): Number of rows to load into ORM instances at a time.
+            columns (Iterable[str]): Names of the columns to load, see `select`. None to load instances.
+
+        Returns:
+            Iterator over every instance of this model in the database, in id order.
+        """
+        return cls.stream(cls.select(columns), batch_size)
+
+    @classmethod
+    def select(cls, columns: Iterable[str] = None) -> Query:
+        """Start a query over this model, optionally loading only some of its columns.
+
+        Args:
+            columns (Iterable[str]): Names of the columns to load. None to load whole model instances.
+
+        Returns:
+            Query over model instances, or over plain rows with `id` and the named columns if `columns` is
+            given.
+        """
+        query = db.session.query(cls)
+        return cls.project(query, columns) if columns else query
+
+    @classmethod
+    def project(cls, query: Query, columns: Iterable[str]) -> Query:
+        """Narrow a query over this model to some of its columns.
+
+        The rows are plain named tuples rather than ORM instances, so nothing but the named columns is read
+        or hydrated. `id` is always selected so the rows can still be paginated.
+
+        Args:
+            query (Query): Query selecting instances of this model.
+            columns (Iterable[str]): Names of the columns to select.
+
+        Returns:
+            Query over rows with `id` and the named columns as attributes.
+        """
+        names = ['id'] + [name for name in columns if name != 'id']
+        return query.with_entities(*(getattr(cls, name) for name in names))
+
+    @classmethod
+    def stream(cls, query: Query, batch_size: int = _DEFAULT_BATCH_SIZE) -> Iterator[T]:
+        """Iterate through every result of a query over this model.
+
+        Args:
+            query (Query): Query selecting instances of this model.
+            batch_size (int): Number of rows to load into ORM instances at a time.
 
         Yields:
-            Next instance of this model in the database.
+            Next instance matched by the query, in id order.
         """
-        for model in db.session.query(cls):
+        for model in query.order_by(cls.id).yield_per(batch_size):
             yield model
 
+    @classmethod
+    def get_page(cls, limit: int, after: int = None,
+                 columns: Iterable[str] = None) -> Tuple[List[T], Optional[int]]:
+        """Fetch one page of model instances ordered by id.
+
+        Args:
+            limit (int): Maximum number of instances to return.
+            after (int): Cursor returned with the previous page. None to fetch the first page.
+            columns (Iterable[str]): Names of the columns to load, see `select`. None to load instances.
+
+        Returns:
+            Tuple of the instances in this page and the cursor for the next page (None if this is the last
+            page).
+        """
+        return cls.paginate(cls.select(columns), limit, after)
+
+    @classmethod
+    def paginate(cls, query: Query, limit: int, after: int = None) -> Tuple[List[T], Optional[int]]:
+        """Fetch one page of a query over this model using keyset (cursor) pagination.
+
+        Rows are selected with `id > after` rather than an OFFSET, so each page is a primary key index seek
+        and costs the same no matter how deep the client has paged.
+
+        Args:
+            query (Query): Query selecting instances of this model.
+            limit (int): Maximum number of instances to return.
+            after (int): id of the last instance on the previous page. None to fetch the first page.
+
+        Returns:
+            Tuple of the instances in this page and the cursor for the next page (None if this is the last
+            page).
+        """
+        if after is not None:
+            query = query.filter(cls.id > after)
+        # Fetch one extra row to find out whether another page exists without a separate COUNT.
+        models = query.order_by(cls.id).limit(limit + 1).all()
+        if len(models) > limit:
+            return models[:limit], models[limit - 1].id
+        return models, None
+
     @classmethod
     def delete_all(cls):
         """Delete all instances of this model in the database.
@@ -67,4 +251,5 @@ class AbstractModelBase(db.Model):
         NOTE: This method is incredibly desctructive and should not be used in production.
         """
         db.session.query(cls).delete()
-        db.session.commit()
+        cls.invalidate_cache()
+        cls.commit()
@@ -0,0 +1,363 @@
+"""Process-local caches in front of model lookups.
+
+Caches hold plain column values rather than ORM instances and hand out a fresh detached instance on every
+hit, so a cached object is never shared between threads or tied to a finished database session.
+
+Writes made through `AbstractModelBase` invalidate the model's cache immediately, and again when the
+session commits or rolls back. Until then, and inside any `AbstractModelBase.transaction` block, the
+session's lookups bypass the caches: they read its own writes from the database but never cache them, so
+other threads cannot see rows that might still be rolled back. Each process keeps its own caches, so
+writes made by other processes, including out-of-band inserts such as `app.py seed`, are only seen once
+the cached data is older than the cache's TTL. An `EntityCache` would serve a row, and the `ETag` of a
+conditional GET, for up to its TTL after another process changed it, so `wayfare.server` disables them
+when it runs several worker processes.
+"""
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from wayfare import db
+
+# Key in `Session.info` holding the caches to invalidate again once the session's transaction ends.
+_PENDING_INVALIDATIONS = 'wayfare_pending_cache_invalidations'
+# Key in `Session.info` counting the `AbstractModelBase.transaction` blocks the session is inside of.
+TRANSACTION_DEPTH = 'wayfare_transaction_depth'
+
+DEFAULT_ENTITY_CACHE_SIZE = 10000
+DEFAULT_ENTITY_CACHE_TTL = 30.0
+DEFAULT_REFERENCE_CACHE_TTL = 60.0
+
+_caches = []  # pylint: disable=C0103
+
+
+def _detached_copy(model_class: type, values: Dict[str, Any]) -> Any:
+    """Build a detached instance of a model from cached column values, bypassing its validators."""
+    instance = inspect(model_class).class_manager.new_instance()
+    for key, value in values.items():
+        set_committed_value(instance, key, value)
+    make_transient_to_detached(instance)
+    return instance
+
+
+def _in_transaction(session: Session) -> bool:
+    """Tell whether a session may read writes of its own that are not committed yet."""
+    return bool(session.info.get(_PENDING_INVALIDATIONS) or session.info.get(TRANSACTION_DEPTH))
+
+
+def _column_values(model: Any) -> Dict[str, Any]:
+    """Read the column values of a loaded model instance."""
+    return {attribute.key: getattr(model, attribute.key) for attribute in inspect(model).mapper.column_attrs}
+
+
+class ReferenceCache:
+    """Read-through cache holding every row of a small, rarely written table.
+
+    The whole table is loaded by the first lookup after the cache is created, invalidated or older than its
+    TTL. Later lookups by id or by a natural key are dict lookups that issue no queries. Rows written by
+    other processes, such as `app.py seed` or other workers, are only seen once the table is reloaded, so
+    the TTL bounds how long they are missed.
+
+    Attributes:
+        hits (int): Lookups answered without querying the database.
+        misses (int): Lookups that had to load the table first, including those of a session in a
+            transaction, which bypass the cache.
+        expirations (int): Loads of the table caused by the TTL.
+    """
+    def __init__(self, model_class: type, natural_keys: Iterable[str] = (),
+                 ttl: float = DEFAULT_REFERENCE_CACHE_TTL):
+        """Init a `ReferenceCache` for a model.
+
+        Args:
+            model_class (type): Model whose table to cache.
+            natural_keys (Iterable[str]): Columns to index for `find`. If several rows share a value, the
+                row with the lowest id wins, as with an unordered `first()`.
+            ttl (float): Seconds the table may be served from the cache after it was loaded.
+        """
+        self.model_class = model_class
+        self.natural_keys = tuple(natural_keys)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._loaded = None  # (expiry time, rows indexed by id and natural key)
+        _caches.append(self)
+
+    def configure(self, ttl: float):
+        """Change the cache's TTL, dropping the cached table.
+
+        Args:
+            ttl (float): Seconds the table may be served from the cache after it was loaded.
+        """
+        with self._lock:
+            self.ttl = ttl
+            self._generation += 1
+            self._loaded = None
+
+    def get(self, model_id: int) -> Optional[Any]:
+        """Look up a model instance by id.
+
+        Returns:
+            A detached copy of the instance if found, None if not found.
+        """
+        values = self._load()['id'].get(model_id)
+        return _detached_copy(self.model_class, values) if values else None
+
+    def find(self, key: str, value: Any) -> Optional[Any]:
+        """Look up a model instance by one of the cache's natural keys.
+
+        Returns:
+            A detached copy of the instance if found, None if not found.
+        """
+        values = self._load()[key].get(value)
+        return _detached_copy(self.model_class, values) if values else None
+
+    def peek(self, model_id: int) -> Optional[Dict[str, Any]]:
+        """Return the cached column values of a row without loading the table or counting a lookup.
+
+        Returns:
+            dict: Column values if the table is loaded and fresh and has the row, None otherwise or if the
+                session is in a transaction.
+        """
+        loaded = self._loaded
+        if loaded is None or loaded[0] <= time.monotonic() or _in_transaction(db.session):
+            return None
+        return loaded[1]['id'].get(model_id)
+
+    def invalidate(self, model_id: int = None):  # pylint: disable=W0613
+        """Discard the cached table. It is reloaded by the next lookup.
+
+        Args:
+            model_id (int): id of the changed row. Any write discards the whole table.
+        """
+        with self._lock:
+            self._generation += 1
+            self._loaded = None
+
+    def stats(self) -> dict:
+        """Return the cache's counters."""
+        loaded = self._loaded
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': _ratio(self.hits, self.misses),
+            'expirations': self.expirations,
+            'size': len(loaded[1]['id']) if loaded else 0
+        }
+
+    def _load(self) -> Dict[str, Dict[Any, Dict[str, Any]]]:
+        """Return the cached rows indexed by id and natural key, loading them if needed."""
+        now = time.monotonic()
+        in_transaction = _in_transaction(db.session)
+        with self._lock:
+            loaded = self._loaded
+            if loaded is not None and not in_transaction:
+                if loaded[0] > now:
+                    self.hits += 1
+                    return loaded[1]
+                self.expirations += 1
+            self.misses += 1
+            generation = self._generation
+        rows = {key: {} for key in ('id',) + self.natural_keys}
+        for model in db.session.query(self.model_class).order_by(self.model_class.id):
+            values = _column_values(model)
+            rows['id'][model.id] = values
+            for key in self.natural_keys:
+                rows[key].setdefault(values[key], values)
+        if in_transaction:
+            return rows
+        with self._lock:
+            # Do not install rows read before a write that invalidated the cache in the meantime.
+            if generation == self._generation:
+                self._loaded = (now + self.ttl, rows)
+        return rows
+
+
+class EntityCache:
+    """Read-through cache of individual rows by id, bounded by size (LRU) and age (TTL).
+
+    Only rows that exist are cached, so creating a row never needs an invalidation. Writes made through
+    the models in this process are seen immediately, but a row changed by another process is served stale
+    until it outlives the TTL. Do not enable it where several processes write to the database.
+
+    Attributes:
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that queried the database, including those of a session in a transaction,
+            which bypass the cache.
+        evictions (int): Rows dropped to stay within `max_size`.
+        expirations (int): Rows dropped because they outlived `ttl`.
+    """
+    def __init__(self, model_class: type,
+                 max_size: int = DEFAULT_ENTITY_CACHE_SIZE,
+                 ttl: float = DEFAULT_ENTITY_CACHE_TTL,
+                 register: bool = True):
+        """Init an `EntityCache` for a model.
+
+        Args:
+            model_class (type): Model whose rows to cache.
+            max_size (int): Maximum number of rows to keep. 0 disables the cache.
+            ttl (float): Seconds a row may be served from the cache after it was loaded.
+            register (bool): True to report the cache in `stats` and `/metrics` and apply
+                `configure_entity_caches` to it. False for standalone caches, such as in tests.
+        """
+        self.model_class = model_class
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._entries = OrderedDict()  # id -> (expiry time, column values), least recently used first.
+        if register:
+            _caches.append(self)
+
+    def configure(self, max_size: int, ttl: float):
+        """Change the cache's bounds, dropping every cached row.
+
+        Args:
+            max_size (int): Maximum number of rows to keep. 0 disables the cache.
+            ttl (float): Seconds a row may be served from the cache after it was loaded.
+        """
+        with self._lock:
+            self.max_size = max_size
+            self.ttl = ttl
+            self._generation += 1
+            self._entries.clear()
+
+    def get(self, model_id: int) -> Optional[Any]:
+        """Look up a model instance by id.
+
+        Returns:
+            A detached copy of the instance if found, None if not found.
+        """
+        now = time.monotonic()
+        in_transaction = _in_transaction(db.session)
+        with self._lock:
+            entry = self._entries.get(model_id)
+            if entry is not None and not in_transaction:
+                if entry[0] > now:
+                    self._entries.move_to_end(model_id)
+                    self.hits += 1
+                    return _detached_copy(self.model_class, entry[1])
+                del self._entries[model_id]
+                self.expirations += 1
+            self.misses += 1
+            generation = self._generation
+        model = db.session.query(self.model_class).get(model_id)
+        if model is None:
+            return None
+        values = _column_values(model)
+        with self._lock:
+            # Do not install a row read before a write that invalidated the cache in the meantime.
+            if generation == self._generation and self.max_size > 0 and not in_transaction:
+                self._entries[model_id] = (now + self.ttl, values)
+                self._entries.move_to_end(model_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return _detached_copy(self.model_class, values)
+
+    def peek(self, model_id: int) -> Optional[Dict[str, Any]]:
+        """Return the cached column values of a row without querying the database or counting a lookup.
+
+        Returns:
+            dict: Column values if the row is cached and fresh, None otherwise or if the session is in a
+                transaction.
+        """
+        if _in_transaction(db.session):
+            return None
+        with self._lock:
+            entry = self._entries.get(model_id)
+        return entry[1] if entry is not None and entry[0] > time.monotonic() else None
+
+    def invalidate(self, model_id: int = None):
+        """Drop a cached row.
+
+        Args:
+            model_id (int): id of the changed row. None drops every row.
+        """
+        with self._lock:
+            self._generation += 1
+            if model_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(model_id, None)
+
+    def stats(self) -> dict:
+        """Return the cache's counters."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': _ratio(self.hits, self.misses),
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'size': len(self._entries),
+            'max_size': self.max_size
+        }
+
+
+def _ratio(hits: int, misses: int) -> float:
+    """Return the fraction of lookups that were hits."""
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+def configure_entity_caches(max_size: int, ttl: float):
+    """Change the bounds of every `EntityCache`.
+
+    Args:
+        max_size (int): Maximum number of rows each cache keeps. 0 disables the caches.
+        ttl (float): Seconds a row may be served from a cache after it was loaded.
+    """
+    for cache in _caches:
+        if isinstance(cache, EntityCache):
+            cache.configure(max_size, ttl)
+
+
+def configure_reference_caches(ttl: float):
+    """Change the TTL of every `ReferenceCache`.
+
+    Args:
+        ttl (float): Seconds a table may be served from a cache after it was loaded.
+    """
+    for cache in _caches:
+        if isinstance(cache, ReferenceCache):
+            cache.configure(ttl)
+
+
+def invalidate_later(session: Session, cache: Any, model_id: int = None):
+    """Invalidate a cache now and again when the session's transaction commits or rolls back.
+
+    Args:
+        session (Session): Session the write was made in.
+        cache: Cache to invalidate.
+        model_id (int): id of the changed row, None if unknown.
+    """
+    cache.invalidate(model_id)
+    session.info.setdefault(_PENDING_INVALIDATIONS, []).append((cache, model_id))
+
+
+def stats() -> Dict[str, dict]:
+    """Return the counters of every cache, keyed by model table name."""
+    return {cache.model_class.__tablename__: cache.stats() for cache in _caches}
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_soft_rollback')
+def _invalidate_pending(session: Session, *args):  # pylint: disable=W0613
+    """Replay the invalidations recorded during a transaction once it has ended."""
+    for cache, model_id in session.info.pop(_PENDING_INVALIDATIONS, ()):
+        cache.invalidate(model_id)
@@ -6,6 +6,7 @@ from wayfare import db
 from wayfare import models
 
 from wayfare.models import AbstractModelBase
+from wayfare.models.cache import ReferenceCache
 
 
 LocationType = TypeVar('LocationType', bound='Location')
@@ -28,7 +29,7 @@ class Location(AbstractModelBase):
         Returns:
             `Location` with the given id if found, None if not found.
         """
-        return db.session.query(Location).get(location_id)
+        return Location._cache.get(location_id)
 
     @staticmethod
     def find_by_name(name: str) -> LocationType:
@@ -40,7 +41,7 @@ class Location(AbstractModelBase):
         Returns:
             `Location` with the given name if found, None if not found.
         """
-        return db.session.query(Location).filter(Location.name == name).first()
+        return Location._cache.find('name', name)
 
     def __repr__(self) -> str:
         """Return a string representation of this `Location`."""
@@ -49,3 +50,6 @@ class Location(AbstractModelBase):
     def __str__(self) -> str:
         """Return this `Location` as a friendly string."""
         return f"{self.id}. {self.name}"
+
+
+Location._cache = ReferenceCache(Location, natural_keys=('name',))  # pylint: disable=W0212
@@ -4,10 +4,17 @@ from typing import List, TypeVar
 
 from wayfare import db
 from wayfare import models
+from wayfare.exceptions import AlreadyPassengerError
+from wayfare.exceptions import RideFullError
 from wayfare.models import AbstractModelBase
+from wayfare.models import Status
 
 
 PassengerType = TypeVar('PassengerType', bound='Location')
+# Descriptions of the statuses that hold a seat in a ride. Any other status, such as 'Declined', frees it.
+HOLDING_STATUSES = ('Pending', 'Confirmed')
+# Description of the status of a newly reserved seat.
+RESERVED_STATUS = 'Pending'
 
 # TODO: Make this just a table, move functionality for passenger status into User and Ride models.
 
@@ -15,6 +22,12 @@ PassengerType = TypeVar('PassengerType', bound='Location')
 class Passenger(AbstractModelBase):
     """Data access object providing a static interface to a Passenger table."""
     __tablename__ = models.tables.PASSENGER
+    __table_args__ = (
+        # Covers looking up the rides of a user, see `Ride.find_by_member`.
+        db.Index('ix_passenger_user', 'user_id', 'ride_id'),
+        # Covers counting the seats held in a ride, see `Ride.recount_seats`.
+        db.Index('ix_passenger_ride', 'ride_id', 'user_id'),
+    )
 
     # Column Attributes
     user_id = db.Column(db.Integer,
@@ -41,14 +54,89 @@ class Passenger(AbstractModelBase):
                     uselist=False,
                     lazy='dynamic')
 
-    def update(self, new_status: int):
+    def create(self, reserve: bool = False):
+        """Add this `Passenger` to the database, updating the seats available in its ride.
+
+        A passenger's status is the status of their latest row for the ride, so the new row frees the seat
+        the previous one held, or takes one, in the same transaction.
+
+        Args:
+            reserve (bool): True to only add the row if it takes a free seat, see
+                `Ride.apply_passenger_status`.
+
+        Raises:
+            `AlreadyPassengerError`: With `reserve`, if the user already holds a seat in the ride.
+            `RideFullError`: With `reserve`, if the ride has no seats available or does not exist.
+        """
+        with self.transaction():
+            updated = models.Ride.apply_passenger_status(self.ride_id, self.user_id, self.status_id, reserve)
+            if reserve and not updated:
+                if models.Ride.holds_seat(self.ride_id, self.user_id):
+                    raise AlreadyPassengerError(self.user_id, self.ride_id)
+                raise RideFullError(self.ride_id)
+            super().create()
+
+    @staticmethod
+    def reserve(ride_id: int, user_id: int) -> PassengerType:
+        """Reserve a seat in a ride for a user, as a passenger with the `RESERVED_STATUS`.
+
+        Args:
+            ride_id (int): id of the ride.
+            user_id (int): id of the user.
+
+        Returns:
+            The new `Passenger`.
+
+        Raises:
+            `AlreadyPassengerError`: If the user already holds a seat in the ride.
+            `RideFullError`: If the ride has no seats available or does not exist.
+            LookupError: If the `RESERVED_STATUS` status does not exist.
+        """
+        status = Status.find_by_description(RESERVED_STATUS)
+        if status is None:
+            raise LookupError(f"Status '{RESERVED_STATUS}' does not exist")
+        passenger = Passenger(user_id=user_id, ride_id=ride_id, status_id=status.id)
+        passenger.create(reserve=True)
+        return passenger
+
+    def update(self, new_status: int) -> PassengerType:
         """Update a passenger status by creating a new row.
 
         Args:
             new_status (int): id of new status.
+
+        Returns:
+            The new `Passenger` row.
+        """
+        passenger = Passenger(user_id=self.user_id, ride_id=self.ride_id, status_id=new_status)
+        passenger.create()
+        return passenger
+
+    def update_instance(self, new_fields: dict):
+        """Update this `Passenger` in the database, recounting the seats of the rides it moves between.
+
+        Args:
+            new_fields (dict): Dict containing new values for this `Passenger`.
+        """
+        with self.transaction():
+            super().update_instance(new_fields)
+            models.Ride.recount_seats({self.ride_id, new_fields.get('ride_id', self.ride_id)})
+
+    def delete_instance(self):
+        """Delete this `Passenger` from the database, recounting the seats of its ride."""
+        with self.transaction():
+            super().delete_instance()
+            models.Ride.recount_seats([self.ride_id])
+
+    @classmethod
+    def delete_all(cls):
+        """Delete all passengers in the database, freeing every seat.
+
+        NOTE: This method is incredibly desctructive and should not be used in production.
         """
-        # This should create a new row.
-        pass
+        with cls.transaction():
+            super().delete_all()
+            models.Ride.recount_seats()
 
     @staticmethod
     def find_by_id(id: int) -> PassengerType:  # pylint: disable=C0103
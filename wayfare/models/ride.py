@@ -1,27 +1,113 @@
 # pylint: disable=E1101
 """Class wrapping a Ride table."""
-from typing import List, TypeVar
+from typing import Iterable, List, Optional, Tuple, TypeVar
 
+from datetime import date
 from datetime import datetime
+from datetime import time
+from datetime import timedelta
+
+from sqlalchemy import and_
+from sqlalchemy import func
+from sqlalchemy import literal
+from sqlalchemy import null
+from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy import union_all
+from sqlalchemy.orm import Query
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import selectinload
+from sqlalchemy.sql import Join
+from sqlalchemy.sql import Select
 
 from wayfare import db
 from wayfare import models
 
+from wayfare.exceptions import CapacityBelowHeldSeatsError
 from wayfare.exceptions import InvalidCapacityError
 from wayfare.models import AbstractModelBase
 from wayfare.models import Location
 from wayfare.models import TimeRange
 from wayfare.models import User
 from wayfare.models import Passenger
+from wayfare.models import Status
+from wayfare.models.cache import EntityCache
+from wayfare.models.passenger import HOLDING_STATUSES
 
 
 RideType = TypeVar('RideType', bound='Ride')
 _MAX_CAPACITY = 8  # assuming 8 seats are reasonable number excluding driver
+# SQLite's default limit on bound parameters per statement (before 3.32).
+_MAX_IN_PARAMETERS = 999
+# Roles a user can have in a ride, as reported by `find_by_member`.
+ROLE_DRIVER = 'driver'
+ROLE_PASSENGER = 'passenger'
+# Relationships `expand` can eager-load.
+EXPANDABLE_RELATIONSHIPS = ('driver', 'start_location', 'destination', 'time_range', 'passengers')
+
+
+def _default_seats_available(context) -> int:
+    """Start a new ride with all of its seats available."""
+    return context.get_current_parameters().get('capacity') or 0
+
+
+def _passengers_with_status() -> Join:
+    """Join passenger rows to their status."""
+    return Passenger.__table__.join(Status.__table__, Passenger.status_id == Status.id)
+
+
+def _users_passengers_with_status() -> Join:
+    """Join passenger rows to their status and user, leaving out the passengers of deleted users."""
+    return _passengers_with_status().join(User.__table__, Passenger.user_id == User.id)
+
+
+def _holds_seat(ride_id: int, user_id: int) -> Select:
+    """Build a scalar subquery that is 1 if a user's latest passenger row for a ride holds a seat, else 0."""
+    latest_passenger = (select([func.max(Passenger.id)])
+                        .where(Passenger.ride_id == ride_id)
+                        .where(Passenger.user_id == user_id)
+                        .as_scalar())
+    return (select([func.count()])
+            .select_from(_passengers_with_status())
+            .where(Passenger.id == latest_passenger)
+            .where(Status.description.in_(HOLDING_STATUSES))
+            .as_scalar())
+
+
+def _count_held_seats(ride_id) -> Select:
+    """Count the passengers holding a seat in a ride.
+
+    Args:
+        ride_id: id of the ride, or `Ride.id` to correlate the count with an enclosing statement over rides.
+
+    Returns:
+        Select: Scalar subquery counting the passengers whose latest row for the ride has one of the
+            `HOLDING_STATUSES`. Passengers whose user was deleted, for example without a cascading delete,
+            hold no seat.
+    """
+    rows = Passenger.__table__.alias('latest')
+    latest_passengers = (select([func.max(rows.c.id)])
+                         .where(rows.c.ride_id == ride_id)
+                         .group_by(rows.c.user_id)
+                         .correlate_except(rows))
+    return (select([func.count()])
+            .select_from(_users_passengers_with_status())
+            .where(Passenger.id.in_(latest_passengers))
+            .where(Status.description.in_(HOLDING_STATUSES))
+            .as_scalar())
 
 
 class Ride(AbstractModelBase):
     """Data access object providing a static interface to a Ride table."""
     __tablename__ = models.tables.RIDE
+    __table_args__ = (
+        # Covers `search`: equality on both locations, then a range over the departure date. Rides without
+        # enough seats are filtered out from the index entries, without reading their rows.
+        db.Index('ix_ride_search',
+                 'start_location_id', 'destination_id', 'departure_date', 'seats_available'),
+        # Covers the driver half of `find_by_member`.
+        db.Index('ix_ride_driver', 'driver_id', 'departure_date'),
+    )
 
     # Column Attributes
     #actual_departure_time and departure_date were originally db.DateTime
@@ -30,6 +116,9 @@ class Ride(AbstractModelBase):
     actual_departure_time = db.Column(db.DateTime)
     departure_date = db.Column(db.DateTime)
     capacity = db.Column(db.Integer)
+    # Seats not held by a passenger, see `HOLDING_STATUSES`. Passenger writes keep it up to date in their
+    # own transaction so that searches need not count passengers; `python app.py check-seats` verifies it.
+    seats_available = db.Column(db.Integer, nullable=False, default=_default_seats_available)
     time_range_id = db.Column(db.Integer,
                               db.ForeignKey(models.tables.TIME_RANGE + '.id'),
                               nullable=False)
@@ -96,6 +185,124 @@ class Ride(AbstractModelBase):
     # TODO
 
 
+    def update_instance(self, new_fields: dict):
+        """Update this `Ride` in the database.
+
+        A change of capacity adds the seats gained, or removes the seats lost, from `seats_available` in the
+        same statement. That statement only updates the ride if its passengers hold no more seats than the
+        new capacity, so the ride cannot end up overbooked.
+
+        Args:
+            new_fields (dict): Dict containing new values for this `Ride`.
+
+        Raises:
+            `InvalidCapacityError`: If the new capacity is not an int or greater than max.
+            `CapacityBelowHeldSeatsError`: If the ride's passengers hold more seats than the new capacity.
+        """
+        if 'capacity' not in new_fields:
+            super().update_instance(new_fields)
+            return
+        capacity = self.validate_capacity('capacity', new_fields['capacity'])
+        new_fields = dict(new_fields, capacity=capacity,
+                          seats_available=Ride.seats_available + capacity - Ride.capacity)
+        updated = (db.session.query(Ride)
+                   .filter(Ride.id == self.id, Ride.capacity - Ride.seats_available <= capacity)
+                   .update(new_fields))
+        if not updated:
+            self.rollback()
+            raise CapacityBelowHeldSeatsError(self.id, capacity)
+        self.invalidate_cache(self.id)
+        self.commit()
+
+    @staticmethod
+    def apply_passenger_status(ride_id: int, user_id: int, status_id: int, reserve: bool = False) -> bool:
+        """Update the seats available in a ride for a passenger row about to be added.
+
+        The status of the user's current latest row for the ride and the new status are compared in SQL,
+        in the statement updating the ride, so the seats are counted right without reading the ride first.
+        Call it in the transaction that adds the row, before adding it.
+
+        With `reserve`, the ride is only updated if the user does not hold a seat in it yet and one is
+        available. The check and the update are a single conditional `UPDATE`, so concurrent reservations
+        of the last seat cannot both succeed.
+
+        The subqueries of that `UPDATE` only see rows committed before it started. SQLite runs one writer at
+        a time, so no other passenger row can be added to the ride meanwhile. Other databases run writers
+        concurrently, so the ride is first locked with `SELECT ... FOR UPDATE`: writes to a ride's passengers
+        are serialized, and two reservations by the same user cannot both find that the user holds no seat.
+
+        Args:
+            ride_id (int): id of the ride.
+            user_id (int): id of the passenger's user.
+            status_id (int): id of the new row's status.
+            reserve (bool): True to only take a free seat, see above.
+
+        Returns:
+            bool: True if the ride was updated, False if it does not exist or, with `reserve`, if the user
+                holds a seat already or none is available.
+        """
+        if db.engine.dialect.name != 'sqlite':
+            db.session.query(Ride.id).filter(Ride.id == ride_id).with_for_update().first()
+        was_holding = _holds_seat(ride_id, user_id)
+        will_hold = (select([func.count()])
+                     .where(Status.id == status_id)
+                     .where(Status.description.in_(HOLDING_STATUSES))
+                     .as_scalar())
+        query = db.session.query(Ride).filter(Ride.id == ride_id)
+        if reserve:
+            query = query.filter(Ride.seats_available > 0, was_holding == 0)
+        updated = query.update({Ride.seats_available: Ride.seats_available + was_holding - will_hold},
+                               synchronize_session=False)
+        Ride.invalidate_cache(ride_id)
+        return updated > 0
+
+    @staticmethod
+    def holds_seat(ride_id: int, user_id: int) -> bool:
+        """Check whether a user's latest passenger row for a ride holds a seat.
+
+        Args:
+            ride_id (int): id of the ride.
+            user_id (int): id of the user.
+
+        Returns:
+            bool: True if the user's latest status in the ride is one of the `HOLDING_STATUSES`.
+        """
+        return db.session.query(_holds_seat(ride_id, user_id)).scalar() > 0
+
+    @staticmethod
+    def recount_seats(ride_ids: Iterable[int] = None):
+        """Recompute the seats available in rides from their passengers.
+
+        Args:
+            ride_ids (Iterable[int]): ids of the rides to recount. None to recount every ride.
+        """
+        seats_available = {Ride.seats_available: Ride.capacity - _count_held_seats(Ride.id)}
+        if ride_ids is None:
+            db.session.query(Ride).update(seats_available, synchronize_session=False)
+            Ride.invalidate_cache()
+        else:
+            ride_ids = list(ride_ids)
+            for start in range(0, len(ride_ids), _MAX_IN_PARAMETERS):
+                chunk = ride_ids[start:start + _MAX_IN_PARAMETERS]
+                db.session.query(Ride).filter(Ride.id.in_(chunk)).update(seats_available,
+                                                                         synchronize_session=False)
+            for ride_id in ride_ids:
+                Ride.invalidate_cache(ride_id)
+        Ride.commit()
+
+    @staticmethod
+    def find_seat_mismatches() -> List[Tuple[int, int, int]]:
+        """Find the rides whose `seats_available` disagrees with their passengers.
+
+        Returns:
+            List of `(id, seats_available, expected seats available)` for each such ride, in id order.
+        """
+        expected = Ride.capacity - _count_held_seats(Ride.id)
+        return (db.session.query(Ride.id, Ride.seats_available, expected.label('expected'))
+                .filter(Ride.seats_available != expected)
+                .order_by(Ride.id)
+                .all())
+
     @staticmethod
     def find_by_id(ride_id: int) -> RideType:
         """Look up a `Ride` by id.
@@ -104,9 +311,61 @@ class Ride(AbstractModelBase):
             id (int): id to match.
 
         Returns:
-            Ride with the given id if found.
+            Ride with the given id if found. Lookups are served from an `EntityCache`, and the cached `Ride`
+            is merged into the database session without querying it, so its relationships still load lazily.
+        """
+        ride = Ride._cache.get(ride_id)
+        return db.session.merge(ride, load=False) if ride else None
+
+    @staticmethod
+    def expand(query: Query, relationships: Iterable[str]) -> Query:
+        """Eager-load relationships of the `Ride`s selected by a query.
+
+        Each many-to-one relationship is joined into the query itself and `passengers` are loaded by one
+        extra `SELECT ... WHERE ride_id IN (...)`, so a page costs at most two queries however many rides it
+        holds.
+
+        Args:
+            query (Query): Query selecting `Ride`s.
+            relationships (Iterable[str]): Names from `EXPANDABLE_RELATIONSHIPS` to load.
+
+        Returns:
+            Query loading the given relationships along with each `Ride`.
+        """
+        return query.options(*(selectinload(Ride.passengers) if name == 'passengers'
+                               else joinedload(getattr(Ride, name))
+                               for name in relationships))
+
+    @staticmethod
+    def search(start_location_id: int = None,
+               destination_id: int = None,
+               departure_date: date = None,
+               min_seats: int = None) -> Query:
+        """Look up `Ride`s matching any combination of start location, destination and departure date.
+
+        Searches that give a start location are answered from the `ix_ride_search` index.
+
+        Args:
+            start_location_id (int): id of the start location to match. None to match any.
+            destination_id (int): id of the destination to match. None to match any.
+            departure_date (date): Day of departure to match. None to match any.
+            min_seats (int): Number of seats that must be available. None to match full rides too.
+
+        Returns:
+            Query over the matching `Ride`s.
         """
-        return db.session.query(Ride).filter(Ride.id == ride_id).first()
+        query = db.session.query(Ride)
+        if start_location_id is not None:
+            query = query.filter(Ride.start_location_id == start_location_id)
+        if destination_id is not None:
+            query = query.filter(Ride.destination_id == destination_id)
+        if departure_date is not None:
+            day_start = datetime.combine(departure_date, time.min)
+            query = query.filter(Ride.departure_date >= day_start,
+                                 Ride.departure_date < day_start + timedelta(days=1))
+        if min_seats is not None:
+            query = query.filter(Ride.seats_available >= min_seats)
+        return query
 
     @staticmethod
     def find_by_departure_date(departure_date: datetime) -> List[RideType]:
@@ -156,6 +415,55 @@ class Ride(AbstractModelBase):
         """
         return db.session.query(Ride).filter(Ride.driver_id == driver_id)
 
+    @staticmethod
+    def find_by_member(user_id: int, limit: int,
+                       after: Tuple[Optional[datetime], int] = None) -> Tuple[list, Optional[tuple]]:
+        """Fetch one page of the rides a user drives or rides in, ordered by departure date.
+
+        Both roles are gathered by a single indexed query: the rides the user drives are unioned with the
+        rides the user has a passenger row for, and each ride is tagged with the user's role and, for
+        passengers, the description of their latest status. Pages are selected by keyset on
+        `(departure_date, id)`.
+
+        Args:
+            user_id (int): id of the user.
+            limit (int): Maximum number of rides to return.
+            after (tuple): `(departure_date, id)` cursor returned with the previous page. None to fetch the
+                first page.
+
+        Returns:
+            Tuple of the rows in this page and the cursor for the next page (None if this is the last page).
+            Rows have every `Ride` column plus `role` (`ROLE_DRIVER` or `ROLE_PASSENGER`) and `status`.
+        """
+        latest_passengers = (select([func.max(Passenger.id)])
+                             .where(Passenger.user_id == user_id)
+                             .group_by(Passenger.ride_id))
+        membership = union_all(
+            select([Ride.id.label('ride_id'), literal(ROLE_DRIVER).label('role'), null().label('status_id')])
+            .where(Ride.driver_id == user_id),
+            select([Passenger.ride_id, literal(ROLE_PASSENGER), Passenger.status_id])
+            .where(Passenger.id.in_(latest_passengers))
+        ).alias('membership')
+        query = (db.session.query(*Ride.__table__.c, membership.c.role, Status.description.label('status'))
+                 .join(membership, Ride.id == membership.c.ride_id)
+                 .outerjoin(Status, Status.id == membership.c.status_id)
+                 # A driver is never reported as a passenger of their own ride.
+                 .filter(or_(membership.c.role == ROLE_DRIVER, Ride.driver_id != user_id)))
+        if after is not None:
+            departure_date, ride_id = after
+            if departure_date is None:
+                # SQLite sorts rides without a departure date first.
+                query = query.filter(or_(Ride.departure_date.isnot(None),
+                                         and_(Ride.departure_date.is_(None), Ride.id > ride_id)))
+            else:
+                query = query.filter(or_(Ride.departure_date > departure_date,
+                                         and_(Ride.departure_date == departure_date, Ride.id > ride_id)))
+        rows = query.order_by(Ride.departure_date, Ride.id).limit(limit + 1).all()
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            return rows[:limit], (last.departure_date, last.id)
+        return rows, None
+
     @staticmethod
     def find_by_start_location_id(start_location_id: int) -> List[RideType]:
         """Look up a `Ride` by start_location_id.
@@ -183,3 +491,6 @@ class Ride(AbstractModelBase):
     def __repr__(self) -> str:
         """Return a string representation of this `Ride`."""
         return f'TODO'
+
+
+Ride._cache = EntityCache(Ride)  # pylint: disable=W0212
@@ -6,6 +6,7 @@ from wayfare import db
 from wayfare import models
 
 from wayfare.models import AbstractModelBase
+from wayfare.models.cache import ReferenceCache
 
 
 StatusType = TypeVar('StatusType', bound='Status')
@@ -27,7 +28,7 @@ class Status(AbstractModelBase):
         Returns:
             `Status` with the given id if found, None if not found.
         """
-        return db.session.query(Status).get(status_id)
+        return Status._cache.get(status_id)
 
     @staticmethod
     def find_by_description(description: str) -> StatusType:
@@ -39,7 +40,7 @@ class Status(AbstractModelBase):
         Returns:
             `Status` with the given description if found, None if not found.
         """
-        return db.session.query(Status).filter(Status.description == description).first()
+        return Status._cache.find('description', description)
 
     def __repr__(self) -> str:
         """Return a string representation of this `Status`."""
@@ -48,3 +49,6 @@ class Status(AbstractModelBase):
     def __str__(self) -> str:
         """Return this `Status` as a friendly string."""
         return f"{self.id}. {self.description}"
+
+
+Status._cache = ReferenceCache(Status, natural_keys=('description',))  # pylint: disable=W0212
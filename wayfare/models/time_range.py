@@ -6,6 +6,7 @@ from wayfare import db
 from wayfare import models
 
 from wayfare.models import AbstractModelBase
+from wayfare.models.cache import ReferenceCache
 
 
 TimeRangeType = TypeVar('TimeRangeType', bound='TimeRange')
@@ -29,7 +30,7 @@ class TimeRange(AbstractModelBase):
         Returns:
             TimeRange with the given id if found, None if not found.
         """
-        return db.session.query(TimeRange).get(time_range_id)
+        return TimeRange._cache.get(time_range_id)
 
     @staticmethod
     def find_by_start_time(start_time: int) -> TimeRangeType:
@@ -41,7 +42,7 @@ class TimeRange(AbstractModelBase):
         Returns:
             TimeRange with the given start time if found, None if not found.
         """
-        return db.session.query(TimeRange).filter(TimeRange.start_time == start_time).first()
+        return TimeRange._cache.find('start_time', start_time)
 
     @staticmethod
     def find_by_end_time(end_time: int) -> TimeRangeType:
@@ -53,8 +54,11 @@ class TimeRange(AbstractModelBase):
         Returns:
             TimeRange with the given end time if found.
         """
-        return db.session.query(TimeRange).filter(TimeRange.end_time == end_time).first()
+        return TimeRange._cache.find('end_time', end_time)
 
     def __repr__(self) -> str:
         """Return a string representation of this `TimeRange`."""
         return f'TODO'
+
+
+TimeRange._cache = ReferenceCache(TimeRange, natural_keys=('start_time', 'end_time'))  # pylint: disable=W0212
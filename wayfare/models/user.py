@@ -2,8 +2,15 @@
 """Class wrapping a user table."""
 import re
 
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Set
 from typing import TypeVar
 
+from sqlalchemy import bindparam
+from sqlalchemy.exc import IntegrityError
+
 from wayfare import db
 from wayfare import models
 from wayfare.exceptions import DuplicateEmailError
@@ -11,19 +18,39 @@ from wayfare.exceptions import InvalidEmailError
 from wayfare.exceptions import InvalidFirstNameError
 from wayfare.exceptions import InvalidLastNameError
 from wayfare.models import AbstractModelBase
+from wayfare.models.cache import EntityCache
 
 
 UserType = TypeVar('UserType', bound='User')
 _MAX_LENGTH = 64
 _INVALID_CHARS = r'[~!@#$%^&*()+=_`]'
+_NORMALIZED_EMAIL_INDEX = 'ix_user_normalized_email'
+# SQLite's default limit on bound parameters per statement (before 3.32).
+_MAX_IN_PARAMETERS = 999
+
+
+def _normalize_email(email: str) -> str:
+    """Return the form of an email used to detect duplicates."""
+    return email.strip().lower()
+
+
+def _is_duplicate_email(error: IntegrityError) -> bool:
+    """Check whether an `IntegrityError` was raised by the unique email index."""
+    return 'normalized_email' in str(error.orig)
+
 
 class User(AbstractModelBase):
     """Data access object providing a static interface to a user table."""
     __tablename__ = models.tables.USER
+    __table_args__ = (
+        db.Index(_NORMALIZED_EMAIL_INDEX, 'normalized_email', unique=True),
+    )
 
     first_name = db.Column(db.String(_MAX_LENGTH))
     last_name = db.Column(db.String(_MAX_LENGTH))
     email = db.Column(db.String(_MAX_LENGTH))
+    # Lower-cased `email`, kept in sync by `validate_email` and `update_instance`.
+    normalized_email = db.Column(db.String(_MAX_LENGTH))
     password = db.Column(db.String(_MAX_LENGTH))
 
     @db.validates('first_name')
@@ -69,7 +96,10 @@ class User(AbstractModelBase):
 
     @db.validates('email')
     def validate_email(self, key: str, email: str):
-        """Check that an email is unique seems valid.
+        """Check that an email seems valid.
+
+        Uniqueness is not checked here. It is enforced by a unique index on the normalized email, which
+        `create` and `update_instance` report as a `DuplicateEmailError`.
 
         Args:
             key (str): Dict key corresponding to the field being validated.
@@ -80,7 +110,6 @@ class User(AbstractModelBase):
 
         Raises:
             `InvalidEmailError`: If the given email does not have exactly one '@' and a '.' after the '@'.
-            `DuplicateEmailError`: If a user with the given email already exists.
         """
         # REGEX notes:
         #
@@ -91,11 +120,61 @@ class User(AbstractModelBase):
         if not re.compile(r'[^@]+@[^@]+\.[^@]+').match(email):
             raise InvalidEmailError(email)
 
-        if self.find_by_email(email):
-            raise DuplicateEmailError(email)
-
+        self.normalized_email = _normalize_email(email)
         return email
 
+    def create(self):
+        """Add this `User` to the database.
+
+        Raises:
+            `DuplicateEmailError`: If a user with the same email already exists.
+        """
+        try:
+            super().create()
+        except IntegrityError as ex:
+            self.rollback()
+            if _is_duplicate_email(ex):
+                raise DuplicateEmailError(self.email)
+            raise
+
+    def update_instance(self, new_fields: dict):
+        """Update this `User` in the database.
+
+        Args:
+            new_fields (dict): Dict containing new values for this `User`.
+
+        Raises:
+            `DuplicateEmailError`: If the new email belongs to another user.
+        """
+        if 'email' in new_fields:
+            new_fields = dict(new_fields, normalized_email=_normalize_email(new_fields['email']))
+        try:
+            super().update_instance(new_fields)
+        except IntegrityError as ex:
+            self.rollback()
+            if _is_duplicate_email(ex):
+                raise DuplicateEmailError(new_fields['email'])
+            raise
+
+    def delete_instance(self):
+        """Delete this `User` from the database, recounting the seats of the rides they are a passenger in."""
+        with self.transaction():
+            ride_ids = [row.ride_id for row in (db.session.query(models.Passenger.ride_id)
+                                                .filter(models.Passenger.user_id == self.id)
+                                                .distinct())]
+            super().delete_instance()
+            models.Ride.recount_seats(ride_ids)
+
+    @classmethod
+    def delete_all(cls):
+        """Delete all users in the database, freeing every seat.
+
+        NOTE: This method is incredibly desctructive and should not be used in production.
+        """
+        with cls.transaction():
+            super().delete_all()
+            models.Ride.recount_seats()
+
     @staticmethod
     def find_by_id(user_id: int) -> UserType:
         """Look up a `User` by id.
@@ -104,16 +183,18 @@ class User(AbstractModelBase):
             id (int): id to match.
 
         Returns:
-            User with the given id if found, None if not found.
+            User with the given id if found, None if not found. Lookups are served from an `EntityCache`, and
+            the cached `User` is merged into the database session without querying it.
 
         See:
         https://docs.sqlalchemy.org/en/latest/orm/query.html#sqlalchemy.orm.query.Query.get
         """
-        return db.session.query(User).get(user_id)
+        user = User._cache.get(user_id)
+        return db.session.merge(user, load=False) if user else None
 
     @staticmethod
     def find_by_email(email: str) -> UserType:
-        """Look up a `User` by email.
+        """Look up a `User` by email, ignoring case.
 
         Args:
             email (str): email to match.
@@ -121,8 +202,67 @@ class User(AbstractModelBase):
         Returns:
             `User` with the given email if found, None if not found.
         """
-        return db.session.query(User).filter(User.email == email).first()
+        return db.session.query(User).filter(User.normalized_email == _normalize_email(email)).first()
+
+    @staticmethod
+    def find_existing_emails(emails: Iterable[str]) -> Set[str]:
+        """Find which of the given emails already belong to a user, ignoring case.
+
+        Args:
+            emails (Iterable[str]): emails to check.
+
+        Returns:
+            Set of the normalized forms of the emails that already exist.
+        """
+        return set(User._find_ids_by_normalized_email({_normalize_email(email) for email in emails}))
+
+    @staticmethod
+    def bulk_create(users: List[UserType]) -> List[int]:
+        """Insert many new users in one transaction.
+
+        The users are written with one executemany INSERT and one COMMIT rather than a `create` each.
+
+        Args:
+            users (List[User]): Unsaved, validated users with distinct emails.
+
+        Returns:
+            List[int]: ids of the inserted users, in the same order as `users`.
+
+        Raises:
+            `DuplicateEmailError`: If one of the emails already exists. No users are inserted.
+        """
+        columns = ('first_name', 'last_name', 'email', 'normalized_email', 'password')
+        try:
+            db.session.execute(User.__table__.insert(), [{column: getattr(user, column) for column in columns}
+                                                         for user in users])
+            ids = User._find_ids_by_normalized_email([user.normalized_email for user in users])
+            User.commit()
+        except IntegrityError as ex:
+            User.rollback()
+            if not _is_duplicate_email(ex):
+                raise
+            # Another request inserted one of these emails after the caller checked them.
+            existing = User.find_existing_emails(user.email for user in users)
+            duplicate = next((user.email for user in users if user.normalized_email in existing), '')
+            raise DuplicateEmailError(duplicate)
+        return [ids[user.normalized_email] for user in users]
+
+    @staticmethod
+    def _find_ids_by_normalized_email(normalized_emails: Iterable[str]) -> Dict[str, int]:
+        """Map normalized emails to the ids of the users that have them, one IN query per chunk."""
+        normalized_emails = list(normalized_emails)
+        # An expanding parameter compiles the statement once instead of once per chunk.
+        query = db.session.query(User.normalized_email, User.id).filter(
+            User.normalized_email.in_(bindparam('normalized_emails', expanding=True)))
+        ids = {}
+        for start in range(0, len(normalized_emails), _MAX_IN_PARAMETERS):
+            chunk = normalized_emails[start:start + _MAX_IN_PARAMETERS]
+            ids.update(query.params(normalized_emails=chunk))
+        return ids
 
     def __repr__(self) -> str:
         """Return a string representation of this `User`."""
         return f'TODO'
+
+
+User._cache = EntityCache(User)  # pylint: disable=W0212
@@ -0,0 +1,308 @@
+"""On-demand profiling of single requests.
+
+When `WAYFARE_PROFILING` is set, a request sent with an `X-Wayfare-Profile` header is profiled from the
+moment the server hands it to the app until its body has been sent, including streamed bodies:
+
+    $ curl -H 'X-Wayfare-Profile: sample' localhost:5000/rides?expand=driver,passengers
+
+- `sample` (or any other value) samples the request thread's stack every `WAYFARE_PROFILE_INTERVAL_MS`
+  milliseconds and writes `<name>.collapsed`, one `frame;frame;... count` line per distinct stack, for
+  `flamegraph.pl`, and `<name>.speedscope.json` for https://www.speedscope.app.
+- `cprofile` runs the request under `cProfile` and writes `<name>.pstats`, for `pstats` or snakeviz. It
+  counts every call, so it slows the request down much more than sampling does.
+
+Profiles are written to `WAYFARE_PROFILE_DIR`, which keeps the `WAYFARE_PROFILE_KEEP` most recent ones, and
+the response's `X-Wayfare-Profile` header holds the profile's name. One request is profiled at a time: a
+request asking for a profile while another one is being profiled is served without it.
+
+Anyone who can send the header can make the server do this work, so only enable profiling temporarily, or
+behind a proxy that strips the header from outside requests.
+"""
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from collections import Counter
+from datetime import datetime
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from flask import Flask
+
+PROFILE_HEADER = 'X-Wayfare-Profile'
+_ENVIRON_KEY = 'HTTP_X_WAYFARE_PROFILE'
+_SUFFIXES = ('.collapsed', '.speedscope.json', '.pstats')
+_UNSAFE_CHARACTERS = re.compile(r'[^A-Za-z0-9]+')
+
+# Function name, file and first line of the code a frame runs.
+Frame = Tuple[str, str, int]
+Stack = Tuple[Frame, ...]
+
+
+class Sampler:
+    """Samples the stack of one thread from a background thread.
+
+    Attributes:
+        samples (List[Tuple[Stack, float]]): Each sampled stack, outermost frame first, with the seconds
+            elapsed since the previous sample.
+    """
+    def __init__(self, thread_id: int, interval: float):
+        """Init a `Sampler`.
+
+        Args:
+            thread_id (int): `threading.get_ident()` of the thread to sample.
+            interval (float): Seconds between samples.
+        """
+        self.samples = []
+        self._thread_id = thread_id
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='wayfare-profiler', daemon=True)
+        self._started = None
+
+    def start(self):
+        """Start sampling."""
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> float:
+        """Stop sampling.
+
+        Returns:
+            float: Seconds spent sampling.
+        """
+        self._stopped.set()
+        self._thread.join()
+        return time.perf_counter() - self._started
+
+    def _run(self):
+        """Take samples until stopped."""
+        previous = self._started
+        while not self._stopped.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)  # pylint: disable=W0212
+            now = time.perf_counter()
+            if frame is not None:
+                self.samples.append((_walk(frame), now - previous))
+            previous = now
+
+
+def _walk(frame) -> Stack:
+    """Return the stack ending at a frame, outermost frame first."""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((f'{frame.f_globals.get("__name__", "?")}:{code.co_name}', code.co_filename,
+                      code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def collapse(samples: Iterable[Tuple[Stack, float]]) -> str:
+    """Format samples as collapsed stacks.
+
+    Args:
+        samples (Iterable[Tuple[Stack, float]]): Sampled stacks, see `Sampler.samples`.
+
+    Returns:
+        str: One line per distinct stack, its frame names joined by `;` then its number of samples.
+    """
+    counts = Counter(stack for stack, _ in samples)
+    return ''.join(f'{";".join(name for name, _, _ in stack)} {count}\n' for stack, count in counts.items())
+
+
+def to_speedscope(samples: List[Tuple[Stack, float]], name: str, duration: float) -> Dict[str, Any]:
+    """Build a speedscope profile from samples.
+
+    Args:
+        samples (List[Tuple[Stack, float]]): Sampled stacks, see `Sampler.samples`.
+        name (str): Profile name.
+        duration (float): Seconds spent sampling.
+
+    Returns:
+        Dict[str, Any]: Profile in speedscope's file format, with each sample weighted by the milliseconds
+            elapsed since the previous one.
+    """
+    frame_indexes = {}
+    sample_indexes = []
+    for stack, _ in samples:
+        sample_indexes.append([frame_indexes.setdefault(frame, len(frame_indexes)) for frame in stack])
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'wayfare',
+        'shared': {
+            'frames': [{'name': frame_name, 'file': path, 'line': line}
+                       for frame_name, path, line in frame_indexes]
+        },
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': duration * 1000,
+            'samples': sample_indexes,
+            'weights': [elapsed * 1000 for _, elapsed in samples]
+        }]
+    }
+
+
+class ProfileStore:
+    """Directory of profiles, keeping the most recent ones."""
+    def __init__(self, directory: str, keep: int):
+        """Init a `ProfileStore`.
+
+        Args:
+            directory (str): Directory to write profiles to, created if missing.
+            keep (int): Number of profiles to keep. Older ones are deleted when a profile is added.
+        """
+        self.directory = directory
+        self.keep = keep
+
+    def new_name(self, method: str, path: str) -> str:
+        """Name a profile of a request, so that names sort in the order profiles were taken."""
+        slug = _UNSAFE_CHARACTERS.sub('_', path).strip('_')[:80] or 'root'
+        return f'{datetime.utcnow():%Y%m%dT%H%M%S%f}-{method}-{slug}'
+
+    def save_sampled(self, name: str, samples: List[Tuple[Stack, float]], duration: float):
+        """Write a sampled profile as collapsed stacks and as a speedscope file."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f'{name}.collapsed'), 'w') as collapsed:
+            collapsed.write(collapse(samples))
+        with open(os.path.join(self.directory, f'{name}.speedscope.json'), 'w') as speedscope:
+            json.dump(to_speedscope(samples, name, duration), speedscope)
+        self.prune()
+
+    def save_cprofile(self, name: str, profile: cProfile.Profile):
+        """Write a `cProfile` profile in the `pstats` format."""
+        os.makedirs(self.directory, exist_ok=True)
+        profile.dump_stats(os.path.join(self.directory, f'{name}.pstats'))
+        self.prune()
+
+    def names(self) -> List[str]:
+        """Return the names of the stored profiles, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted({file_name[:-len(suffix)] for file_name in os.listdir(self.directory)
+                       for suffix in _SUFFIXES if file_name.endswith(suffix)})
+
+    def prune(self):
+        """Delete the oldest profiles beyond `keep`."""
+        names = self.names()
+        for name in names[:max(len(names) - self.keep, 0)]:
+            for suffix in _SUFFIXES:
+                try:
+                    os.remove(os.path.join(self.directory, name + suffix))
+                except FileNotFoundError:
+                    pass
+
+
+class _ProfiledBody:
+    """Response body that finishes its request's profile once the server has sent and closed it."""
+    def __init__(self, body: Iterable[bytes], finish: Callable[[], None]):
+        self._body = body
+        self._finish = finish
+
+    def __iter__(self):
+        return iter(self._body)
+
+    def close(self):
+        """Close the wrapped body, then finish the profile."""
+        try:
+            if hasattr(self._body, 'close'):
+                self._body.close()
+        finally:
+            self._finish()
+
+
+class ProfilingMiddleware:
+    """WSGI middleware profiling the requests that carry `PROFILE_HEADER`."""
+    def __init__(self, wsgi_app: Callable, store: ProfileStore, interval: float):
+        """Init a `ProfilingMiddleware`.
+
+        Args:
+            wsgi_app (Callable): WSGI app to profile.
+            store (ProfileStore): Where to save profiles.
+            interval (float): Seconds between samples of sampled profiles.
+        """
+        self.wsgi_app = wsgi_app
+        self.store = store
+        self.interval = interval
+        self._busy = threading.Lock()
+
+    def __call__(self, environ: dict, start_response: Callable) -> Iterable[bytes]:
+        mode = environ.get(_ENVIRON_KEY)
+        if not mode or not self._busy.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+        try:
+            name = self.store.new_name(environ.get('REQUEST_METHOD', ''), environ.get('PATH_INFO', ''))
+            finish = self._start(mode.strip().lower(), name)
+        except BaseException:
+            self._busy.release()
+            raise
+
+        def start_profiled_response(status, headers, exc_info=None):
+            return start_response(status, headers + [(PROFILE_HEADER, name)], exc_info)
+
+        try:
+            body = self.wsgi_app(environ, start_profiled_response)
+        except BaseException:
+            finish()
+            raise
+        return _ProfiledBody(body, finish)
+
+    def _start(self, mode: str, name: str) -> Callable[[], None]:
+        """Start profiling the current thread.
+
+        Returns:
+            Callable[[], None]: Function that stops profiling, saves the profile and lets another request be
+                profiled. It must be called on the same thread for `cprofile` profiles.
+        """
+        if mode == 'cprofile':
+            profile = cProfile.Profile()
+            profile.enable()
+
+            def finish_cprofile():
+                try:
+                    profile.disable()
+                    self.store.save_cprofile(name, profile)
+                finally:
+                    self._busy.release()
+            return finish_cprofile
+
+        sampler = Sampler(threading.get_ident(), self.interval)
+        sampler.start()
+
+        def finish_sampled():
+            try:
+                duration = sampler.stop()
+                self.store.save_sampled(name, sampler.samples, duration)
+            finally:
+                self._busy.release()
+        return finish_sampled
+
+
+def configure_profiling(app: Flask) -> Optional[ProfileStore]:
+    """Profile requests carrying `PROFILE_HEADER`, if the app's `WAYFARE_PROFILING` is set.
+
+    Args:
+        app (Flask): App whose requests to profile.
+
+    Returns:
+        Optional[ProfileStore]: Where profiles are saved, None if profiling is disabled.
+    """
+    if not app.config['WAYFARE_PROFILING']:
+        return None
+    store = ProfileStore(app.config['WAYFARE_PROFILE_DIR'], app.config['WAYFARE_PROFILE_KEEP'])
+    app.extensions['wayfare_profiles'] = store
+    app.wsgi_app = ProfilingMiddleware(app.wsgi_app, store, app.config['WAYFARE_PROFILE_INTERVAL_MS'] / 1000)
+    return store
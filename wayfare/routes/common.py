@@ -0,0 +1,156 @@
+"""Helpers shared by the Flask-RESTful resources."""
+import hashlib
+
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+from typing import Iterable
+from typing import Optional
+from urllib.parse import urlencode
+
+from flask import Response
+from flask import request
+from flask import stream_with_context
+from webargs import fields as webargs_fields
+from webargs import validate
+from werkzeug.http import http_date
+from werkzeug.http import quote_etag
+
+from wayfare.routes.serializers import Serializer
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def make_pagination_schema() -> dict:
+    """Create an expected schema for the query arguments of a paginated collection.
+
+    `limit` is the maximum number of items in the page and `after` is the cursor returned with the
+    previous page.
+    """
+    return {
+        'limit': webargs_fields.Integer(missing=DEFAULT_PAGE_SIZE,  # pylint: disable=E1101
+                                        validate=validate.Range(min=1, max=MAX_PAGE_SIZE)),
+        'after': webargs_fields.Integer(missing=None,  # pylint: disable=E1101
+                                        validate=validate.Range(min=0))
+    }
+
+
+def make_fields_schema(response_schema: dict) -> dict:
+    """Create an expected schema for the query argument selecting a sparse fieldset.
+
+    `fields` is a comma-separated list of response fields to include. Only the matching columns are read
+    from the database.
+
+    Args:
+        response_schema (dict): Flask-RESTful fields the resource can return.
+    """
+    return {
+        'fields': webargs_fields.DelimitedList(webargs_fields.String(),  # pylint: disable=E1101
+                                               missing=None,
+                                               validate=validate.ContainsOnly(list(response_schema)))
+    }
+
+
+def make_page_headers(limit: int, next_cursor: int) -> dict:
+    """Create the response headers for a page of a collection.
+
+    Args:
+        limit (int): Page size requested by the client.
+        next_cursor (int): Cursor for the next page, None if this is the last page.
+
+    Returns:
+        dict: A `Link` header pointing at the next page, or no headers if this is the last page.
+    """
+    if next_cursor is None:
+        return {}
+    query = request.args.to_dict()
+    query.update({'limit': limit, 'after': next_cursor})
+    return {'Link': f'<{request.base_url}?{urlencode(query)}>; rel="next"'}
+
+
+def wants_ndjson() -> bool:
+    """Check whether the client prefers a newline-delimited JSON stream over a JSON document."""
+    best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def stream_ndjson(models: Iterable, serializer: Serializer) -> Response:
+    """Create a streaming response with one JSON object per line.
+
+    Each model is serialized and written as soon as it is read, so the first bytes go out before the
+    query finishes and memory use does not grow with the size of the result.
+
+    Args:
+        models (Iterable): Models to write, typically a lazy iterator such as `get_all`.
+        serializer (Serializer): Serializer for the fields to include for each model.
+
+    Returns:
+        Response: A chunked `application/x-ndjson` response.
+    """
+    def generate():
+        for model in models:
+            yield serializer.dumps(model) + '\n'
+    # Keep the request context (and with it the database session) alive until the stream is drained.
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+def _make_etag(model_class: type, model_id: int, date_modified: datetime) -> str:
+    """Derive an opaque entity tag from a model instance's id and modification time."""
+    version = f'{model_class.__tablename__}:{model_id}:{date_modified.isoformat()}'
+    return hashlib.sha1(version.encode()).hexdigest()
+
+
+def _make_validator_headers(model_class: type, model_id: int, date_modified: datetime) -> dict:
+    """Create the `ETag` and `Last-Modified` headers for one version of a model instance."""
+    return {
+        'ETag': quote_etag(_make_etag(model_class, model_id, date_modified), weak=True),
+        'Last-Modified': http_date(date_modified.replace(tzinfo=timezone.utc))
+    }
+
+
+def make_validator_headers(model: Any) -> dict:
+    """Create the response headers that let a client revalidate its copy of a model instance.
+
+    Args:
+        model: Model instance being returned.
+
+    Returns:
+        dict: Weak `ETag` and `Last-Modified` headers, or no headers if the instance has no `date_modified`.
+    """
+    if model.date_modified is None:
+        return {}
+    return _make_validator_headers(type(model), model.id, model.date_modified)
+
+
+def make_not_modified_response(model_class: type, model_id: int) -> Optional[Response]:
+    """Check a conditional GET for a model instance against its current version.
+
+    Only the instance's `date_modified` is looked up, so a client polling an unchanged resource costs
+    neither a full row load nor serialization. `If-None-Match` takes precedence over `If-Modified-Since`.
+
+    Args:
+        model_class (type): Model being requested.
+        model_id (int): id of the requested instance.
+
+    Returns:
+        Response: A bodyless 304 response if the client's copy is current, None if the instance should be
+            sent in full.
+    """
+    if not request.if_none_match and request.if_modified_since is None:
+        return None
+    date_modified = model_class.find_date_modified(model_id)
+    if date_modified is None:
+        return None
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(_make_etag(model_class, model_id, date_modified))
+    else:
+        # HTTP dates only resolve to the second.
+        if_modified_since = request.if_modified_since
+        if if_modified_since.tzinfo is not None:
+            if_modified_since = if_modified_since.astimezone(timezone.utc).replace(tzinfo=None)
+        fresh = date_modified.replace(microsecond=0) <= if_modified_since
+    if not fresh:
+        return None
+    return Response(status=304, headers=_make_validator_headers(model_class, model_id, date_modified))
@@ -1,18 +1,42 @@
 """Flask-RESTful resources for interacting with ride data."""
+from datetime import datetime
+from typing import Optional
+from typing import Tuple
+
 import flask_restful
 from flask_restful import abort
 from flask_restful import fields as flask_fields
-from flask_restful import marshal_with
 from webargs import fields as webargs_fields
+from webargs import validate
 from webargs.flaskparser import parser
 from webargs.flaskparser import use_args
 
 import dateutil.parser
+from sqlalchemy.orm import Query
+from sqlalchemy.orm import load_only
 
+from wayfare.exceptions import AlreadyPassengerError
+from wayfare.exceptions import CapacityBelowHeldSeatsError
 from wayfare.exceptions import InvalidCapacityError
+from wayfare.exceptions import RideFullError
+from wayfare.models import Location
+from wayfare.models import Passenger
 from wayfare.models import Ride
+from wayfare.models import User
+from wayfare.models.ride import EXPANDABLE_RELATIONSHIPS
+from wayfare.routes.common import make_fields_schema
+from wayfare.routes.common import make_not_modified_response
+from wayfare.routes.common import make_page_headers
+from wayfare.routes.common import make_pagination_schema
+from wayfare.routes.common import make_validator_headers
+from wayfare.routes.common import stream_ndjson
+from wayfare.routes.common import wants_ndjson
+from wayfare.routes.serializers import Serializer
+from wayfare.util import validate_iso_date
 
 BASE_URL = '/rides'
+USER_RIDES_URL = '/users/<int:user_id>/rides'
+PASSENGERS_URL = f'{BASE_URL}/<int:ride_id>/passengers'
 
 # Fields to include in a response body.
 _response_schema = {  # pylint: disable=C0103
@@ -20,11 +44,56 @@ _response_schema = {  # pylint: disable=C0103
     'actual_departure_time': flask_fields.String,
     'departure_date': flask_fields.String,
     'capacity': flask_fields.Integer,
+    'seats_available': flask_fields.Integer,
     'time_range_id': flask_fields.Integer,
     'driver_id': flask_fields.Integer,
     'start_location_id': flask_fields.Integer,
     'destination_id': flask_fields.Integer
 }
+_serializer = Serializer(_response_schema)  # pylint: disable=C0103
+
+# A user's rides are tagged with the user's role and passenger status.
+_member_serializer = Serializer({  # pylint: disable=C0103
+    **_response_schema,
+    'role': flask_fields.String,
+    'status': flask_fields.String
+})
+
+_location_schema = {  # pylint: disable=C0103
+    'id': flask_fields.Integer,
+    'name': flask_fields.String
+}
+
+# Related objects `expand` can nest in a ride.
+_expansion_schema = {  # pylint: disable=C0103
+    'driver': flask_fields.Nested({
+        'id': flask_fields.Integer,
+        'first_name': flask_fields.String,
+        'last_name': flask_fields.String,
+        'email': flask_fields.String
+    }, allow_null=True),
+    'start_location': flask_fields.Nested(_location_schema, allow_null=True),
+    'destination': flask_fields.Nested(_location_schema, allow_null=True),
+    'time_range': flask_fields.Nested({
+        'id': flask_fields.Integer,
+        'description': flask_fields.String,
+        'start_time': flask_fields.Integer,
+        'end_time': flask_fields.Integer
+    }, allow_null=True),
+    'passengers': flask_fields.List(flask_fields.Nested({
+        'id': flask_fields.Integer,
+        'user_id': flask_fields.Integer,
+        'status_id': flask_fields.Integer
+    }))
+}
+_expanded_serializer = Serializer({**_response_schema, **_expansion_schema})  # pylint: disable=C0103
+
+_passenger_serializer = Serializer({  # pylint: disable=C0103
+    'id': flask_fields.Integer,
+    'user_id': flask_fields.Integer,
+    'ride_id': flask_fields.Integer,
+    'status_id': flask_fields.Integer
+})
 
 _request_schema = {  # pylint: disable=C0103
     # Ride fields go here.
@@ -45,6 +114,94 @@ def _make_request_schema(require_all: bool = False) -> dict:
         'destination_id': webargs_fields.Integer(required=require_all)  # pylint: disable=E1101
     }
 
+def _make_search_schema() -> dict:
+    """Create an expected schema for the query arguments of a ride search."""
+    return {
+        'startLocation': webargs_fields.String(),  # pylint: disable=E1101
+        'destination': webargs_fields.String(),  # pylint: disable=E1101
+        'date': webargs_fields.String(validate=validate_iso_date),  # pylint: disable=E1101
+        # Minimum number of seats available.
+        'seats': webargs_fields.Integer(validate=validate.Range(min=1))  # pylint: disable=E1101
+    }
+
+def _make_expand_schema() -> dict:
+    """Create an expected schema for the query argument selecting related objects to nest in each ride."""
+    return {
+        'expand': webargs_fields.DelimitedList(webargs_fields.String(),  # pylint: disable=E1101
+                                               missing=None,
+                                               validate=validate.ContainsOnly(EXPANDABLE_RELATIONSHIPS))
+    }
+
+def _shape_query(query: Query, query_args: dict) -> Query:
+    """Load only the fields and related objects requested by a request's query arguments.
+
+    Args:
+        query (Query): Query selecting `Ride`s.
+        query_args (dict): Field and expand arguments extracted from the query string.
+
+    Returns:
+        Query over `Ride`s with the requested relationships eager-loaded, or over plain rows of the
+        requested columns if nothing is expanded.
+    """
+    if query_args['expand']:
+        query = Ride.expand(query, query_args['expand'])
+        return query.options(load_only(*query_args['fields'])) if query_args['fields'] else query
+    return Ride.project(query, query_args['fields']) if query_args['fields'] else query
+
+def _get_serializer(query_args: dict) -> Serializer:
+    """Get the serializer for the fields and related objects requested by a request's query arguments."""
+    if not query_args['expand']:
+        return _serializer.subset(query_args['fields'])
+    return _expanded_serializer.subset([*(query_args['fields'] or _response_schema), *query_args['expand']])
+
+def _format_member_cursor(cursor: Tuple[Optional[datetime], int]) -> str:
+    """Encode a `Ride.find_by_member` cursor as `<departure date>_<ride id>` for a query string."""
+    departure_date, ride_id = cursor
+    return f"{departure_date.isoformat() if departure_date else ''}_{ride_id}"
+
+def _parse_member_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """Decode a cursor created by `_format_member_cursor`."""
+    departure_date, _, ride_id = cursor.rpartition('_')
+    return (datetime.fromisoformat(departure_date) if departure_date else None), int(ride_id)
+
+def _validate_member_cursor(cursor: str) -> bool:
+    """Validate that a string is a cursor created by `_format_member_cursor`."""
+    try:
+        _parse_member_cursor(cursor)
+        return True
+    except ValueError:
+        return False
+
+def _make_member_schema() -> dict:
+    """Create an expected schema for the query arguments of a page of a user's rides."""
+    return {
+        'limit': make_pagination_schema()['limit'],
+        'after': webargs_fields.String(missing=None,  # pylint: disable=E1101
+                                       validate=_validate_member_cursor)
+    }
+
+def _make_search_query(query_args: dict) -> Query:
+    """Build the ride search described by a request's query arguments.
+
+    Args:
+        query_args (dict): Search arguments extracted from the query string.
+
+    Returns:
+        Query over the matching rides, or None if a named location does not exist and nothing can match.
+    """
+    location_ids = {}
+    for arg in ('startLocation', 'destination'):
+        if arg in query_args:
+            location = Location.find_by_name(query_args[arg])
+            if not location:
+                return None
+            location_ids[arg] = location.id
+    departure_date = dateutil.parser.parse(query_args['date']).date() if 'date' in query_args else None
+    return Ride.search(start_location_id=location_ids.get('startLocation'),
+                       destination_id=location_ids.get('destination'),
+                       departure_date=departure_date,
+                       min_seats=query_args.get('seats'))
+
 @parser.error_handler
 def _handle_parse_error(err, req, schema):
     """Handler for request parse errors.
@@ -61,13 +218,30 @@ def _handle_parse_error(err, req, schema):
 
 class Rides(flask_restful.Resource):
     """Resource for interacting with `Ride` data."""
-    @marshal_with(_response_schema)
-    def get(self):
-        """Retrieve all rides.
+    @use_args({**make_pagination_schema(), **make_fields_schema(_response_schema), **_make_expand_schema(),
+               **_make_search_schema()}, locations=('query',))
+    def get(self, query_args: dict):
+        """Retrieve a page of rides, optionally matching a start location, destination, date and free seats.
+
+        `seats` only matches rides with at least that many seats available. The `Link` response header holds
+        the url of the next page, if there is one. Clients that send `Accept: application/x-ndjson` get every
+        matching ride instead, streamed one per line. `fields` limits each ride to the listed fields and
+        `expand` nests the listed related objects.
 
-        NOTE: This method can be very memory-intensive and should not be used in production.
+        Args:
+            query_args (dict): Pagination, field, expand and search arguments extracted from the query
+                string.
         """
-        return list(Ride.get_all())
+        query = _make_search_query(query_args)
+        if query is not None:
+            query = _shape_query(query, query_args)
+        serializer = _get_serializer(query_args)
+        if wants_ndjson():
+            return stream_ndjson(Ride.stream(query) if query else [], serializer)
+        if query is None:
+            return [], 200
+        rides, next_cursor = Ride.paginate(query, query_args['limit'], query_args['after'])
+        return serializer.make_response(rides, headers=make_page_headers(query_args['limit'], next_cursor))
 
     @use_args(_make_request_schema(require_all=True))
     def post(self, request_body: dict):
@@ -103,20 +277,34 @@ class Rides(flask_restful.Resource):
 
 class RidesById(flask_restful.Resource):
     """Resource for interacting with ride data based on a ride id."""
-    @marshal_with(_response_schema)
-    def get(self, ride_id: int):
+    @use_args(_make_expand_schema(), locations=('query',))
+    def get(self, query_args: dict, ride_id: int):
         """Get a ride resource by id.
 
+        The response carries `ETag` and `Last-Modified` headers. A request whose `If-None-Match` or
+        `If-Modified-Since` header matches the current version gets an empty 304 response instead.
+        `expand` nests the listed related objects; those responses carry no validators, since a change
+        to a related object does not change the ride's version.
+
         Args:
+            query_args (dict): Expand arguments extracted from the query string.
             ride_id (int): id of the ride to look up.
 
         Returns:
             Ride with the given id if found.
         """
+        if query_args['expand']:
+            ride = Ride.expand(Ride.select(), query_args['expand']).filter(Ride.id == ride_id).first()
+            if not ride:
+                abort(404, message="Ride {} does not exist".format(ride_id))
+            return _get_serializer({'fields': None, **query_args}).make_response(ride)
+        not_modified = make_not_modified_response(Ride, ride_id)
+        if not_modified:
+            return not_modified
         ride = Ride.find_by_id(ride_id)
         if not ride:
             abort(404, message="Ride {} does not exist".format(ride_id))
-        return ride
+        return _serializer.make_response(ride, headers=make_validator_headers(ride))
 
     # TODO: This method should not require all fields.
     @use_args(_make_request_schema(require_all=True))
@@ -127,13 +315,20 @@ class RidesById(flask_restful.Resource):
             request_body (dict): Data extracted from request body.
             ride_id (int): ride id provided in the uri path.
         """
-        ride = Ride.find_by_id(ride_id)
-        if ride:
-            ride.update(request_body)
-            return '', 200
-        ride = Ride(**request_body)
-        ride.create()
-        return '', 201
+        departure_date = dateutil.parser.parse(request_body['departure_date'])
+        request_body = dict(request_body, departure_date=departure_date)
+        try:
+            ride = Ride.find_by_id(ride_id)
+            if ride:
+                ride.update_instance(request_body)
+                return '', 200
+            ride = Ride(**request_body)
+            ride.create()
+            return '', 201
+        except InvalidCapacityError as ex:
+            abort(400, message=ex.message)
+        except CapacityBelowHeldSeatsError as ex:
+            abort(409, message=ex.message)
 
     def delete(self, ride_id: int):
         """Delete ride with the given id.
@@ -146,3 +341,57 @@ class RidesById(flask_restful.Resource):
             ride.delete_instance()
             return '', 200
         abort(404, message="Ride {} does not exist".format(ride_id))
+
+
+class UserRides(flask_restful.Resource):
+    """Resource for the rides a user drives or rides in."""
+    @use_args(_make_member_schema(), locations=('query',))
+    def get(self, query_args: dict, user_id: int):
+        """Retrieve a page of the rides a user drives or rides in, ordered by departure date.
+
+        Each ride has the user's `role` in it and, for passengers, their `status`. The `Link` response
+        header holds the url of the next page, if there is one.
+
+        Args:
+            query_args (dict): Pagination arguments extracted from the query string.
+            user_id (int): id of the user provided in the uri path.
+        """
+        after = _parse_member_cursor(query_args['after']) if query_args['after'] else None
+        rides, next_cursor = Ride.find_by_member(user_id, query_args['limit'], after)
+        if not rides and not User.find_by_id(user_id):
+            abort(404, message="User {} does not exist".format(user_id))
+        next_cursor = _format_member_cursor(next_cursor) if next_cursor else None
+        return _member_serializer.make_response(rides,
+                                                headers=make_page_headers(query_args['limit'], next_cursor))
+
+
+class RidePassengers(flask_restful.Resource):
+    """Resource for the passengers of a ride."""
+    @use_args({'user_id': webargs_fields.Integer(required=True)})  # pylint: disable=E1101
+    def post(self, request_body: dict, ride_id: int):
+        """Reserve a seat in a ride for a user.
+
+        The seat is taken by a conditional update of the ride's `seats_available`, so concurrent requests
+        for the last seat cannot overbook the ride: one of them gets the seat and the others a 409. See
+        `Ride.apply_passenger_status`.
+
+        Args:
+            request_body (dict): Data extracted from request body.
+            ride_id (int): id of the ride provided in the uri path.
+
+        Returns:
+            The new passenger, with a 201 status. A 409 if the ride is full, or if the user drives it or
+            already holds a seat in it.
+        """
+        ride = Ride.find_by_id(ride_id)
+        if not ride:
+            abort(404, message="Ride {} does not exist".format(ride_id))
+        if ride.driver_id == request_body['user_id']:
+            abort(409, message="User {} drives ride {}".format(ride.driver_id, ride_id))
+        if not User.find_by_id(request_body['user_id']):
+            abort(400, message="User {} does not exist".format(request_body['user_id']))
+        try:
+            passenger = Passenger.reserve(ride_id, request_body['user_id'])
+        except (AlreadyPassengerError, RideFullError) as ex:
+            abort(409, message=ex.message)
+        return _passenger_serializer.make_response(passenger, 201)
@@ -0,0 +1,168 @@
+"""Precompiled JSON serializers for Flask-RESTful response schemas.
+
+`flask_restful.marshal` walks a response schema field by field and builds an `OrderedDict` for every
+object before `json.dumps` walks it again. A `Serializer` compiles a schema once into a single function
+that reads each attribute and writes its JSON directly, producing byte-for-byte the same output as
+`marshal` followed by Flask-RESTful's `output_json`.
+"""
+import json
+import keyword
+
+from json.encoder import encode_basestring_ascii
+from typing import Any
+from typing import Callable
+from typing import Iterable
+from typing import Optional
+
+from flask import Response
+from flask import current_app
+from flask_restful import fields as flask_fields
+from flask_restful import marshal
+from flask_restful.representations.json import output_json
+
+JSON_MIMETYPE = 'application/json'
+
+
+def _encode_integer(value: Any) -> str:
+    """Encode a value formatted by `fields.Integer`."""
+    return int.__repr__(int(value))
+
+
+def _encode_string(value: Any) -> str:
+    """Encode a value formatted by `fields.String`."""
+    return encode_basestring_ascii(str(value))
+
+
+# Encoders for fields whose output only depends on the attribute value. Other fields, and fields reading
+# a different attribute, are serialized through their own `output` method.
+_ENCODERS = {
+    flask_fields.Integer: _encode_integer,
+    flask_fields.String: _encode_string
+}
+
+
+def _make_nested_encoder(field: flask_fields.Nested) -> Callable[[Any], str]:
+    """Compile a `fields.Nested` into an encoder for the related object."""
+    serialize = _compile(field.nested)
+    none = json.dumps(field.output('value', {'value': None}))
+    return lambda value: none if value is None else serialize(value)
+
+
+def _make_list_encoder(field: flask_fields.List) -> Callable[[Any], str]:
+    """Compile a `fields.List` of `fields.Nested` into an encoder for a collection of related objects."""
+    encode_item = _make_nested_encoder(field.container)
+
+    def encode(value):
+        if isinstance(value, (str, dict)) or not hasattr(value, '__iter__'):
+            return '[' + encode_item(value) + ']'
+        return '[' + ', '.join(map(encode_item, value)) + ']'
+    return encode
+
+
+def _make_encoder(field: flask_fields.Raw) -> Optional[Callable[[Any], str]]:
+    """Get the encoder for a field's non-null values, None if the field cannot be specialized."""
+    if field.attribute is not None:
+        return None
+    if type(field) in _ENCODERS:  # pylint: disable=C0123
+        return _ENCODERS[type(field)]
+    if type(field) is flask_fields.Nested:  # pylint: disable=C0123
+        return _make_nested_encoder(field)
+    if (type(field) is flask_fields.List  # pylint: disable=C0123
+            and type(field.container) is flask_fields.Nested and field.container.attribute is None):
+        return _make_list_encoder(field)
+    return None
+
+
+def _compile(response_schema: dict) -> Callable[[Any], str]:
+    """Generate a function serializing one object to the JSON text `marshal` and `json.dumps` would give."""
+    scope = {'_dumps': json.dumps}
+    lines = []
+    parts = []
+    for index, (key, field) in enumerate(response_schema.items()):
+        field = field() if isinstance(field, type) else field
+        encoder = _make_encoder(field) if key.isidentifier() and not keyword.iskeyword(key) else None
+        prefix = repr(('{' if index == 0 else ', ') + json.dumps(key) + ': ')
+        if encoder is None:
+            scope[f'field{index}'] = field
+            scope[f'key{index}'] = key
+            parts.append(f'{prefix} + _dumps(field{index}.output(key{index}, obj))')
+            continue
+        scope[f'encode{index}'] = encoder
+        scope[f'none{index}'] = json.dumps(field.output(key, {key: None}))
+        lines.append(f'    value{index} = obj.{key}\n')
+        parts.append(f'{prefix} + (none{index} if value{index} is None else encode{index}(value{index}))')
+    body = ' + '.join(parts) + " + '}'" if parts else "'{}'"
+    source = 'def serialize(obj):\n' + ''.join(lines) + f'    return {body}\n'
+    exec(compile(source, '<serializer>', 'exec'), scope)  # pylint: disable=W0122
+    return scope['serialize']
+
+
+class Serializer:
+    """Serializer compiled from a Flask-RESTful response schema.
+
+    `fields.Integer`, `fields.String`, `fields.Nested` and lists of `fields.Nested` are specialized; any
+    other field is still serialized correctly through its `output` method.
+    """
+    def __init__(self, response_schema: dict):
+        """Init a `Serializer`.
+
+        Args:
+            response_schema (dict): Flask-RESTful fields to include for each object, in output order.
+        """
+        self.response_schema = response_schema
+        self._serialize = _compile(response_schema)
+        self._subsets = {}
+
+    def subset(self, keys: Iterable[str] = None) -> 'Serializer':
+        """Get a serializer for some of this serializer's fields.
+
+        Subsets are compiled on first use and reused afterwards.
+
+        Args:
+            keys (Iterable[str]): Names of the fields to keep. Fields keep their order in the response
+                schema. None to keep every field.
+
+        Returns:
+            Serializer: Serializer writing only the given fields.
+        """
+        if keys is None:
+            return self
+        keys = frozenset(keys)
+        serializer = self._subsets.get(keys)
+        if serializer is None:
+            serializer = Serializer({key: field for key, field in self.response_schema.items() if key in keys})
+            self._subsets[keys] = serializer
+        return serializer
+
+    def dumps(self, obj: Any) -> str:
+        """Serialize one object to JSON."""
+        return self._serialize(obj)
+
+    def dumps_list(self, objs: Iterable) -> str:
+        """Serialize a sequence of objects to a JSON array."""
+        return '[' + ', '.join(map(self._serialize, objs)) + ']'
+
+    def make_response(self, data: Any, code: int = 200, headers: dict = None) -> Response:
+        """Create a JSON response for an object or a list of objects.
+
+        The body is identical to what returning `marshal(data, response_schema)` from a resource gives.
+        When the app customizes its JSON output (`RESTFUL_JSON` or debug mode indentation), the response
+        is built by `marshal` and `output_json` instead.
+
+        Args:
+            data: Object, or list or tuple of objects, to serialize.
+            code (int): Response status code.
+            headers (dict): Additional response headers.
+
+        Returns:
+            Response: An `application/json` response.
+        """
+        if current_app.debug or current_app.config.get('RESTFUL_JSON'):
+            return output_json(marshal(data, self.response_schema), code, headers)
+        if isinstance(data, (list, tuple)):
+            body = self.dumps_list(data)
+        else:
+            body = self._serialize(data)
+        response = Response(body + '\n', status=code, mimetype=JSON_MIMETYPE)
+        response.headers.extend(headers or {})
+        return response
@@ -1,17 +1,30 @@
 """Flask-RESTful resources for interacting with user data."""
 import flask_restful
+from flask import request
 from flask_restful import abort
 from flask_restful import fields as flask_fields
-from flask_restful import marshal_with
+from marshmallow import ValidationError
 from webargs import fields as webargs_fields
+from webargs.core import argmap2schema
 from webargs.flaskparser import parser
 from webargs.flaskparser import use_args
 
 from wayfare.exceptions import DuplicateEmailError
 from wayfare.exceptions import InvalidEmailError
+from wayfare.exceptions import WayfareError
 from wayfare.models.user import User
+from wayfare.routes.common import make_fields_schema
+from wayfare.routes.common import make_not_modified_response
+from wayfare.routes.common import make_page_headers
+from wayfare.routes.common import make_pagination_schema
+from wayfare.routes.common import make_validator_headers
+from wayfare.routes.common import stream_ndjson
+from wayfare.routes.common import wants_ndjson
+from wayfare.routes.serializers import Serializer
 
 BASE_URL = '/users'
+BATCH_URL = f'{BASE_URL}:batch'
+_MAX_BATCH_SIZE = 10000
 
 # Fields to include in a response body.
 _response_schema = {  # pylint: disable=C0103
@@ -20,6 +33,7 @@ _response_schema = {  # pylint: disable=C0103
     'last_name': flask_fields.String,
     'email': flask_fields.String
 }
+_serializer = Serializer(_response_schema)  # pylint: disable=C0103
 
 def _make_request_schema(require_all: bool = False) -> dict:
     """Create an expected schema for a request body or query.
@@ -51,13 +65,23 @@ def _handle_parse_error(err, req, schema):
 
 class Users(flask_restful.Resource):
     """Resource for interacting with `User` data."""
-    @marshal_with(_response_schema)
-    def get(self):
-        """Retrieve all users.
+    @use_args({**make_pagination_schema(), **make_fields_schema(_response_schema)}, locations=('query',))
+    def get(self, query_args: dict):
+        """Retrieve a page of users.
 
-        NOTE: This method can be very memory-intensive and should not be used in production.
+        The `Link` response header holds the url of the next page, if there is one. Clients that send
+        `Accept: application/x-ndjson` get every user instead, streamed one per line. `fields` limits each
+        user to the listed fields.
+
+        Args:
+            query_args (dict): Pagination and field arguments extracted from the query string.
         """
-        return list(User.get_all())
+        columns = query_args['fields']
+        serializer = _serializer.subset(columns)
+        if wants_ndjson():
+            return stream_ndjson(User.get_all(columns=columns), serializer)
+        users, next_cursor = User.get_page(query_args['limit'], query_args['after'], columns)
+        return serializer.make_response(users, headers=make_page_headers(query_args['limit'], next_cursor))
 
     @use_args(_make_request_schema(require_all=True))
     def post(self, request_body: dict):
@@ -89,22 +113,80 @@ class Users(flask_restful.Resource):
         return '', 200
 
 
+class UsersBatch(flask_restful.Resource):
+    """Resource for creating many users in one request."""
+    def post(self):
+        """Create a batch of users.
+
+        The request body is a JSON array of users. Every user is validated up front, all of their emails are
+        checked for duplicates together, and the valid users are inserted in a single transaction. Invalid
+        users are reported without preventing the valid ones from being created.
+
+        Returns:
+            A list with one result per submitted user, in order. Created users have a 201 `status`, their
+            `id` and `location`; rejected users have a 400 `status` and a `message`.
+        """
+        records = request.get_json(silent=True)
+        if not isinstance(records, list):
+            abort(400, message="Request body must be a JSON array of users.")
+        if len(records) > _MAX_BATCH_SIZE:
+            abort(413, message=f"A batch may contain at most {_MAX_BATCH_SIZE} users.")
+
+        schema = argmap2schema(_make_request_schema(require_all=True))()
+        results = [None] * len(records)
+        users = {}  # Valid users by their index in the request body.
+        emails = set()
+        for index, record in enumerate(records):
+            try:
+                if not isinstance(record, dict):
+                    raise ValidationError("Expected a JSON object.")
+                user = User(**schema.load(record).data)
+                if user.normalized_email in emails:
+                    raise DuplicateEmailError(user.email)
+            except ValidationError as ex:
+                results[index] = {'status': 400, 'message': ex.messages}
+                continue
+            except WayfareError as ex:
+                results[index] = {'status': 400, 'message': ex.message}
+                continue
+            emails.add(user.normalized_email)
+            users[index] = user
+
+        existing = User.find_existing_emails(user.email for user in users.values())
+        for index in [index for index, user in users.items() if user.normalized_email in existing]:
+            results[index] = {'status': 400, 'message': DuplicateEmailError(users.pop(index).email).message}
+
+        if users:
+            try:
+                user_ids = User.bulk_create(list(users.values()))
+            except DuplicateEmailError as ex:
+                abort(409, message=ex.message)
+            for index, user_id in zip(users, user_ids):
+                results[index] = {'status': 201, 'id': user_id, 'location': f'{BASE_URL}/{user_id}'}
+        return results, 200
+
+
 class UserById(flask_restful.Resource):
     """Resource for interacting with user data based on a user id."""
-    @marshal_with(_response_schema)
     def get(self, user_id: int):
         """Get a user resource by id.
 
+        The response carries `ETag` and `Last-Modified` headers. A request whose `If-None-Match` or
+        `If-Modified-Since` header matches the current version gets an empty 304 response instead.
+
         Args:
             user_id (int): id of the user to look up.
 
         Returns:
             User with the given id if found.
         """
+        not_modified = make_not_modified_response(User, user_id)
+        if not_modified:
+            return not_modified
         user = User.find_by_id(user_id)
         if not user:
             abort(404, message="User {} does not exist".format(user_id))
-        return user
+        return _serializer.make_response(user, headers=make_validator_headers(user))
 
     # TODO: This method should not require all fields.
     @use_args(_make_request_schema(require_all=True))
@@ -115,13 +197,18 @@ class UserById(flask_restful.Resource):
             request_body (dict): Data extracted from request body.
             user_id (int): user id provided in the uri path.
         """
-        user = User.find_by_id(user_id)
-        if user:
-            user.update_instance(request_body)
-            return '', 200
-        user = User(**request_body)
-        user.create()
-        return '', 201
+        try:
+            user = User.find_by_id(user_id)
+            if user:
+                user.update_instance(request_body)
+                return '', 200
+            user = User(**request_body)
+            user.create()
+            return '', 201
+        except DuplicateEmailError as ex:
+            abort(400, message=ex.message)
+        except InvalidEmailError as ex:
+            abort(400, message=ex.message)
 
     def delete(self, user_id: int):
         """Delete user with the given id.
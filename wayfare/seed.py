@@ -0,0 +1,261 @@
+"""Synthetic data for loading a database at production-like scale.
+
+The generated data follows skewed, realistic distributions rather than uniform ones: a few locations and
+drivers account for most rides, departures cluster around commuting hours and weekends, and most rides
+have a few passenger requests. The same seed always generates the same rows.
+
+Example:
+    with app.app_context():
+        counts = seed_database(db.engine, rides=1000000)
+"""
+import bisect
+import functools
+import itertools
+import random
+
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Sequence
+from typing import Tuple
+
+from sqlalchemy import DateTime
+from sqlalchemy import Table
+from sqlalchemy.engine import Engine
+
+from wayfare.models import Location
+from wayfare.models import Passenger
+from wayfare.models import Ride
+from wayfare.models import Status
+from wayfare.models import TimeRange
+from wayfare.models import User
+from wayfare.models.passenger import HOLDING_STATUSES
+
+
+STATUSES = ('Pending', 'Confirmed', 'Declined')
+# (description, start hour, end hour), covering the day.
+TIME_RANGES = (('Night', 0, 6), ('Morning', 6, 12), ('Afternoon', 12, 18), ('Evening', 18, 24))
+FIRST_DAY = date(2019, 1, 1)
+
+_CHUNK_SIZE = 50000
+# Share of users who drive at all.
+_DRIVER_SHARE = 0.2
+# Relative departure frequency of each hour of the day, peaking at commuting hours.
+_HOUR_WEIGHTS = (1, 1, 1, 1, 2, 4, 8, 12, 10, 6, 5, 5, 6, 5, 5, 7, 10, 12, 9, 6, 4, 3, 2, 1)
+# Relative departure frequency of each weekday, Monday first, peaking on Fridays and Sundays.
+_WEEKDAY_WEIGHTS = (5, 4, 4, 5, 9, 6, 8)
+_CAPACITY_WEIGHTS = {1: 5, 2: 15, 3: 30, 4: 30, 5: 10, 6: 6, 7: 4}
+_STATUS_WEIGHTS = (3, 6, 1)
+# Rides are created up to this many days before they depart.
+_MAX_BOOKING_DAYS = 14
+
+# Columns of the generated rows, in table order so rows can be passed to the driver without reordering.
+_USER_COLUMNS = ('date_created', 'date_modified', 'first_name', 'last_name', 'email', 'normalized_email',
+                 'password')
+_RIDE_COLUMNS = ('date_created', 'date_modified', 'departure_date', 'capacity', 'seats_available',
+                 'time_range_id', 'driver_id', 'start_location_id', 'destination_id')
+_PASSENGER_COLUMNS = ('date_created', 'date_modified', 'user_id', 'ride_id', 'status_id')
+
+
+def _make_sampler(rng: random.Random, weights: Sequence[float]) -> Callable[[], int]:
+    """Return a function drawing an index from `range(len(weights))` with the given weights."""
+    cumulative = list(itertools.accumulate(weights))
+    total = cumulative[-1]
+    random_ = rng.random
+
+    def sample() -> int:
+        return bisect.bisect(cumulative, random_() * total)
+    return sample
+
+
+def _zipf_weights(count: int, exponent: float) -> List[float]:
+    """Return weights drawing the n-th item about n^exponent times less often than the first."""
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def _chunks(rows: Iterator[tuple]) -> Iterator[List[tuple]]:
+    """Split rows into lists of at most `_CHUNK_SIZE` rows."""
+    while True:
+        chunk = list(itertools.islice(rows, _CHUNK_SIZE))
+        if not chunk:
+            return
+        yield chunk
+
+
+class _BulkInserter:
+    """Inserts rows given as tuples with DBAPI `executemany` calls.
+
+    Core `insert()` executions convert every value of every row through the column types, which costs more
+    than generating the rows. Here the statement is compiled once, rows are passed to the driver as they
+    are, and timestamps, of which there are few distinct ones, are converted once each by `timestamp`.
+    """
+    def __init__(self, engine: Engine, progress: Callable[[str, int], None] = None):
+        """Init a `_BulkInserter`.
+
+        Args:
+            engine (Engine): Engine of the database to load.
+            progress (Callable[[str, int], None]): Function called after each chunk with a table name and
+                its number of rows inserted so far.
+        """
+        self.engine = engine
+        self.progress = progress
+        self.counts = {}
+        process = DateTime().dialect_impl(engine.dialect).bind_processor(engine.dialect)
+        self.timestamp = functools.lru_cache(maxsize=None)(process or (lambda value: value))
+
+    def insert(self, table: Table, columns: Sequence[str], rows: Iterable[tuple]):
+        """Insert rows, committing every `_CHUNK_SIZE` rows.
+
+        Args:
+            table (Table): Table to insert into.
+            columns (Sequence[str]): Names of the columns, in the order of the values of each row.
+            rows (Iterable[tuple]): Rows to insert.
+        """
+        compiled = table.insert().compile(dialect=self.engine.dialect, column_keys=list(columns))
+        if self.engine.dialect.positional:
+            order = [columns.index(key) for key in compiled.positiontup]
+
+            def parameters(chunk: List[tuple]) -> list:
+                if order == list(range(len(columns))):
+                    return chunk
+                return [tuple(row[index] for index in order) for row in chunk]
+        else:
+            def parameters(chunk: List[tuple]) -> list:
+                return [dict(zip(columns, row)) for row in chunk]
+        for chunk in _chunks(iter(rows)):
+            with self.engine.begin() as connection:
+                connection.connection.cursor().executemany(str(compiled), parameters(chunk))
+            self.counts[table.name] = self.counts.get(table.name, 0) + len(chunk)
+            if self.progress is not None:
+                self.progress(table.name, self.counts[table.name])
+
+
+def _users(count: int, created: str) -> Iterator[tuple]:
+    """Generate user rows."""
+    for user_id in range(1, count + 1):
+        email = f'user{user_id}@example.com'
+        yield (created, created, 'User', str(user_id), email, email, 'password')
+
+
+def _rides(rng: random.Random, counts: Dict[str, int], days: int, timestamp: Callable[[datetime], str],
+           passengers: List[tuple]) -> Iterator[tuple]:
+    """Generate ride rows, appending the passenger rows of each ride to `passengers`."""
+    user_count = counts['users']
+    # Drivers are the users with the lowest ids, a few of them driving most of the rides.
+    sample_driver = _make_sampler(rng, _zipf_weights(max(1, int(user_count * _DRIVER_SHARE)), 0.8))
+    sample_location = _make_sampler(rng, _zipf_weights(counts['locations'], 1.0))
+    sample_hour = _make_sampler(rng, _HOUR_WEIGHTS)
+    sample_day = _make_sampler(rng, [_WEEKDAY_WEIGHTS[(FIRST_DAY + timedelta(days=day)).weekday()]
+                                     for day in range(days)])
+    capacities = list(_CAPACITY_WEIGHTS)
+    sample_capacity = _make_sampler(rng, list(_CAPACITY_WEIGHTS.values()))
+    sample_status = _make_sampler(rng, _STATUS_WEIGHTS)
+    time_range_ids = [next(index + 1 for index, (_, start, end) in enumerate(TIME_RANGES)
+                           if start <= hour < end) for hour in range(24)]
+    first_day = datetime.combine(FIRST_DAY, datetime.min.time())
+    random_ = rng.random
+
+    @functools.lru_cache(maxsize=None)
+    def times(day: int, hour: int, quarter: int, booking_days: int) -> Tuple[str, str]:
+        """Return the departure and creation timestamps of a ride."""
+        departure_date = first_day + timedelta(days=day, hours=hour, minutes=15 * quarter)
+        return timestamp(departure_date), timestamp(departure_date - timedelta(days=booking_days))
+
+    for ride_id in range(1, counts['rides'] + 1):
+        start_location_id = sample_location() + 1
+        destination_id = start_location_id
+        while destination_id == start_location_id:
+            destination_id = sample_location() + 1
+        hour = sample_hour()
+        departure_date, created = times(sample_day(), hour, int(random_() * 4),
+                                        1 + int(random_() * _MAX_BOOKING_DAYS))
+        driver_id = sample_driver() + 1
+        capacity = capacities[sample_capacity()]
+        # Most rides get a few requests, sometimes more than there are seats: once the ride is full, the
+        # remaining requests are declined.
+        seats_available = capacity
+        requested = {driver_id}
+        for _ in range(int(random_() * (capacity + 2))):
+            user_id = 1 + int(random_() * user_count)
+            if user_id not in requested:
+                requested.add(user_id)
+                status = STATUSES[sample_status()]
+                if status in HOLDING_STATUSES:
+                    if seats_available:
+                        seats_available -= 1
+                    else:
+                        status = 'Declined'
+                passengers.append((created, created, user_id, ride_id, STATUSES.index(status) + 1))
+        yield (created, created, departure_date, capacity, seats_available, time_range_ids[hour], driver_id,
+               start_location_id, destination_id)
+
+
+def seed_database(engine: Engine, users: int = 10000, rides: int = 100000, locations: int = 200,
+                  days: int = 365, seed: int = 0,
+                  progress: Callable[[str, int], None] = None) -> Dict[str, int]:
+    """Insert synthetic locations, statuses, time ranges, users, rides and passengers.
+
+    The tables must exist and be empty, since rows reference each other by the ids they get when inserted
+    into empty tables. Rows are inserted in bulk, committing every chunk, with the indexes of the large
+    tables dropped during the load and rebuilt afterwards. The tables are analyzed at the end so the query
+    planner sees the real cardinalities.
+
+    Args:
+        engine (Engine): Engine of the database to load.
+        users (int): Number of users. A fifth of them are drivers.
+        rides (int): Number of rides, departing over `days` days from `FIRST_DAY`.
+        locations (int): Number of locations.
+        days (int): Number of days rides depart over.
+        seed (int): Random seed.
+        progress (Callable[[str, int], None]): Function called after each chunk with a table name and its
+            number of rows inserted so far.
+
+    Returns:
+        Dict[str, int]: Number of rows inserted into each table.
+
+    Raises:
+        ValueError: If there are fewer than 2 users, 2 locations or 1 day, or if a table is not empty.
+    """
+    if users < 2 or locations < 2 or days < 1:
+        raise ValueError('At least 2 users, 2 locations and 1 day are needed')
+    tables = (Location.__table__, Status.__table__, TimeRange.__table__, User.__table__, Ride.__table__,
+              Passenger.__table__)
+    for table in tables:
+        if engine.execute(table.select().limit(1)).first() is not None:
+            raise ValueError(f'Table {table.name} is not empty')
+    rng = random.Random(seed)
+    inserter = _BulkInserter(engine, progress)
+    created = inserter.timestamp(datetime.combine(FIRST_DAY, datetime.min.time()) - timedelta(days=30))
+    location_rows = [(created, created, f'Location {location_id}') for location_id in range(1, locations + 1)]
+    inserter.insert(Location.__table__, ('date_created', 'date_modified', 'name'), location_rows)
+    inserter.insert(Status.__table__, ('date_created', 'date_modified', 'description'),
+                    [(created, created, description) for description in STATUSES])
+    inserter.insert(TimeRange.__table__,
+                    ('date_created', 'date_modified', 'description', 'start_time', 'end_time'),
+                    [(created, created, *time_range) for time_range in TIME_RANGES])
+
+    # Building an index once over the loaded rows is much faster than updating it row by row.
+    indexes = [index for table in (User.__table__, Ride.__table__, Passenger.__table__)
+               for index in table.indexes]
+    for index in indexes:
+        index.drop(engine)
+    try:
+        inserter.insert(User.__table__, _USER_COLUMNS, _users(users, created))
+        passengers = []
+        counts = {'users': users, 'rides': rides, 'locations': locations}
+        for chunk in _chunks(_rides(rng, counts, days, inserter.timestamp, passengers)):
+            # Passengers are inserted after the rides they reference.
+            inserter.insert(Ride.__table__, _RIDE_COLUMNS, chunk)
+            inserter.insert(Passenger.__table__, _PASSENGER_COLUMNS, passengers)
+            passengers.clear()
+    finally:
+        for index in indexes:
+            index.create(engine)
+    with engine.connect() as connection:
+        connection.execute('ANALYZE')
+    return inserter.counts
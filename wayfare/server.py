@@ -0,0 +1,107 @@
+"""Prefork WSGI server for running the app in production, with gunicorn."""
+import threading
+import time
+
+from typing import Callable
+
+from flask import Flask
+from gunicorn.app.base import BaseApplication
+
+from wayfare import db
+from wayfare.models.cache import configure_entity_caches
+
+# Seconds between the logs of how many requests each worker has served.
+_REPORT_INTERVAL = 60.0
+
+
+class _Application(BaseApplication):  # pylint: disable=W0223
+    """gunicorn application serving the Flask app built by a factory."""
+    def __init__(self, app_factory: Callable[[], Flask], options: dict):
+        """Init an `_Application`.
+
+        Args:
+            app_factory (Callable[[], Flask]): Function creating the Flask app.
+            options (dict): gunicorn settings.
+        """
+        self.app_factory = app_factory
+        self.options = options
+        self.application = None
+        super().__init__()
+
+    def load_config(self):
+        """Apply the gunicorn settings and the worker lifecycle hooks."""
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+        self.cfg.set('post_fork', self._post_fork)
+        self.cfg.set('post_request', _count_request)
+        self.cfg.set('worker_exit', _report_requests)
+
+    def load(self) -> Flask:
+        """Create the Flask app. This runs once in the master with `preload`, otherwise once per worker.
+
+        With several workers, the `User` and `Ride` caches are disabled: a worker's cache is only invalidated
+        by its own writes, so it would keep serving rows and `ETag`s that another worker changed.
+        """
+        self.application = self.app_factory()
+        if self.options['workers'] > 1:
+            configure_entity_caches(0, 0)
+        return self.application
+
+    def _post_fork(self, server, worker):  # pylint: disable=W0613
+        """Drop database connections inherited from the master, which must not be shared between processes."""
+        worker.wayfare_requests = 0
+        worker.wayfare_requests_lock = threading.Lock()
+        worker.wayfare_reported_at = time.monotonic()
+        if self.application is not None:
+            with self.application.app_context():
+                db.engine.dispose()
+
+
+def _count_request(worker, req, environ, resp):  # pylint: disable=W0613
+    """Count a request served by a worker, logging the count every `_REPORT_INTERVAL` seconds."""
+    now = time.monotonic()
+    with worker.wayfare_requests_lock:
+        worker.wayfare_requests += 1
+        if now - worker.wayfare_reported_at < _REPORT_INTERVAL:
+            return
+        worker.wayfare_reported_at = now
+        requests = worker.wayfare_requests
+    worker.log.info('Worker %s has served %d requests', worker.pid, requests)
+
+
+def _report_requests(server, worker):
+    """Log how many requests a worker served before it exited or was restarted."""
+    server.log.info('Worker %s served %d requests', worker.pid, getattr(worker, 'wayfare_requests', 0))
+
+
+def serve(app_factory: Callable[[], Flask], bind: str, workers: int, threads: int = 1,
+          preload: bool = False, max_requests: int = 0):
+    """Serve the app with a master process managing a pool of worker processes.
+
+    With `preload`, the app is created once in the master and workers are forked from it, sharing its
+    memory copy-on-write; otherwise each worker creates its own app. Sending SIGHUP to the master restarts
+    the workers gracefully: new workers start before the old ones finish their in-flight requests. Each
+    worker logs how many requests it has served once a minute while it serves requests, and when it exits.
+
+    Each worker keeps its own model caches, so with several workers the `User` and `Ride` caches are
+    disabled. The reference caches stay on and see other workers' writes once they expire.
+
+    Args:
+        app_factory (Callable[[], Flask]): Function creating the Flask app.
+        bind (str): Address to listen on, as `host:port`.
+        workers (int): Number of worker processes.
+        threads (int): Number of request threads per worker.
+        preload (bool): True to create the app in the master before forking workers.
+        max_requests (int): Number of requests after which a worker is gracefully replaced. 0 to never
+            replace workers.
+    """
+    _Application(app_factory, {
+        'bind': bind,
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread' if threads > 1 else 'sync',
+        'preload_app': preload,
+        'max_requests': max_requests,
+        # Spread the replacements so workers do not all restart at once.
+        'max_requests_jitter': max_requests // 10
+    }).run()
@@ -0,0 +1,284 @@
+"""Slow query log.
+
+When `WAYFARE_SLOW_QUERY_MS` is set, every statement taking at least that many milliseconds is recorded
+with the types of its bound parameters, the model method that ran it (or, for queries a resource runs
+itself, the resource method) and, on SQLite, its `EXPLAIN QUERY PLAN`. Each slow statement is written as a
+line of JSON to `WAYFARE_SLOW_QUERY_LOG`, which is rotated when it reaches `WAYFARE_SLOW_QUERY_LOG_BYTES`.
+
+Parameter values include passwords and emails, so they are only logged with `WAYFARE_SLOW_QUERY_PARAMETERS`
+set. They are never served by `/debug/slow-queries`.
+
+Slow statements are also grouped by fingerprint: their SQL with literals and lists of parameters replaced
+by placeholders. `/debug/slow-queries?limit=10` returns the fingerprints that took the most time in total.
+
+Statements faster than the threshold only cost a comparison on top of being timed.
+"""
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import re
+import sys
+import threading
+
+from datetime import datetime
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from flask import Flask
+from flask import has_request_context
+from flask import jsonify
+from flask import request
+from sqlalchemy.engine import Connection
+from sqlalchemy.engine import Engine
+
+from wayfare.instrumentation import time_statements
+
+
+_logger = logging.getLogger(__name__)  # pylint: disable=C0103
+
+SLOW_QUERIES_URL = '/debug/slow-queries'
+# Fingerprints kept for `/debug/slow-queries`. When full, the one with the least total time is dropped.
+_MAX_FINGERPRINTS = 1000
+# Rows of an `executemany` logged with a slow statement.
+_MAX_LOGGED_ROWS = 10
+# Modules whose frames are never reported as the caller of a statement.
+_INSTRUMENTATION_MODULES = frozenset(('wayfare.instrumentation', 'wayfare.metrics', 'wayfare.slow_queries',
+                                     'wayfare.testing'))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(statement: str) -> str:
+    """Reduce a statement to the SQL shared by every execution of the same query.
+
+    Args:
+        statement (str): SQL statement.
+
+    Returns:
+        str: Statement with whitespace collapsed, literals replaced by `?` and lists of placeholders, such as
+            the values of an `IN` clause, replaced by `(...)`.
+    """
+    statement = _STRING_LITERAL.sub('?', statement)
+    statement = _NUMBER_LITERAL.sub('?', statement)
+    statement = _PLACEHOLDER_LIST.sub('(...)', statement)
+    return _WHITESPACE.sub(' ', statement).strip()
+
+
+def fingerprint(normalized: str) -> str:
+    """Return a short id for a normalized statement."""
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def _describe_frame(frame) -> str:
+    """Name the function running in a frame, as `Class.method` for methods."""
+    code = frame.f_code
+    owner = frame.f_locals.get('cls', frame.f_locals.get('self'))
+    if owner is not None:
+        return f'{owner.__name__ if isinstance(owner, type) else type(owner).__name__}.{code.co_name}'
+    # Static methods have neither `cls` nor `self`: look for the class of the module defining them.
+    for value in list(frame.f_globals.values()):
+        if isinstance(value, type) and code.co_name in value.__dict__:
+            function = value.__dict__[code.co_name]
+            if getattr(getattr(function, '__func__', function), '__code__', None) is code:
+                return f'{value.__name__}.{code.co_name}'
+    return f'{frame.f_globals.get("__name__")}.{code.co_name}'
+
+
+def find_caller() -> Optional[str]:
+    """Name the app function a statement being executed comes from.
+
+    This is the outermost model method on the stack, the one a resource called, or else the innermost
+    function of the app, such as a resource method iterating over a query a model built.
+
+    Returns:
+        Optional[str]: Function name, None if no function of the app is on the stack.
+    """
+    caller = None
+    frame = sys._getframe(1)  # pylint: disable=W0212
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module.startswith('wayfare.') and module not in _INSTRUMENTATION_MODULES:
+            if module.startswith('wayfare.models'):
+                caller = _describe_frame(frame)
+            else:
+                return caller or _describe_frame(frame)
+        frame = frame.f_back
+    return caller
+
+
+def redact(parameters: Any) -> Any:
+    """Replace the values of a statement's parameters with their type names.
+
+    Args:
+        parameters (Any): Parameters of a statement, as a sequence or a mapping.
+
+    Returns:
+        Any: Parameters of the same shape, with each value replaced by its type name, such as `<str>`.
+    """
+    if isinstance(parameters, dict):
+        return {name: f'<{type(value).__name__}>' for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [f'<{type(value).__name__}>' for value in parameters]
+    return f'<{type(parameters).__name__}>'
+
+
+def explain(connection: Connection, statement: str, parameters: Any) -> Optional[List[str]]:
+    """Return the `EXPLAIN QUERY PLAN` of a statement on SQLite.
+
+    The plan is read through a separate DBAPI cursor of the same connection, so that the rows of a query
+    that was just executed are left to be fetched.
+
+    Args:
+        connection (Connection): Connection the statement ran on.
+        statement (str): SQL statement.
+        parameters (Any): Parameters the statement ran with.
+
+    Returns:
+        Optional[List[str]]: One line per step of the plan, indented by depth, or None if the database is
+            not SQLite or the statement cannot be explained.
+    """
+    if connection.dialect.name != 'sqlite':
+        return None
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+        rows = cursor.fetchall()
+    except connection.dialect.dbapi.Error:
+        return None
+    finally:
+        cursor.close()
+    depths = {0: -1}
+    lines = []
+    for step_id, parent_id, _, detail in rows:
+        depths[step_id] = depths.get(parent_id, -1) + 1
+        lines.append('  ' * depths[step_id] + detail)
+    return lines
+
+
+class SlowQueryRecorder:
+    """Records statements slower than a threshold and aggregates them by fingerprint."""
+    def __init__(self, threshold: float, explain_plans: bool = True, log_parameters: bool = False):
+        """Init a `SlowQueryRecorder`.
+
+        Args:
+            threshold (float): Duration in seconds from which a statement is slow.
+            explain_plans (bool): True to capture the query plan of each fingerprint's first slow statement.
+            log_parameters (bool): True to log the values of the statements' parameters, False to only log
+                their types, see `redact`.
+        """
+        self.threshold = threshold
+        self.explain_plans = explain_plans
+        self.log_parameters = log_parameters
+        self._lock = threading.Lock()
+        self._fingerprints = {}  # Fingerprint -> aggregate, see `top`.
+
+    def record(self, connection: Connection, statement: str, parameters: Any, executemany: bool,
+               duration: float):
+        """Record a statement if it is slow. Meant to be passed to `time_statements`."""
+        if duration < self.threshold:
+            return
+        normalized = normalize(statement)
+        key = fingerprint(normalized)
+        caller = find_caller()
+        with self._lock:
+            entry = self._fingerprints.get(key)
+            if entry is None:
+                entry = self._add(key, normalized, caller)
+            entry['count'] += 1
+            entry['total_ms'] += duration * 1000
+            entry['max_ms'] = max(entry['max_ms'], duration * 1000)
+            plan = entry['plan']
+        if plan is None and self.explain_plans and not executemany:
+            plan = explain(connection, statement, parameters)
+            with self._lock:
+                entry['plan'] = plan
+        if executemany:
+            first_rows = parameters[:_MAX_LOGGED_ROWS]
+            if not self.log_parameters:
+                first_rows = [redact(row) for row in first_rows]
+            parameters = {'rows': len(parameters), 'first_rows': list(first_rows)}
+        elif not self.log_parameters:
+            parameters = redact(parameters)
+        _logger.warning('%s', json.dumps({
+            'time': datetime.utcnow().isoformat(),
+            'duration_ms': round(duration * 1000, 3),
+            'fingerprint': key,
+            'statement': statement,
+            'parameters': parameters,
+            'caller': caller,
+            'request': f'{request.method} {request.full_path.rstrip("?")}' if has_request_context() else None,
+            'plan': plan
+        }, default=str))
+
+    def top(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Return the fingerprints that took the most time in total.
+
+        Args:
+            limit (int): Number of fingerprints to return.
+
+        Returns:
+            List[Dict[str, Any]]: For each fingerprint, slowest first, its normalized statement, the caller of
+                its first slow execution, its plan and its number of slow executions with their total, mean
+                and maximum durations in milliseconds.
+        """
+        with self._lock:
+            entries = sorted(self._fingerprints.values(), key=lambda entry: entry['total_ms'], reverse=True)
+            entries = [dict(entry) for entry in entries[:limit]]
+        for entry in entries:
+            entry['mean_ms'] = entry['total_ms'] / entry['count']
+        return entries
+
+    def _add(self, key: str, normalized: str, caller: Optional[str]) -> Dict[str, Any]:
+        """Start aggregating a new fingerprint, dropping the least costly one if full. Needs `_lock`."""
+        if len(self._fingerprints) >= _MAX_FINGERPRINTS:
+            cheapest = min(self._fingerprints, key=lambda other: self._fingerprints[other]['total_ms'])
+            del self._fingerprints[cheapest]
+        entry = self._fingerprints[key] = {'fingerprint': key, 'statement': normalized, 'caller': caller,
+                                           'plan': None, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+        return entry
+
+
+def _add_log_file(path: str, max_bytes: int, backups: int):
+    """Write the slow query log to a rotating file, unless it already is."""
+    for handler in _logger.handlers:
+        if isinstance(handler, logging.FileHandler) and handler.baseFilename == os.path.abspath(path):
+            return
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, delay=True)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    _logger.addHandler(handler)
+    _logger.setLevel(logging.WARNING)
+
+
+def configure_slow_query_log(app: Flask, engine: Engine) -> Optional[SlowQueryRecorder]:
+    """Record slow statements and serve them at `SLOW_QUERIES_URL`, if `WAYFARE_SLOW_QUERY_MS` is set.
+
+    Args:
+        app (Flask): App whose settings to read and to add the endpoint to.
+        engine (Engine): Engine whose statements to record.
+
+    Returns:
+        Optional[SlowQueryRecorder]: Recorder of the slow statements, None if the log is disabled.
+    """
+    threshold = app.config['WAYFARE_SLOW_QUERY_MS']
+    if threshold is None:
+        return None
+    recorder = SlowQueryRecorder(threshold / 1000, explain_plans=app.config['WAYFARE_SLOW_QUERY_EXPLAIN'],
+                                 log_parameters=app.config['WAYFARE_SLOW_QUERY_PARAMETERS'])
+    app.extensions['wayfare_slow_queries'] = recorder
+    time_statements(engine, recorder.record)
+    if app.config['WAYFARE_SLOW_QUERY_LOG']:
+        _add_log_file(app.config['WAYFARE_SLOW_QUERY_LOG'], app.config['WAYFARE_SLOW_QUERY_LOG_BYTES'],
+                      app.config['WAYFARE_SLOW_QUERY_LOG_BACKUPS'])
+
+    @app.route(SLOW_QUERIES_URL)
+    def _slow_queries():  # pylint: disable=W0612
+        return jsonify(recorder.top(request.args.get('limit', 10, type=int)))
+
+    return recorder
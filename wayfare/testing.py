@@ -0,0 +1,70 @@
+"""Helpers for testing the app.
+
+`QueryBudget` fails a test when a block of code, typically a request to a resource, executes more SQL
+statements than it is allowed to. Pinning a budget on each endpoint catches changes that add queries, such
+as a list endpoint that starts loading a relationship once per row:
+
+    with QueryBudget(1, engine, 'GET /rides'):
+        client.get('/rides').get_data()
+
+It can also decorate a test, counting the statements the whole test executes on the current app's engine:
+
+    @QueryBudget(2)
+    def test_expand(self):
+        ...
+
+Statements run while a streamed response body is read are only counted if the body is read in the block.
+"""
+import contextlib
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from wayfare import db
+from wayfare.slow_queries import find_caller
+
+
+class QueryBudget(contextlib.ContextDecorator):
+    """Counts the SQL statements executed in a block and fails if there are more than a budget.
+
+    Attributes:
+        statements (List[Tuple[str, str]]): Caller and SQL of each statement executed in the block so far,
+            see `wayfare.slow_queries.find_caller`.
+    """
+    def __init__(self, max_statements: int, engine: Engine = None, description: str = 'Block'):
+        """Init a `QueryBudget`.
+
+        Args:
+            max_statements (int): Number of statements the block may execute.
+            engine (Engine): Engine whose statements to count, the current app's engine if None.
+            description (str): What the block does, for the failure message.
+        """
+        self.max_statements = max_statements
+        self.engine = engine
+        self.description = description
+        self.statements = []
+        self._counted_engine = None
+
+    def __enter__(self) -> 'QueryBudget':
+        self.statements = []
+        self._counted_engine = self.engine or db.engine
+        event.listen(self._counted_engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        event.remove(self._counted_engine, 'before_cursor_execute', self._count)
+        if exc_type is None and len(self.statements) > self.max_statements:
+            raise AssertionError(self.failure_message())
+        return False
+
+    def failure_message(self) -> str:
+        """Describe the statements executed in the block and the budget they exceed."""
+        lines = [f'{self.description} executed {len(self.statements)} SQL statements, over its budget of '
+                 f'{self.max_statements}:']
+        for index, (caller, statement) in enumerate(self.statements, start=1):
+            lines.append(f'  {index}. [{caller}] {" ".join(statement.split())}')
+        return '\n'.join(lines)
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):  # pylint: disable=W0613
+        """Record a statement about to be executed."""
+        self.statements.append((find_caller(), statement))
@@ -0,0 +1,75 @@
+"""Shared fixtures for the unit tests."""
+from typing import Callable
+
+import pytest
+
+from flask import Flask
+
+from wayfare import create_app
+from wayfare import db
+from wayfare import init_db
+from wayfare.models import Location
+from wayfare.models import Ride
+from wayfare.models import Status
+from wayfare.models import TimeRange
+from wayfare.models import User
+from wayfare.seed import seed_database
+
+
+def _create_test_app(config: dict) -> Flask:
+    """Create an app with its own in-memory database.
+
+    The session of the calling thread is removed first, since it is bound to the app it was created in.
+    """
+    db.session.remove()
+    test_app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', **config})
+    init_db(test_app)
+    return test_app
+
+
+@pytest.fixture(scope='session', autouse=True)
+def app():
+    """Run every test inside the context of an app backed by an in-memory database."""
+    test_app = _create_test_app({})
+    with test_app.app_context():
+        yield test_app
+
+
+@pytest.fixture
+def app_factory(request) -> Callable[..., Flask]:
+    """Create apps with their own in-memory database and extra settings, such as `WAYFARE_METRICS=True`.
+
+    The factory is also set as `create_app` on the test case using the fixture, for `unittest` test cases.
+    """
+    def factory(**config) -> Flask:
+        return _create_test_app(config)
+    if request.instance is not None:
+        request.instance.create_app = factory
+    yield factory
+    db.session.remove()
+
+
+@pytest.fixture(scope='class')
+def _seeded_app(request):
+    """Create one app per test class, seeded with the `seed_database` arguments in the class's `seed`."""
+    test_app = _create_test_app({})
+    with test_app.app_context():
+        seed_database(db.engine, **request.cls.seed)
+        request.cls.engine = db.engine
+    request.cls.app = test_app
+    request.cls.client = test_app.test_client()
+    yield test_app
+    db.session.remove()
+
+
+@pytest.fixture
+def seeded_app(_seeded_app):  # pylint: disable=W0621
+    """Give a test class a seeded app as `app`, its test client as `client` and its engine as `engine`.
+
+    The app is shared by the class's tests, but the model caches are emptied before each of them.
+    """
+    for model_class in (Location, Ride, Status, TimeRange, User):
+        model_class.invalidate_cache()
+    # Requests would otherwise reuse this thread's session, which is bound to the session-wide app.
+    db.session.remove()
+    return _seeded_app
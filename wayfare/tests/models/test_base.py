@@ -0,0 +1,40 @@
+"""Unit tests for AbstractModelBase."""
+import unittest
+
+from wayfare.models import AbstractModelBase
+from wayfare.models import Location
+
+
+class TestTransaction(unittest.TestCase):
+    """Tests for AbstractModelBase.transaction."""
+    def setUp(self):
+        Location.delete_all()
+
+    def test_commit(self):
+        with AbstractModelBase.transaction():
+            Location(name='San Luis Obispo').create()
+            location = Location(name='San Francisco')
+            location.create()
+            location.update_instance({'name': 'San Diego'})
+        self.assertEqual([location.name for location in Location.get_all()], ['San Luis Obispo', 'San Diego'])
+
+    def test_rollback(self):
+        Location(name='San Luis Obispo').create()
+        with self.assertRaises(ValueError):
+            with AbstractModelBase.transaction():
+                Location(name='San Francisco').create()
+                Location.find_by_name('San Luis Obispo').delete_instance()
+                raise ValueError()
+        self.assertEqual([location.name for location in Location.get_all()], ['San Luis Obispo'])
+
+    def test_nested(self):
+        with self.assertRaises(ValueError):
+            with AbstractModelBase.transaction():
+                with AbstractModelBase.transaction():
+                    Location(name='San Francisco').create()
+                raise ValueError()
+        self.assertEqual(Location.find_by_name('San Francisco'), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
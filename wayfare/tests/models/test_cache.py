@@ -0,0 +1,166 @@
+"""Unit tests for model caches."""
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from datetime import datetime
+from typing import Any
+from typing import Callable
+
+import pytest
+
+from wayfare import db
+from wayfare.models import Location
+from wayfare.models import User
+from wayfare.models import cache
+from wayfare.models.cache import DEFAULT_REFERENCE_CACHE_TTL
+from wayfare.models.cache import EntityCache
+
+
+def _create_user(index: int) -> User:
+    user = User(
+        first_name='test',
+        last_name='test',
+        email=f'email{index}@example.com',
+        password='password'
+    )
+    user.create()
+    return user
+
+
+class TestEntityCache(unittest.TestCase):
+    """Tests for EntityCache."""
+    def setUp(self):
+        User.delete_all()
+        self.registered = list(cache._caches)  # pylint: disable=W0212
+        self.cache = EntityCache(User, max_size=2, ttl=60, register=False)
+
+    def tearDown(self):
+        cache._caches[:] = self.registered  # pylint: disable=W0212
+
+    def test_not_registered(self):
+        self.assertNotIn(self.cache, cache._caches)  # pylint: disable=W0212
+
+    def test_hit(self):
+        user = _create_user(0)
+        self.assertEqual(self.cache.get(user.id).email, 'email0@example.com')
+        self.assertEqual(self.cache.get(user.id).email, 'email0@example.com')
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_ratio']), (1, 1, 0.5))
+
+    def test_nonexistent_id_not_cached(self):
+        self.assertEqual(self.cache.get(5), None)
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_lru_eviction(self):
+        users = [_create_user(index) for index in range(3)]
+        self.cache.get(users[0].id)
+        self.cache.get(users[1].id)
+        self.cache.get(users[0].id)
+        self.cache.get(users[2].id)  # Evicts users[1], the least recently used.
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+        self.cache.get(users[0].id)
+        self.assertEqual(self.cache.stats()['hits'], 2)
+        self.cache.get(users[1].id)
+        self.assertEqual(self.cache.stats()['misses'], 4)
+
+    def test_ttl_expiration(self):
+        user = _create_user(0)
+        self.cache.configure(max_size=2, ttl=0.01)
+        self.cache.get(user.id)
+        time.sleep(0.02)
+        self.cache.get(user.id)
+        self.assertEqual(self.cache.stats()['expirations'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 2)
+
+    def test_write_evicts(self):
+        user = _create_user(0)
+        self.assertEqual(User.find_by_id(user.id).first_name, 'test')
+        user.update_instance({'first_name': 'updated'})
+        self.assertEqual(User.find_by_id(user.id).first_name, 'updated')
+        user.delete_instance()
+        self.assertEqual(User.find_by_id(user.id), None)
+
+
+class TestReferenceCache(unittest.TestCase):
+    """Tests for ReferenceCache."""
+    def setUp(self):
+        Location.delete_all()
+        Location._cache.configure(ttl=0.05)  # pylint: disable=W0212
+
+    def tearDown(self):
+        Location._cache.configure(ttl=DEFAULT_REFERENCE_CACHE_TTL)  # pylint: disable=W0212
+
+    def test_out_of_band_insert(self):
+        self.assertEqual(Location.find_by_name('San Francisco'), None)
+        expirations = Location._cache.stats()['expirations']  # pylint: disable=W0212
+        # Inserted without the model, like another process would, so the cache is not invalidated.
+        now = datetime.utcnow()
+        db.session.execute(Location.__table__.insert().values(name='San Francisco', date_created=now,
+                                                              date_modified=now))
+        db.session.commit()
+        self.assertEqual(Location.find_by_name('San Francisco'), None)
+        time.sleep(0.06)
+        self.assertEqual(Location.find_by_name('San Francisco').name, 'San Francisco')
+        self.assertEqual(Location._cache.stats()['expirations'], expirations + 1)  # pylint: disable=W0212
+
+
+@pytest.mark.usefixtures('app_factory')
+class TestUncommittedWrites(unittest.TestCase):
+    """Tests that rows written in a transaction are not served to other threads before it commits."""
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        # A database file, so that each thread has its own connection and only sees committed rows.
+        path = os.path.join(self.directory.name, 'cache.db')
+        self.app = self.create_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}')
+        self.context = self.app.app_context()
+        self.context.push()
+        Location.invalidate_cache()
+        User.invalidate_cache()
+
+    def tearDown(self):
+        Location.invalidate_cache()
+        User.invalidate_cache()
+        db.session.remove()
+        db.get_engine(self.app).dispose()
+        self.context.pop()
+        self.directory.cleanup()
+
+    def _find_in_thread(self, lookup: Callable[[], Any]) -> Any:
+        """Run a lookup in another thread, with its own session."""
+        found = []
+
+        def run():
+            with self.app.app_context():
+                found.append(lookup())
+                db.session.remove()
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        return found[0]
+
+    def test_reference_cache(self):
+        with self.assertRaises(RuntimeError):
+            with Location.transaction():
+                Location(name='Ghost').create()
+                self.assertEqual(Location.find_by_name('Ghost').name, 'Ghost')
+                self.assertIsNone(self._find_in_thread(lambda: Location.find_by_name('Ghost')))
+                raise RuntimeError('Roll back')
+        self.assertIsNone(Location.find_by_name('Ghost'))
+        self.assertIsNone(self._find_in_thread(lambda: Location.find_by_name('Ghost')))
+
+    def test_entity_cache(self):
+        with self.assertRaises(RuntimeError):
+            with User.transaction():
+                user = _create_user(0)
+                self.assertEqual(User.find_by_id(user.id).email, 'email0@example.com')
+                self.assertIsNone(self._find_in_thread(lambda: User.find_by_id(user.id)))
+                raise RuntimeError('Roll back')
+        self.assertIsNone(User.find_by_id(user.id))
+        self.assertIsNone(self._find_in_thread(lambda: User.find_by_id(user.id)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -54,6 +54,27 @@ class TestLocation(unittest.TestCase):
         result = Location.find_by_name(existing_name)
         self.assertEqual(result.name, existing_name)
 
+    def test_find_is_cached(self):
+        Location(name='San Francisco').create()
+        Location.find_by_name('San Francisco')
+        stats = Location._cache.stats()  # pylint: disable=W0212
+        result = Location.find_by_id(1)
+        self.assertEqual(result.name, 'San Francisco')
+        self.assertEqual(Location.find_by_name('Los Angeles'), None)
+        new_stats = Location._cache.stats()  # pylint: disable=W0212
+        self.assertEqual(new_stats['hits'], stats['hits'] + 2)
+        self.assertEqual(new_stats['misses'], stats['misses'])
+
+    def test_cache_invalidated_by_writes(self):
+        location = Location(name='San Francisco')
+        location.create()
+        self.assertEqual(Location.find_by_name('San Francisco').id, location.id)
+        location.update_instance({'name': 'Los Angeles'})
+        self.assertEqual(Location.find_by_name('San Francisco'), None)
+        self.assertEqual(Location.find_by_name('Los Angeles').id, location.id)
+        location.delete_instance()
+        self.assertEqual(Location.find_by_id(location.id), None)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,230 @@
+"""Unit tests for Ride models."""
+import unittest
+
+from datetime import date
+from datetime import datetime
+
+from sqlalchemy import event
+
+from wayfare import db
+from wayfare.exceptions import AlreadyPassengerError
+from wayfare.exceptions import CapacityBelowHeldSeatsError
+from wayfare.exceptions import RideFullError
+from wayfare.models import Location
+from wayfare.models import Passenger
+from wayfare.models import Ride
+from wayfare.models import Status
+from wayfare.models import TimeRange
+from wayfare.models import User
+
+
+class TestRide(unittest.TestCase):
+    """Tests for the Ride model."""
+    def setUp(self):
+        Passenger.delete_all()
+        Ride.delete_all()
+        Status.delete_all()
+        Location.delete_all()
+        TimeRange.delete_all()
+        User.delete_all()
+        Location(name='San Luis Obispo').create()
+        Location(name='San Francisco').create()
+        TimeRange(description='Morning', start_time=6, end_time=12).create()
+        User(
+            first_name='test',
+            last_name='test',
+            email='email@example.com',
+            password='password'
+        ).create()
+
+    def _create_ride(self, start_location_id: int, destination_id: int, departure_date: datetime,
+                     driver_id: int = 1) -> Ride:
+        ride = Ride(
+            departure_date=departure_date,
+            capacity=4,
+            time_range_id=1,
+            driver_id=driver_id,
+            start_location_id=start_location_id,
+            destination_id=destination_id
+        )
+        ride.create()
+        return ride
+
+    def test_search(self):
+        match = self._create_ride(1, 2, datetime(2018, 12, 1, 8, 30))
+        self._create_ride(2, 1, datetime(2018, 12, 1, 8, 30))
+        self._create_ride(1, 2, datetime(2018, 12, 2, 0, 0))
+        result = Ride.search(start_location_id=1, destination_id=2, departure_date=date(2018, 12, 1)).all()
+        self.assertEqual([ride.id for ride in result], [match.id])
+
+    def test_find_by_id_lazy_load(self):
+        ride = self._create_ride(1, 2, datetime(2018, 12, 1))
+        self.assertEqual(Ride.find_by_id(ride.id).driver.email, 'email@example.com')
+        # Served from the cache.
+        self.assertEqual(Ride.find_by_id(ride.id).start_location.name, 'San Luis Obispo')
+
+    def test_search_partial(self):
+        self._create_ride(1, 2, datetime(2018, 12, 1))
+        self._create_ride(2, 1, datetime(2018, 12, 1))
+        self._create_ride(1, 2, datetime(2018, 12, 2))
+        self.assertEqual(Ride.search(start_location_id=1).count(), 2)
+        self.assertEqual(Ride.search(departure_date=date(2018, 12, 1)).count(), 2)
+        self.assertEqual(Ride.search().count(), 3)
+
+    def test_search_no_match(self):
+        self._create_ride(1, 2, datetime(2018, 12, 1))
+        result = Ride.search(start_location_id=2, destination_id=1).all()
+        self.assertEqual(result, [])
+
+    def test_expand(self):
+        Status(description='Pending').create()
+        for _ in range(20):
+            ride = self._create_ride(1, 2, datetime(2018, 12, 1))
+            Passenger(user_id=1, ride_id=ride.id, status_id=1).create()
+        db.session.expire_all()
+        statements = []
+        def count(*args):  # pylint: disable=W0613
+            statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            rides = Ride.expand(Ride.search(start_location_id=1), [
+                'driver', 'start_location', 'destination', 'time_range', 'passengers'
+            ]).all()
+            names = {(ride.driver.email, ride.start_location.name, ride.destination.name,
+                      ride.time_range.description, len(ride.passengers)) for ride in rides}
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+        self.assertEqual(names, {('email@example.com', 'San Luis Obispo', 'San Francisco', 'Morning', 1)})
+        self.assertEqual(len(rides), 20)
+        self.assertEqual(len(statements), 2)
+
+    def _seats_available(self, ride_id: int) -> int:
+        return db.session.query(Ride.seats_available).filter(Ride.id == ride_id).scalar()
+
+    def test_seats_available(self):
+        Status(description='Pending').create()
+        Status(description='Confirmed').create()
+        Status(description='Declined').create()
+        User(first_name='other', last_name='other', email='other@example.com', password='password').create()
+        ride = self._create_ride(1, 2, datetime(2018, 12, 1))
+        self.assertEqual(self._seats_available(ride.id), 4)
+        passenger = Passenger(user_id=1, ride_id=ride.id, status_id=1)
+        passenger.create()
+        self.assertEqual(self._seats_available(ride.id), 3)
+        passenger = passenger.update(2)
+        self.assertEqual(self._seats_available(ride.id), 3)
+        other = Passenger(user_id=2, ride_id=ride.id, status_id=1)
+        other.create()
+        self.assertEqual(self._seats_available(ride.id), 2)
+        passenger.update(3)
+        self.assertEqual(self._seats_available(ride.id), 3)
+        other.delete_instance()
+        self.assertEqual(self._seats_available(ride.id), 4)
+        self.assertEqual(Ride.find_seat_mismatches(), [])
+
+    def test_seats_available_capacity_update(self):
+        Status(description='Pending').create()
+        ride = self._create_ride(1, 2, datetime(2018, 12, 1))
+        Passenger(user_id=1, ride_id=ride.id, status_id=1).create()
+        Ride.find_by_id(ride.id).update_instance({'capacity': 6})
+        self.assertEqual(Ride.find_by_id(ride.id).seats_available, 5)
+
+    def test_capacity_below_held_seats(self):
+        Status(description='Pending').create()
+        User(first_name='other', last_name='other', email='other@example.com', password='password').create()
+        ride = self._create_ride(1, 2, datetime(2018, 12, 1))
+        Ride.find_by_id(ride.id).update_instance({'capacity': 2})
+        Passenger(user_id=1, ride_id=ride.id, status_id=1).create()
+        Passenger(user_id=2, ride_id=ride.id, status_id=1).create()
+        with self.assertRaises(CapacityBelowHeldSeatsError):
+            Ride.find_by_id(ride.id).update_instance({'capacity': 1})
+        self.assertEqual(Ride.find_by_id(ride.id).capacity, 2)
+        self.assertEqual(self._seats_available(ride.id), 0)
+        Ride.find_by_id(ride.id).update_instance({'capacity': 2})
+        self.assertEqual(Ride.find_seat_mismatches(), [])
+
+    def test_delete_passenger_user(self):
+        Status(description='Pending').create()
+        other = User(first_name='other', last_name='other', email='other@example.com', password='password')
+        other.create()
+        ride = self._create_ride(1, 2, datetime(2018, 12, 1))
+        Passenger.reserve(ride.id, other.id)
+        self.assertEqual(self._seats_available(ride.id), 3)
+        User.find_by_id(other.id).delete_instance()
+        self.assertEqual(self._seats_available(ride.id), 4)
+        self.assertEqual(Ride.find_seat_mismatches(), [])
+
+    def test_user_deleted_out_of_band(self):
+        Status(description='Pending').create()
+        other = User(first_name='other', last_name='other', email='other@example.com', password='password')
+        other.create()
+        ride = self._create_ride(1, 2, datetime(2018, 12, 1))
+        Passenger.reserve(ride.id, other.id)
+        db.session.execute(User.__table__.delete().where(User.id == other.id))
+        db.session.commit()
+        self.assertEqual(Ride.find_seat_mismatches(), [(ride.id, 3, 4)])
+
+    def test_recount_seats(self):
+        Status(description='Confirmed').create()
+        ride = self._create_ride(1, 2, datetime(2018, 12, 1))
+        Passenger(user_id=1, ride_id=ride.id, status_id=1).create()
+        db.session.query(Ride).update({Ride.seats_available: 4})
+        db.session.commit()
+        self.assertEqual(Ride.find_seat_mismatches(), [(ride.id, 4, 3)])
+        Ride.recount_seats([ride.id])
+        self.assertEqual(Ride.find_seat_mismatches(), [])
+        self.assertEqual(Ride.find_by_id(ride.id).seats_available, 3)
+
+    def test_search_min_seats(self):
+        Status(description='Confirmed').create()
+        open_ride = self._create_ride(1, 2, datetime(2018, 12, 1))
+        full_ride = self._create_ride(1, 2, datetime(2018, 12, 1))
+        Ride.find_by_id(full_ride.id).update_instance({'capacity': 1})
+        Passenger(user_id=1, ride_id=full_ride.id, status_id=1).create()
+        result = Ride.search(start_location_id=1, destination_id=2, min_seats=1).all()
+        self.assertEqual([ride.id for ride in result], [open_ride.id])
+
+    def test_reserve(self):
+        Status(description='Pending').create()
+        Status(description='Declined').create()
+        ride = self._create_ride(1, 2, datetime(2018, 12, 1))
+        Ride.find_by_id(ride.id).update_instance({'capacity': 1})
+        User(first_name='other', last_name='other', email='other@example.com', password='password').create()
+        passenger = Passenger.reserve(ride.id, 1)
+        self.assertEqual((passenger.user_id, passenger.status_id), (1, 1))
+        self.assertEqual(self._seats_available(ride.id), 0)
+        with self.assertRaises(AlreadyPassengerError):
+            Passenger.reserve(ride.id, 1)
+        with self.assertRaises(RideFullError):
+            Passenger.reserve(ride.id, 2)
+        passenger.update(2)
+        Passenger.reserve(ride.id, 2)
+        self.assertEqual(self._seats_available(ride.id), 0)
+        self.assertEqual(Passenger.query.filter_by(ride_id=ride.id).count(), 3)
+        self.assertEqual(Ride.find_seat_mismatches(), [])
+
+    def test_find_by_member(self):
+        User(first_name='other', last_name='other', email='other@example.com', password='password').create()
+        Status(description='Pending').create()
+        Status(description='Confirmed').create()
+        driven_late = self._create_ride(1, 2, datetime(2018, 12, 3))
+        driven_early = self._create_ride(1, 2, datetime(2018, 12, 1))
+        ridden = self._create_ride(2, 1, datetime(2018, 12, 2), driver_id=2)
+        self._create_ride(2, 1, datetime(2018, 12, 2), driver_id=2)
+        Passenger(user_id=1, ride_id=ridden.id, status_id=1).create()
+        Passenger(user_id=1, ride_id=ridden.id, status_id=2).create()
+        Passenger(user_id=2, ride_id=driven_early.id, status_id=1).create()
+
+        rows, next_cursor = Ride.find_by_member(1, 2)
+        self.assertEqual([(row.id, row.role, row.status) for row in rows],
+                         [(driven_early.id, 'driver', None), (ridden.id, 'passenger', 'Confirmed')])
+        self.assertEqual(next_cursor, (datetime(2018, 12, 2), ridden.id))
+        rows, next_cursor = Ride.find_by_member(1, 2, after=next_cursor)
+        self.assertEqual([(row.id, row.role) for row in rows], [(driven_late.id, 'driver')])
+        self.assertIsNone(next_cursor)
+        rows, _ = Ride.find_by_member(2, 10)
+        self.assertEqual([row.role for row in rows], ['passenger', 'driver', 'driver'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,14 +1,22 @@
 """Unit tests for User models."""
 import unittest
 
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.exc import SAWarning
+
 from wayfare.exceptions import DuplicateEmailError
 from wayfare.exceptions import InvalidEmailError
 from wayfare.exceptions import InvalidFirstNameError
 from wayfare.exceptions import InvalidLastNameError
+from wayfare.models import AbstractModelBase
 from wayfare.models import User
 
 # TODO: Test update, delete methods from AbstractModelBase
 
+def _new_user(email: str) -> User:
+    return User(first_name='test', last_name='test', email=email, password='password')
+
+
 class TestUser(unittest.TestCase):
     """Tests for the User model."""
     def setUp(self):
@@ -80,7 +88,33 @@ class TestUser(unittest.TestCase):
                 last_name='Stark',
                 email=duplicate_email,
                 password='password123'
-            )
+            ).create()
+        with self.assertRaises(DuplicateEmailError):
+            User(
+                first_name='Tony',
+                last_name='Stark',
+                email=duplicate_email.upper(),
+                password='password123'
+            ).create()
+
+    def test_update_duplicate_email(self):
+        User(
+            first_name='test',
+            last_name='test',
+            email='email@example.com',
+            password='test'
+        ).create()
+        user = User(
+            first_name='test',
+            last_name='test',
+            email='other@example.com',
+            password='test'
+        )
+        user.create()
+        with self.assertRaises(DuplicateEmailError):
+            user.update_instance({'email': 'Email@Example.com'})
+        user.update_instance({'email': 'new@example.com'})
+        self.assertEqual(User.find_by_email('NEW@example.com').id, user.id)
 
     def test_invalid_first_name(self):
         invalid_name = 'kari*'
@@ -209,5 +243,98 @@ class TestUser(unittest.TestCase):
         result = User.find_by_email(valid_email)
         self.assertEqual(result.email, valid_email)
 
+    def test_get_page(self):
+        for index in range(3):
+            User(
+                first_name='test',
+                last_name='test',
+                email=f'email{index}@example.com',
+                password='password'
+            ).create()
+        users, next_cursor = User.get_page(2)
+        self.assertEqual([user.id for user in users], [1, 2])
+        self.assertEqual(next_cursor, 2)
+        users, next_cursor = User.get_page(2, after=next_cursor)
+        self.assertEqual([user.id for user in users], [3])
+        self.assertEqual(next_cursor, None)
+
+    def test_get_page_columns(self):
+        for index in range(3):
+            User(
+                first_name='test',
+                last_name='test',
+                email=f'email{index}@example.com',
+                password='password'
+            ).create()
+        users, next_cursor = User.get_page(2, columns=['email'])
+        self.assertEqual([tuple(user) for user in users], [(1, 'email0@example.com'), (2, 'email1@example.com')])
+        self.assertEqual(next_cursor, 2)
+
+    def test_find_existing_emails(self):
+        User(
+            first_name='test',
+            last_name='test',
+            email='email@example.com',
+            password='password'
+        ).create()
+        result = User.find_existing_emails(['Email@example.com', 'other@example.com'])
+        self.assertEqual(result, {'email@example.com'})
+
+    def test_bulk_create(self):
+        users = [
+            User(
+                first_name='test',
+                last_name='test',
+                email=f'email{index}@example.com',
+                password='password'
+            )
+            for index in range(3)
+        ]
+        user_ids = User.bulk_create(users)
+        self.assertEqual(user_ids, [1, 2, 3])
+        self.assertEqual(User.find_by_id(3).email, 'email2@example.com')
+
+    def test_bulk_create_duplicate_email(self):
+        User(
+            first_name='test',
+            last_name='test',
+            email='email1@example.com',
+            password='password'
+        ).create()
+        users = [
+            User(
+                first_name='test',
+                last_name='test',
+                email=f'email{index}@example.com',
+                password='password'
+            )
+            for index in range(3)
+        ]
+        with self.assertRaises(DuplicateEmailError):
+            User.bulk_create(users)
+        self.assertEqual(User.find_by_email('email0@example.com'), None)
+
+    def test_nested_duplicate_email(self):
+        _new_user('email@example.com').create()
+        with self.assertRaises(DuplicateEmailError):
+            with AbstractModelBase.transaction():
+                _new_user('first@example.com').create()
+                _new_user('email@example.com').create()
+        self.assertEqual(User.find_by_email('first@example.com'), None)
+
+    def test_nested_duplicate_email_caught(self):
+        _new_user('email@example.com').create()
+        with self.assertRaises(InvalidRequestError), self.assertWarns(SAWarning):
+            with AbstractModelBase.transaction():
+                _new_user('first@example.com').create()
+                try:
+                    _new_user('email@example.com').create()
+                except DuplicateEmailError:
+                    pass
+                _new_user('last@example.com').create()
+        # The block fails as a whole rather than committing the writes around the duplicate.
+        self.assertEqual(User.find_by_email('first@example.com'), None)
+        self.assertEqual(User.find_by_email('last@example.com'), None)
+
 if __name__ == '__main__':
     unittest.main()
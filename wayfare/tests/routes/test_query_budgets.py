@@ -0,0 +1,159 @@
+"""Pinned SQL statement budgets for every endpoint.
+
+The database is seeded with enough rows that an endpoint loading related objects once per row goes far
+over its budget. Caches are emptied before each test, so the budgets hold for cold caches.
+"""
+import unittest
+
+import pytest
+
+from flask import Response
+
+from wayfare.models import User
+from wayfare.testing import QueryBudget
+
+_USERS = 50
+_RIDES = 200
+_EXPAND = 'driver,start_location,destination,time_range,passengers'
+
+
+def _new_user(index: int) -> dict:
+    return {'first_name': 'New', 'last_name': f'User {index}', 'email': f'budget{index}@example.com',
+            'password': 'password'}
+
+
+class TestQueryBudget(unittest.TestCase):
+    """Tests for `QueryBudget` itself."""
+    def setUp(self):
+        User.delete_all()
+
+    def test_over_budget(self):
+        with self.assertRaises(AssertionError) as raised:
+            with QueryBudget(1, description='Two lookups'):
+                User.find_by_email('a@example.com')
+                User.find_by_email('b@example.com')
+        message = str(raised.exception)
+        self.assertTrue(message.startswith('Two lookups executed 2 SQL statements, over its budget of 1:'))
+        self.assertIn('  2. [User.find_by_email] SELECT', message)
+
+    @QueryBudget(1)
+    def test_decorator(self):
+        User.find_by_email('a@example.com')
+
+
+@pytest.mark.usefixtures('seeded_app')
+class _EndpointBudgetTestCase(unittest.TestCase):
+    """Base class for the tests of endpoint budgets, against a seeded app of their own."""
+    seed = {'users': _USERS, 'rides': _RIDES, 'locations': 5, 'days': 7}
+
+    def _request(self, budget: int, method: str, url: str, status: int = 200, **kwargs) -> Response:
+        """Send a request, reading its whole body, within a statement budget."""
+        with QueryBudget(budget, self.engine, f'{method} {url}'):
+            response = self.client.open(url, method=method, **kwargs)
+            response.get_data()
+        self.assertEqual(response.status_code, status, response.get_data(as_text=True))
+        return response
+
+
+class TestQueryBudgets(_EndpointBudgetTestCase):
+    """Tests that each endpoint executes at most a pinned number of SQL statements."""
+    def test_get_users(self):
+        self._request(1, 'GET', f'/users?limit={_USERS}')
+        self._request(1, 'GET', f'/users?fields=id,email&limit={_USERS}')
+        self._request(1, 'GET', '/users', headers={'Accept': 'application/x-ndjson'})
+
+    def test_post_users(self):
+        self._request(2, 'POST', '/users', 201, data=_new_user(0))
+
+    def test_post_users_batch(self):
+        self._request(3, 'POST', '/users:batch', json=[_new_user(index) for index in range(1, 101)])
+
+    def test_get_user(self):
+        etag = self._request(1, 'GET', '/users/1').headers['ETag']
+        self._request(0, 'GET', '/users/1')
+        self._request(0, 'GET', '/users/1', 304, headers={'If-None-Match': etag})
+        self._request(1, 'GET', f'/users/{_USERS + 1000}', 404)
+
+    def test_put_user(self):
+        self._request(2, 'PUT', '/users/2', data=_new_user(101))
+        self._request(2, 'PUT', f'/users/{_USERS + 1000}', 201, data=_new_user(102))
+
+    def test_delete_user(self):
+        location = self.client.post('/users', data=_new_user(103)).headers['location']
+        self._request(3, 'DELETE', location)
+        # Deleting a passenger also recounts the seats of their rides.
+        location = self.client.post('/users', data=_new_user(104)).headers['location']
+        ride = {'departure_date': '2019-01-03T08:00:00', 'capacity': 1, 'time_range_id': 1, 'driver_id': 1,
+                'start_location_id': 1, 'destination_id': 2}
+        ride_location = self.client.post('/rides', data=ride).headers['location']
+        user_id = int(location.rsplit('/', 1)[1])
+        response = self.client.post(f'{ride_location}/passengers', json={'user_id': user_id})
+        self.assertEqual(response.status_code, 201)
+        self._request(4, 'DELETE', location)
+
+    def test_get_user_rides(self):
+        self._request(1, 'GET', '/users/1/rides?limit=100')
+        self._request(2, 'GET', f'/users/{_USERS + 1000}/rides', 404)
+
+    def test_get_rides(self):
+        self._request(1, 'GET', f'/rides?limit={_RIDES}')
+        self._request(1, 'GET', f'/rides?fields=id,departure_date&limit={_RIDES}')
+        self._request(1, 'GET', '/rides', headers={'Accept': 'application/x-ndjson'})
+
+    def test_search_rides(self):
+        self._request(2, 'GET', '/rides?startLocation=Location%201&destination=Location%202&date=2019-01-02')
+        self._request(2, 'GET', '/rides?startLocation=Location%201&destination=Location%202&seats=2')
+
+    def test_expand_rides(self):
+        self._request(2, 'GET', f'/rides?expand={_EXPAND}&limit={_RIDES}')
+        self._request(2, 'GET', f'/rides?expand={_EXPAND}', headers={'Accept': 'application/x-ndjson'})
+
+    def test_post_rides(self):
+        self._request(2, 'POST', '/rides', 201, data={
+            'departure_date': '2019-01-03T08:00:00',
+            'capacity': 4,
+            'time_range_id': 1,
+            'driver_id': 1,
+            'start_location_id': 1,
+            'destination_id': 2
+        })
+
+    def test_get_ride(self):
+        self._request(1, 'GET', '/rides/1')
+        self._request(2, 'GET', f'/rides/1?expand={_EXPAND}')
+        self._request(1, 'GET', f'/rides/{_RIDES + 1000}', 404)
+
+    def test_put_ride(self):
+        ride = {'departure_date': '2019-01-03T08:00:00', 'capacity': 8, 'time_range_id': 1, 'driver_id': 1,
+                'start_location_id': 1, 'destination_id': 2}
+        self._request(2, 'PUT', '/rides/2', data=ride)
+        self._request(2, 'PUT', f'/rides/{_RIDES + 1000}', 201, data=ride)
+
+    def test_delete_ride(self):
+        self._request(2, 'DELETE', f'/rides/{_RIDES}')
+
+    def test_post_ride_passengers(self):
+        ride = {'departure_date': '2019-01-03T08:00:00', 'capacity': 1, 'time_range_id': 1, 'driver_id': 1,
+                'start_location_id': 1, 'destination_id': 2}
+        location = self.client.post('/rides', data=ride).headers['location']
+        self._request(6, 'POST', f'{location}/passengers', 201, json={'user_id': 2})
+        self._request(4, 'POST', f'{location}/passengers', 409, json={'user_id': 3})
+        self._request(1, 'POST', f'/rides/{_RIDES + 1000}/passengers', 404, json={'user_id': 2})
+
+
+
+class TestDeleteAllQueryBudgets(_EndpointBudgetTestCase):
+    """Tests that the endpoints deleting every row execute at most a pinned number of SQL statements.
+
+    They empty their table, so they run against an app of their own rather than the one shared by the other
+    endpoints' budgets.
+    """
+    def test_delete_users(self):
+        self._request(2, 'DELETE', '/users')
+
+    def test_delete_rides(self):
+        self._request(1, 'DELETE', '/rides')
+
+
+if __name__ == '__main__':
+    unittest.main()
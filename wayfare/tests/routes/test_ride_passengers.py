@@ -0,0 +1,96 @@
+"""Unit tests for reserving seats through `POST /rides/<id>/passengers`."""
+import unittest
+
+import pytest
+
+from wayfare import db
+from wayfare.models import Ride
+
+
+@pytest.mark.usefixtures('seeded_app')
+class TestRidePassengers(unittest.TestCase):
+    """Tests for the RidePassengers resource."""
+    seed = {'users': 3, 'rides': 0, 'locations': 2, 'days': 1}
+
+    def setUp(self):
+        # Driven by user 1, with a single seat.
+        self.ride_url = self.client.post('/rides', data={
+            'departure_date': '2019-01-03T08:00:00',
+            'capacity': 1,
+            'time_range_id': 1,
+            'driver_id': 1,
+            'start_location_id': 1,
+            'destination_id': 2
+        }).headers['location']
+        self.ride_id = int(self.ride_url.rsplit('/', 1)[1])
+
+    def _reserve(self, user_id: int, status: int):
+        response = self.client.post(f'{self.ride_url}/passengers', json={'user_id': user_id})
+        self.assertEqual(response.status_code, status, response.get_data(as_text=True))
+        return response.get_json()
+
+    def _seats_available(self) -> int:
+        return self.client.get(self.ride_url).get_json()['seats_available']
+
+    def test_reserve(self):
+        passenger = self._reserve(2, 201)
+        self.assertEqual((passenger['user_id'], passenger['ride_id']), (2, self.ride_id))
+        self.assertIsInstance(passenger['id'], int)
+        self.assertEqual(self._seats_available(), 0)
+
+    def test_driver(self):
+        body = self._reserve(1, 409)
+        self.assertEqual(body['message'], f'User 1 drives ride {self.ride_id}')
+        self.assertEqual(self._seats_available(), 1)
+
+    def test_already_passenger(self):
+        response = self.client.put(self.ride_url, data={
+            'departure_date': '2019-01-03T08:00:00',
+            'capacity': 2,
+            'time_range_id': 1,
+            'driver_id': 1,
+            'start_location_id': 1,
+            'destination_id': 2
+        })
+        self.assertEqual(response.status_code, 200)
+        self._reserve(2, 201)
+        body = self._reserve(2, 409)
+        self.assertEqual(body['message'], f'User 2 already holds a seat in ride {self.ride_id}')
+        self.assertEqual(self._seats_available(), 1)
+
+    def test_full(self):
+        self._reserve(2, 201)
+        body = self._reserve(3, 409)
+        self.assertEqual(body['message'], f'Ride {self.ride_id} has no seats available')
+        self.assertEqual(self._seats_available(), 0)
+        with self.app.app_context():
+            db.session.remove()
+            self.assertEqual(Ride.find_seat_mismatches(), [])
+
+    def test_capacity_below_held_seats(self):
+        self._reserve(2, 201)
+        response = self.client.put(self.ride_url, data={
+            'departure_date': '2019-01-03T08:00:00',
+            'capacity': 0,
+            'time_range_id': 1,
+            'driver_id': 1,
+            'start_location_id': 1,
+            'destination_id': 2
+        })
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json()['message'],
+                         f'Ride {self.ride_id} has more passengers than 0 seats')
+        self.assertEqual(self._seats_available(), 0)
+
+    def test_unknown_user(self):
+        body = self._reserve(100, 400)
+        self.assertEqual(body['message'], 'User 100 does not exist')
+        self.assertEqual(self._seats_available(), 1)
+
+    def test_unknown_ride(self):
+        response = self.client.post('/rides/100000/passengers', json={'user_id': 2})
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""Unit tests for precompiled response serializers."""
+import json
+import unittest
+
+from datetime import datetime
+from types import SimpleNamespace
+
+from flask import current_app
+from flask_restful import fields as flask_fields
+from flask_restful import marshal
+
+from wayfare.routes import rides
+from wayfare.routes import users
+from wayfare.routes.serializers import Serializer
+
+
+class TestSerializer(unittest.TestCase):
+    """Tests that `Serializer` output matches `marshal` followed by `json.dumps`."""
+    def _assert_matches_marshal(self, response_schema: dict, objs: list):
+        serializer = Serializer(response_schema)
+        self.assertEqual(serializer.dumps_list(objs), json.dumps(marshal(objs, response_schema)))
+        for obj in objs:
+            self.assertEqual(serializer.dumps(obj), json.dumps(marshal(obj, response_schema)))
+
+    def test_user_schema(self):
+        self._assert_matches_marshal(users._response_schema, [  # pylint: disable=W0212
+            SimpleNamespace(id=1, first_name='Oliver', last_name='Wang', email='owang02@calpoly.edu'),
+            SimpleNamespace(id=None, first_name='Zoë "Z"\n', last_name=None, email=' @example.com')
+        ])
+
+    def test_ride_schema(self):
+        self._assert_matches_marshal(rides._response_schema, [  # pylint: disable=W0212
+            SimpleNamespace(id=1, actual_departure_time=None, departure_date=datetime(2018, 12, 1, 8, 30),
+                            capacity=4, seats_available=4, time_range_id=1, driver_id=1, start_location_id=1,
+                            destination_id=2),
+            SimpleNamespace(id=True, actual_departure_time=datetime(2018, 12, 1, 8, 45, 30, 5),
+                            departure_date=None, capacity=4.0, seats_available=0, time_range_id=1, driver_id=1,
+                            start_location_id=2, destination_id=1)
+        ])
+
+    def test_other_fields(self):
+        self._assert_matches_marshal({
+            'id': flask_fields.Integer(default=-1),
+            'active': flask_fields.Boolean,
+            'display name': flask_fields.String(attribute='name')
+        }, [SimpleNamespace(id=None, active=1, name='test'), SimpleNamespace(id=2, active=None, name=None)])
+
+    def test_nested_fields(self):
+        location_schema = {'id': flask_fields.Integer, 'name': flask_fields.String}
+        self._assert_matches_marshal({
+            'id': flask_fields.Integer,
+            'location': flask_fields.Nested(location_schema, allow_null=True),
+            'other_location': flask_fields.Nested(location_schema),
+            'locations': flask_fields.List(flask_fields.Nested(location_schema))
+        }, [
+            SimpleNamespace(id=1, location=SimpleNamespace(id=2, name='San Francisco'), other_location=None,
+                            locations=[SimpleNamespace(id=3, name=None), SimpleNamespace(id=4, name='Davis')]),
+            SimpleNamespace(id=2, location=None, other_location=SimpleNamespace(id=None, name='Fresno'),
+                            locations=None)
+        ])
+
+    def test_empty_list(self):
+        self._assert_matches_marshal(users._response_schema, [])  # pylint: disable=W0212
+
+    def test_make_response(self):
+        user = SimpleNamespace(id=1, first_name='Oliver', last_name='Wang', email='owang02@calpoly.edu')
+        with current_app.test_request_context():
+            response = Serializer(users._response_schema).make_response(  # pylint: disable=W0212
+                [user], headers={'Link': '<next>; rel="next"'})
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertEqual(response.headers['Link'], '<next>; rel="next"')
+        self.assertEqual(response.get_data(as_text=True),
+                         json.dumps(marshal([user], users._response_schema)) + '\n')  # pylint: disable=W0212
+
+
+if __name__ == '__main__':
+    unittest.main()
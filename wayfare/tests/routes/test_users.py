@@ -1,9 +1,11 @@
 """Unit tests for users endpoints and resources."""
+import json
 import unittest
 
 import requests
 
 from wayfare.routes.users import BASE_URL
+from wayfare.routes.users import BATCH_URL
 
 _TEST_USERS = [
     {  # id: 1
@@ -130,6 +132,104 @@ class TestUsers(TestUserBase):
         response = requests.put(self.endpoint)
         self.assertEqual(response.status_code, 405)
 
+    def test_get_page(self):
+        response = requests.get(self.endpoint, {'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user['id'] for user in response.json()], [1, 2])
+        self.assertEqual(response.links['next']['url'], f'{self.endpoint}?limit=2&after=2')
+        response = requests.get(response.links['next']['url'])
+        self.assertEqual([user['id'] for user in response.json()], [3, 4])
+        self.assertNotIn('Link', response.headers)
+
+    def test_get_page_after_last(self):
+        response = requests.get(self.endpoint, {'after': len(_TEST_USERS)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+        self.assertNotIn('Link', response.headers)
+
+    def test_get_ndjson_stream(self):
+        response = requests.get(self.endpoint, {'limit': 1},
+                                headers={'Accept': 'application/x-ndjson'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Type'], 'application/x-ndjson')
+        users = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(len(users), len(_TEST_USERS))
+        for index, user in enumerate(users):
+            self.assertEqual(user['id'], index + 1)
+            self.assertEqual(user['email'], _TEST_USERS[index]['email'])
+
+    def test_get_invalid_limit(self):
+        response = requests.get(self.endpoint, {'limit': 0})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('limit', response.json()['message'])
+
+    def test_get_fields(self):
+        response = requests.get(self.endpoint, {'fields': 'email,id', 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'id': index + 1, 'email': user['email']} for index, user in enumerate(_TEST_USERS[:2])
+        ])
+        self.assertIn('fields=email%2Cid', response.headers['Link'])
+        response = requests.get(self.endpoint, {'fields': 'last_name'},
+                                headers={'Accept': 'application/x-ndjson'})
+        self.assertEqual([json.loads(line) for line in response.text.splitlines()],
+                         [{'last_name': user['last_name']} for user in _TEST_USERS])
+
+    def test_get_invalid_fields(self):
+        response = requests.get(self.endpoint, {'fields': 'email,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.json()['message'])
+
+
+class TestUsersBatch(TestUserBase):
+    """Tests for the UsersBatch resource."""
+    def setUp(self):
+        super().setUp()
+        self.batch_endpoint = f'{self.scheme}{self.base_url}:{self.port}{BATCH_URL}'
+
+    def test_post_batch(self):
+        new_users = [
+            {
+                'first_name': 'test',
+                'last_name': 'test',
+                'email': f'batch{index}@example.com',
+                'password': 'test'
+            }
+            for index in range(3)
+        ]
+        response = requests.post(self.batch_endpoint, json=new_users)
+        self.assertEqual(response.status_code, 200)
+        for index, result in enumerate(response.json()):
+            new_user_id = len(_TEST_USERS) + index + 1
+            self.assertEqual(result, {
+                'status': 201,
+                'id': new_user_id,
+                'location': f'{BASE_URL}/{new_user_id}'
+            })
+        get_response = requests.get(f'{self.endpoint}/{len(_TEST_USERS) + 3}')
+        self.assertEqual(get_response.json()['email'], 'batch2@example.com')
+
+    def test_post_batch_partial_failure(self):
+        response = requests.post(self.batch_endpoint, json=[
+            {'first_name': 'test', 'last_name': 'test', 'email': 'batch@example.com', 'password': 'test'},
+            {'first_name': 'test', 'last_name': 'test', 'email': 'not_an_email', 'password': 'test'},
+            {'first_name': 'test', 'last_name': 'test', 'email': _TEST_USERS[0]['email'], 'password': 'test'},
+            {'first_name': 'test', 'last_name': 'test', 'email': 'BATCH@example.com', 'password': 'test'},
+            {'first_name': 'test', 'last_name': 'test', 'password': 'test'}
+        ])
+        self.assertEqual(response.status_code, 200)
+        statuses = [result['status'] for result in response.json()]
+        self.assertEqual(statuses, [201, 400, 400, 400, 400])
+        messages = [result.get('message') for result in response.json()]
+        self.assertEqual(messages[1], "Invalid email: 'not_an_email'")
+        self.assertEqual(messages[2], "Duplicate email: '{}'".format(_TEST_USERS[0]['email']))
+        self.assertEqual(messages[3], "Duplicate email: 'BATCH@example.com'")
+        self.assertIn('email', messages[4])
+
+    def test_post_batch_not_a_list(self):
+        response = requests.post(self.batch_endpoint, json=_TEST_USERS[0])
+        self.assertEqual(response.status_code, 400)
+
 
 class TestUserById(TestUserBase):
     """Tests for the UserById resource."""
@@ -181,6 +281,39 @@ class TestUserById(TestUserBase):
         get_response = requests.get(self.endpoint)
         self.assertEqual(len(get_response.json()), len(_TEST_USERS))
 
+    def test_get_rides(self):
+        response = requests.get(f'{self.endpoint}/1/rides')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+    def test_get_rides_nonexistent_user(self):
+        response = requests.get(f'{self.endpoint}/9001/rides')
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_rides_invalid_cursor(self):
+        response = requests.get(f'{self.endpoint}/1/rides', {'after': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_get_not_modified(self):
+        response = requests.get(f'{self.endpoint}/1')
+        self.assertIn('ETag', response.headers)
+        self.assertIn('Last-Modified', response.headers)
+        etag_response = requests.get(f'{self.endpoint}/1', headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(etag_response.status_code, 304)
+        self.assertEqual(etag_response.content, b'')
+        self.assertEqual(etag_response.headers['ETag'], response.headers['ETag'])
+        date_response = requests.get(f'{self.endpoint}/1',
+                                     headers={'If-Modified-Since': response.headers['Last-Modified']})
+        self.assertEqual(date_response.status_code, 304)
+
+    def test_get_modified_after_update(self):
+        etag = requests.get(f'{self.endpoint}/1').headers['ETag']
+        requests.put(f'{self.endpoint}/1', {**_TEST_USERS[0], 'first_name': 'newname'})
+        response = requests.get(f'{self.endpoint}/1', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.json()['first_name'], 'newname')
+
 
 
 
@@ -0,0 +1,36 @@
+"""Unit tests for app settings."""
+import unittest
+
+from wayfare import config
+
+
+class TestConfig(unittest.TestCase):
+    """Tests for loading settings from the environment."""
+    def test_defaults(self):
+        settings = config.load({})
+        self.assertEqual(settings['SQLALCHEMY_DATABASE_URI'], 'sqlite:///./main.db')
+        self.assertIsNone(settings['SQLALCHEMY_POOL_SIZE'])
+        self.assertEqual(settings['WAYFARE_SQLITE_JOURNAL_MODE'], 'WAL')
+        self.assertFalse(settings['WAYFARE_METRICS'])
+
+    def test_environment_overrides(self):
+        settings = config.load({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:////tmp/wayfare.db',
+            'SQLALCHEMY_POOL_SIZE': '5',
+            'SQLALCHEMY_TRACK_MODIFICATIONS': 'true',
+            'WAYFARE_ENTITY_CACHE_TTL': '2.5',
+            'WAYFARE_SQLITE_MMAP_SIZE': ''
+        })
+        self.assertEqual(settings['SQLALCHEMY_DATABASE_URI'], 'sqlite:////tmp/wayfare.db')
+        self.assertEqual(settings['SQLALCHEMY_POOL_SIZE'], 5)
+        self.assertTrue(settings['SQLALCHEMY_TRACK_MODIFICATIONS'])
+        self.assertEqual(settings['WAYFARE_ENTITY_CACHE_TTL'], 2.5)
+        self.assertEqual(settings['WAYFARE_SQLITE_MMAP_SIZE'], 256 * 1024 * 1024)
+
+    def test_invalid_override(self):
+        with self.assertRaises(ValueError):
+            config.load({'SQLALCHEMY_POOL_SIZE': 'many'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+"""Unit tests for database engine tuning."""
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import QueuePool
+
+from wayfare import config
+from wayfare import create_app
+from wayfare import db
+from wayfare.database import configure_engine
+
+
+class TestConfigureEngine(unittest.TestCase):
+    """Tests for the SQLite pragmas applied to new connections."""
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f'sqlite:///{os.path.join(self.directory.name, "test.db")}')
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def _pragma(self, name: str):
+        with self.engine.connect() as connection:
+            return connection.execute(f'PRAGMA {name}').scalar()
+
+    def test_default_pragmas(self):
+        configure_engine(self.engine, config.load({}))
+        self.assertEqual(self._pragma('journal_mode'), 'wal')
+        self.assertEqual(self._pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self._pragma('busy_timeout'), 5000)
+
+    def test_disabled_pragma(self):
+        configure_engine(self.engine, {**config.load({}), 'WAYFARE_SQLITE_JOURNAL_MODE': ''})
+        self.assertEqual(self._pragma('journal_mode'), 'delete')
+
+    def test_invalid_pragma(self):
+        with self.assertRaises(ValueError):
+            configure_engine(self.engine, {'WAYFARE_SQLITE_SYNCHRONOUS': 'OFF; DROP TABLE user'})
+
+
+class TestSQLAlchemy(unittest.TestCase):
+    """Tests for the connection pool of SQLite database files."""
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.uri = f'sqlite:///{os.path.join(self.directory.name, "test.db")}'
+
+    def tearDown(self):
+        db.session.remove()
+        self.directory.cleanup()
+
+    def _pool(self, settings: dict):
+        db.session.remove()
+        app = create_app({'SQLALCHEMY_DATABASE_URI': self.uri, **settings})
+        with app.app_context():
+            engine = db.engine
+            # Pooled connections are shared between threads.
+            with engine.connect() as connection:
+                connection.execute('SELECT 1')
+            engine.dispose()
+            return engine.pool
+
+    def test_unpooled(self):
+        self.assertIsInstance(self._pool({}), NullPool)
+        self.assertIsInstance(self._pool({'SQLALCHEMY_POOL_SIZE': 0}), NullPool)
+
+    def test_pooled(self):
+        for name in ('SQLALCHEMY_POOL_SIZE', 'SQLALCHEMY_MAX_OVERFLOW', 'SQLALCHEMY_POOL_TIMEOUT'):
+            with self.subTest(name):
+                self.assertIsInstance(self._pool({name: 5}), QueuePool)
+        pool = self._pool({'SQLALCHEMY_POOL_SIZE': 3, 'SQLALCHEMY_MAX_OVERFLOW': 2})
+        self.assertEqual((pool.size(), pool._max_overflow), (3, 2))  # pylint: disable=W0212
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+"""Unit tests for per-request SQL instrumentation."""
+import unittest
+
+import pytest
+
+from wayfare.instrumentation import QueryStats
+
+
+class TestQueryStats(unittest.TestCase):
+    """Tests for the statistics of a request."""
+    def test_record(self):
+        stats = QueryStats(keep=2)
+        for statement, duration in (('a', 0.002), ('b', 0.005), ('c', 0.001), ('d', 0.003)):
+            stats.record(statement, duration)
+        self.assertEqual(stats.count, 4)
+        self.assertAlmostEqual(stats.duration, 0.011)
+        self.assertEqual(stats.slowest(), [(0.005, 'b'), (0.003, 'd')])
+
+    def test_keep_none(self):
+        stats = QueryStats(keep=0)
+        stats.record('a', 0.001)
+        self.assertEqual(stats.count, 1)
+        self.assertEqual(stats.slowest(), [])
+
+
+@pytest.mark.usefixtures('app_factory')
+class TestServerTiming(unittest.TestCase):
+    """Tests for the `Server-Timing` headers."""
+    def test_enabled(self):
+        response = self.create_app(WAYFARE_SQL_INSTRUMENTATION=True).test_client().get('/users/1')
+        self.assertEqual(response.status_code, 404)
+        timings = response.headers.getlist('Server-Timing')
+        self.assertEqual(len(timings), 2)
+        self.assertTrue(timings[0].startswith('db;desc="1 queries";dur='))
+        self.assertTrue(timings[1].startswith('total;dur='))
+
+    def test_disabled(self):
+        response = self.create_app(WAYFARE_SQL_INSTRUMENTATION=False).test_client().get('/users/1')
+        self.assertNotIn('Server-Timing', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
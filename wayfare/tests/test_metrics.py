@@ -0,0 +1,78 @@
+"""Unit tests for request metrics."""
+import threading
+import unittest
+
+import pytest
+
+from wayfare.metrics import Registry
+from wayfare.metrics import render
+
+
+class TestRegistry(unittest.TestCase):
+    """Tests for recording and rendering metrics."""
+    def test_counter(self):
+        registry = Registry()
+        registry.inc('wayfare_http_requests_total', (('resource', 'users'),))
+        registry.inc('wayfare_http_requests_total', (('resource', 'users'),), 2)
+        self.assertIn('wayfare_http_requests_total{resource="users"} 3\n', render(registry))
+
+    def test_histogram(self):
+        registry = Registry()
+        for value in (0.0005, 0.002, 0.002, 20.0):
+            registry.observe('wayfare_http_request_duration_seconds', value)
+        text = render(registry)
+        self.assertIn('# TYPE wayfare_http_request_duration_seconds histogram\n', text)
+        self.assertIn('wayfare_http_request_duration_seconds_bucket{le="0.001"} 1\n', text)
+        self.assertIn('wayfare_http_request_duration_seconds_bucket{le="0.0025"} 3\n', text)
+        self.assertIn('wayfare_http_request_duration_seconds_bucket{le="10.0"} 3\n', text)
+        self.assertIn('wayfare_http_request_duration_seconds_bucket{le="+Inf"} 4\n', text)
+        self.assertIn('wayfare_http_request_duration_seconds_sum 20.0045\n', text)
+        self.assertIn('wayfare_http_request_duration_seconds_count 4\n', text)
+
+    def test_threads(self):
+        registry = Registry()
+
+        def record():
+            for _ in range(1000):
+                registry.inc('wayfare_db_statements_total')
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        record()
+        self.assertIn('wayfare_db_statements_total 5000\n', render(registry))
+        # The shards of the exited threads were folded into one.
+        self.assertIn('wayfare_db_statements_total 5000\n', render(registry))
+
+    def test_escape_labels(self):
+        registry = Registry()
+        registry.inc('wayfare_http_requests_total', (('resource', 'a"b\\c'),))
+        self.assertIn('wayfare_http_requests_total{resource="a\\"b\\\\c"} 1\n', render(registry))
+
+
+@pytest.mark.usefixtures('app_factory')
+class TestMetricsEndpoint(unittest.TestCase):
+    """Tests for the `/metrics` endpoint."""
+    def test_metrics(self):
+        client = self.create_app(WAYFARE_METRICS=True).test_client()
+        client.get('/users/1')
+        response = client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        text = response.get_data(as_text=True)
+        self.assertIn('wayfare_http_requests_total{resource="userbyid",method="GET",status="404"} 1\n', text)
+        self.assertIn('wayfare_http_request_duration_seconds_count{resource="userbyid",method="GET"} 1\n',
+                      text)
+        self.assertIn('wayfare_db_statements_total{resource="userbyid",method="GET"} 1\n', text)
+        # The scrape itself is in flight.
+        self.assertIn('wayfare_http_requests_in_flight 1\n', text)
+        self.assertIn('wayfare_cache_hits_total{cache="user"}', text)
+
+    def test_disabled(self):
+        client = self.create_app(WAYFARE_METRICS=False).test_client()
+        self.assertEqual(client.get('/metrics').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""Unit tests for request profiling."""
+import json
+import os
+import pstats
+import tempfile
+import time
+import unittest
+
+import pytest
+
+from wayfare.profiling import collapse
+from wayfare.profiling import to_speedscope
+
+
+def _sleep_a_while():
+    time.sleep(0.05)
+    return 'slept'
+
+
+class TestFormats(unittest.TestCase):
+    """Tests for the profile file formats."""
+    def setUp(self):
+        self.outer = ('app:main', 'app.py', 1)
+        self.inner = ('app:handle', 'app.py', 10)
+        self.samples = [((self.outer, self.inner), 0.001), ((self.outer,), 0.002),
+                        ((self.outer, self.inner), 0.001)]
+
+    def test_collapse(self):
+        self.assertEqual(collapse(self.samples), 'app:main;app:handle 2\napp:main 1\n')
+
+    def test_speedscope(self):
+        profile = to_speedscope(self.samples, 'GET /users', 0.005)
+        self.assertEqual(profile['shared']['frames'], [{'name': 'app:main', 'file': 'app.py', 'line': 1},
+                                                       {'name': 'app:handle', 'file': 'app.py', 'line': 10}])
+        self.assertEqual(profile['profiles'][0]['samples'], [[0, 1], [0], [0, 1]])
+        self.assertEqual(profile['profiles'][0]['weights'], [1.0, 2.0, 1.0])
+        self.assertEqual(profile['profiles'][0]['endValue'], 5.0)
+
+
+@pytest.mark.usefixtures('app_factory')
+class TestProfiling(unittest.TestCase):
+    """Tests for profiling requests."""
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @staticmethod
+    def _get(client, url: str, mode: str = 'sample'):
+        """Send a profiled request, closing the response like a server does once it has been sent."""
+        response = client.get(url, headers={'X-Wayfare-Profile': mode})
+        response.get_data()
+        response.close()
+        return response
+
+    def _create_client(self, enabled: bool = True, keep: int = 20):
+        app = self.create_app(WAYFARE_PROFILING=enabled, WAYFARE_PROFILE_DIR=self.directory.name,
+                              WAYFARE_PROFILE_KEEP=keep)
+        app.add_url_rule('/sleep', 'sleep', _sleep_a_while)
+        return app.test_client()
+
+    def test_sampled(self):
+        response = self._get(self._create_client(), '/sleep')
+        self.assertEqual(response.get_data(as_text=True), 'slept')
+        name = response.headers['X-Wayfare-Profile']
+        self.assertIn('-GET-sleep', name)
+        with open(os.path.join(self.directory.name, f'{name}.collapsed')) as collapsed:
+            lines = collapsed.read().splitlines()
+        self.assertTrue(any('test_profiling:_sleep_a_while' in line for line in lines))
+        with open(os.path.join(self.directory.name, f'{name}.speedscope.json')) as speedscope:
+            profile = json.load(speedscope)
+        self.assertGreater(len(profile['profiles'][0]['samples']), 0)
+
+    def test_cprofile(self):
+        response = self._get(self._create_client(), '/users', 'cprofile')
+        self.assertEqual(response.status_code, 200)
+        name = response.headers['X-Wayfare-Profile']
+        stats = pstats.Stats(os.path.join(self.directory.name, f'{name}.pstats'))
+        self.assertTrue(any(function == 'get_page' for _, _, function in stats.stats))
+
+    def test_keep(self):
+        client = self._create_client(keep=2)
+        names = [self._get(client, '/users').headers['X-Wayfare-Profile'] for _ in range(3)]
+        self.assertEqual(sorted(os.listdir(self.directory.name)),
+                         sorted(f'{name}{suffix}' for name in names[1:]
+                                for suffix in ('.collapsed', '.speedscope.json')))
+
+    def test_without_header(self):
+        response = self._create_client().get('/users')
+        self.assertNotIn('X-Wayfare-Profile', response.headers)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_disabled(self):
+        response = self._get(self._create_client(enabled=False), '/users')
+        self.assertNotIn('X-Wayfare-Profile', response.headers)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""Unit tests for the synthetic data generator."""
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy import inspect
+
+from wayfare import db
+from wayfare.models import Passenger
+from wayfare.models import Ride
+from wayfare.seed import seed_database
+
+
+class TestSeedDatabase(unittest.TestCase):
+    """Tests for `seed_database`."""
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        db.Model.metadata.create_all(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def _seed(self, engine=None, seed: int = 0) -> dict:
+        return seed_database(engine or self.engine, users=50, rides=300, locations=5, days=7, seed=seed)
+
+    def test_counts(self):
+        counts = self._seed()
+        self.assertEqual(counts['user'], 50)
+        self.assertEqual(counts['ride'], 300)
+        self.assertEqual(counts['location'], 5)
+        self.assertEqual(self.engine.execute('SELECT COUNT(*) FROM passenger').scalar(), counts['passenger'])
+
+    def test_rows_are_valid(self):
+        self._seed()
+        rides = self.engine.execute(Ride.__table__.select()).fetchall()
+        self.assertTrue(all(ride.start_location_id != ride.destination_id for ride in rides))
+        self.assertTrue(all(1 <= ride.start_location_id <= 5 for ride in rides))
+        drivers = {ride.id: ride.driver_id for ride in rides}
+        passengers = self.engine.execute(Passenger.__table__.select()).fetchall()
+        self.assertTrue(all(passenger.user_id != drivers[passenger.ride_id] for passenger in passengers))
+        self.assertEqual(len({(passenger.user_id, passenger.ride_id) for passenger in passengers}),
+                         len(passengers))
+
+    def test_seats_available(self):
+        self._seed()
+        held = dict(self.engine.execute(
+            "SELECT ride_id, COUNT(*) FROM passenger JOIN status ON passenger.status_id = status.id "
+            "WHERE status.description IN ('Pending', 'Confirmed') GROUP BY ride_id").fetchall())
+        rides = self.engine.execute(Ride.__table__.select()).fetchall()
+        self.assertTrue(all(ride.seats_available == ride.capacity - held.get(ride.id, 0) for ride in rides))
+        self.assertTrue(all(ride.seats_available >= 0 for ride in rides))
+        self.assertTrue(any(ride.seats_available == 0 for ride in rides))
+
+    def test_deterministic(self):
+        self._seed()
+        other = create_engine('sqlite://')
+        db.Model.metadata.create_all(other)
+        self._seed(other)
+        query = 'SELECT * FROM ride ORDER BY id'
+        self.assertEqual(self.engine.execute(query).fetchall(), other.execute(query).fetchall())
+        other.dispose()
+
+    def test_indexes_rebuilt(self):
+        self._seed()
+        self.assertEqual({index['name'] for index in inspect(self.engine).get_indexes(Ride.__tablename__)},
+                         {index.name for index in Ride.__table__.indexes})
+
+    def test_not_empty(self):
+        self._seed()
+        with self.assertRaises(ValueError):
+            self._seed()
+
+
+if __name__ == '__main__':
+    unittest.main()
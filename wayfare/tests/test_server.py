@@ -0,0 +1,58 @@
+"""Unit tests for the prefork server."""
+import logging
+import threading
+import time
+import unittest
+
+from types import SimpleNamespace
+
+from wayfare import create_app
+from wayfare import db
+from wayfare import server
+from wayfare.models import Ride
+from wayfare.models import User
+from wayfare.models.cache import DEFAULT_ENTITY_CACHE_SIZE
+from wayfare.models.cache import DEFAULT_ENTITY_CACHE_TTL
+from wayfare.models.cache import configure_entity_caches
+from wayfare.server import _Application
+
+
+class TestApplication(unittest.TestCase):
+    """Tests for loading the app in gunicorn."""
+    def tearDown(self):
+        db.session.remove()
+        configure_entity_caches(DEFAULT_ENTITY_CACHE_SIZE, DEFAULT_ENTITY_CACHE_TTL)
+
+    @staticmethod
+    def _load(workers: int):
+        db.session.remove()
+        _Application(lambda: create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'}),
+                     {'bind': '127.0.0.1:0', 'workers': workers}).load()
+
+    def test_single_worker_keeps_entity_caches(self):
+        self._load(1)
+        self.assertEqual(User._cache.max_size, DEFAULT_ENTITY_CACHE_SIZE)  # pylint: disable=W0212
+
+    def test_workers_disable_entity_caches(self):
+        self._load(4)
+        self.assertEqual(User._cache.max_size, 0)  # pylint: disable=W0212
+        self.assertEqual(Ride._cache.max_size, 0)  # pylint: disable=W0212
+
+
+class TestCountRequest(unittest.TestCase):
+    """Tests for the per-worker request counts."""
+    def test_periodic_report(self):
+        logger = logging.getLogger('wayfare.tests.server')
+        worker = SimpleNamespace(pid=1, log=logger, wayfare_requests=0,
+                                 wayfare_requests_lock=threading.Lock(), wayfare_reported_at=time.monotonic())
+        with self.assertLogs(logger) as logs:
+            server._count_request(worker, None, None, None)  # pylint: disable=W0212
+            worker.wayfare_reported_at -= server._REPORT_INTERVAL  # pylint: disable=W0212
+            server._count_request(worker, None, None, None)  # pylint: disable=W0212
+            server._count_request(worker, None, None, None)  # pylint: disable=W0212
+        self.assertEqual(logs.output, ['INFO:wayfare.tests.server:Worker 1 has served 2 requests'])
+        self.assertEqual(worker.wayfare_requests, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
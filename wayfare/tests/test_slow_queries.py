@@ -0,0 +1,101 @@
+"""Unit tests for the slow query log."""
+import json
+import logging
+import os
+import tempfile
+import unittest
+
+import pytest
+
+from wayfare.slow_queries import normalize
+from wayfare.slow_queries import redact
+
+
+class TestNormalize(unittest.TestCase):
+    """Tests for statement fingerprints."""
+    def test_literals(self):
+        self.assertEqual(normalize("SELECT * FROM user WHERE email = 'a@b.co' AND id > 12 LIMIT 1.5"),
+                         'SELECT * FROM user WHERE email = ? AND id > ? LIMIT ?')
+
+    def test_placeholder_lists(self):
+        self.assertEqual(normalize('SELECT * FROM ride WHERE id IN (?, ?,?)'),
+                         'SELECT * FROM ride WHERE id IN (...)')
+
+    def test_identifiers_kept(self):
+        self.assertEqual(normalize('SELECT user_1.id \n FROM  user AS user_1'),
+                         'SELECT user_1.id FROM user AS user_1')
+
+
+class TestRedact(unittest.TestCase):
+    """Tests for hiding parameter values."""
+    def test_redact(self):
+        self.assertEqual(redact(('secret', 1, None)), ['<str>', '<int>', '<NoneType>'])
+        self.assertEqual(redact({'password': 'secret'}), {'password': '<str>'})
+
+
+@pytest.mark.usefixtures('app_factory')
+class TestSlowQueryLog(unittest.TestCase):
+    """Tests for recording slow statements."""
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'slow.log')
+
+    def tearDown(self):
+        logger = logging.getLogger('wayfare.slow_queries')
+        for handler in list(logger.handlers):
+            handler.close()
+            logger.removeHandler(handler)
+        self.directory.cleanup()
+
+    def _create_app(self, threshold: float, log_parameters: bool = False):
+        return self.create_app(WAYFARE_SLOW_QUERY_MS=threshold, WAYFARE_SLOW_QUERY_LOG=self.path,
+                               WAYFARE_SLOW_QUERY_PARAMETERS=log_parameters)
+
+    def _read_log(self) -> list:
+        with open(self.path) as log:
+            return [json.loads(line) for line in log]
+
+    def test_slow_queries(self):
+        client = self._create_app(0.0).test_client()
+        client.get('/users/1/rides')
+        client.get('/users/1/rides')
+        top = client.get('/debug/slow-queries?limit=50').get_json()
+        entry = next(entry for entry in top if entry['caller'] == 'Ride.find_by_member')
+        self.assertEqual(entry['count'], 2)
+        self.assertTrue(entry['statement'].startswith('SELECT'))
+        self.assertTrue(any('ix_ride_driver' in line for line in entry['plan']))
+        record = next(record for record in self._read_log() if record['caller'] == 'Ride.find_by_member')
+        self.assertEqual(record['request'], 'GET /users/1/rides')
+        self.assertEqual(record['plan'], entry['plan'])
+        self.assertIn('<int>', record['parameters'])
+
+    def test_parameters_redacted(self):
+        client = self._create_app(0.0).test_client()
+        response = client.post('/users', data={'first_name': 'New', 'last_name': 'User',
+                                               'email': 'new@example.com', 'password': 'hunter22'})
+        self.assertEqual(response.status_code, 201)
+        with open(self.path) as log:
+            text = log.read()
+        self.assertNotIn('hunter22', text)
+        self.assertNotIn('new@example.com', text)
+        self.assertNotIn('hunter22', client.get('/debug/slow-queries?limit=50').get_data(as_text=True))
+
+    def test_parameters_logged(self):
+        client = self._create_app(0.0, log_parameters=True).test_client()
+        client.get('/users/1/rides')
+        record = next(record for record in self._read_log() if record['caller'] == 'Ride.find_by_member')
+        self.assertIn(1, record['parameters'])
+
+    def test_fast_queries(self):
+        client = self._create_app(60000.0).test_client()
+        client.get('/users/1/rides')
+        self.assertEqual(client.get('/debug/slow-queries').get_json(), [])
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_disabled(self):
+        client = self._create_app(None).test_client()
+        self.assertEqual(client.get('/debug/slow-queries').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()